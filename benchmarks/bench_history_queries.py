@@ -0,0 +1,102 @@
+"""
+历史表查询基准：在 SQLite 中写入千万级的 stock_prices / asset_history 行，
+分别测量没有索引（全表扫描）和有 (主体, 时间) 覆盖索引时的区间查询耗时。
+
+用法：python -m benchmarks.bench_history_queries --rows 10000000 [--json history.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import time
+
+from storage import SQLiteStorage
+
+INDEXES = (
+    ("idx_stock_prices_code_ts", "CREATE INDEX idx_stock_prices_code_ts ON stock_prices (stock_code, timestamp, price)"),
+    ("idx_asset_history_user_ts", "CREATE INDEX idx_asset_history_user_ts ON asset_history (user_id, timestamp, asset_value)"),
+)
+
+
+def populate(storage, rows, num_stocks, num_users):
+    """按模拟器的写入顺序（逐时间步、每步每只股票/每个用户一行）生成数据。"""
+    price_steps = rows // num_stocks
+    asset_steps = rows // num_users
+    storage.insert_many(
+        "INSERT INTO stock_prices (stock_code, timestamp, price) VALUES (%s, %s, %s)",
+        ((f"S{code}", step, 100.0 + step % 50) for step in range(1, price_steps + 1) for code in range(num_stocks)))
+    storage.insert_many(
+        "INSERT INTO asset_history (user_id, timestamp, asset_value) VALUES (%s, %s, %s)",
+        ((f"U{user}", step, 10000.0 + step % 500) for step in range(1, asset_steps + 1) for user in range(num_users)))
+    return price_steps, asset_steps
+
+
+def time_queries(storage, queries, num_stocks, num_users, price_steps, window, seed):
+    """返回 (价格区间查询平均耗时, 用户资产历史查询平均耗时)，单位毫秒。"""
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for _ in range(queries):
+        t1 = rng.randint(1, max(1, price_steps - window))
+        storage.load_price_range(f"S{rng.randrange(num_stocks)}", t1, t1 + window)
+    price_ms = (time.perf_counter() - start) * 1000 / queries
+
+    start = time.perf_counter()
+    for _ in range(queries):
+        storage.load_asset_history(f"U{rng.randrange(num_users)}")
+    asset_ms = (time.perf_counter() - start) * 1000 / queries
+    return price_ms, asset_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="stock_prices / asset_history query benchmark")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="每张历史表的行数")
+    parser.add_argument("--stocks", type=int, default=100)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--window", type=int, default=1000, help="价格区间查询覆盖的时间步数")
+    parser.add_argument("--scan-queries", type=int, default=3, help="无索引时的查询次数（每次都是全表扫描）")
+    parser.add_argument("--queries", type=int, default=200, help="有索引时的查询次数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with contextlib.redirect_stdout(io.StringIO()):
+            storage = SQLiteStorage(os.path.join(tmp, "history.db"))
+        for name, _ in INDEXES:
+            storage.execute(f"DROP INDEX IF EXISTS {name}")
+
+        start = time.perf_counter()
+        price_steps, _ = populate(storage, args.rows, args.stocks, args.users)
+        load_s = time.perf_counter() - start
+        print(f"写入 {2 * args.rows} 行: {load_s:.1f} s")
+
+        scan = time_queries(storage, args.scan_queries, args.stocks, args.users, price_steps, args.window, args.seed)
+        print(f"无索引  价格区间 {scan[0]:10.2f} ms/次  资产历史 {scan[1]:10.2f} ms/次")
+
+        start = time.perf_counter()
+        for _, sql in INDEXES:
+            storage.execute(sql)
+        storage.mydb.commit()
+        index_s = time.perf_counter() - start
+        print(f"建索引: {index_s:.1f} s")
+
+        indexed = time_queries(storage, args.queries, args.stocks, args.users, price_steps, args.window, args.seed)
+        print(f"有索引  价格区间 {indexed[0]:10.2f} ms/次  资产历史 {indexed[1]:10.2f} ms/次")
+        with contextlib.redirect_stdout(io.StringIO()):
+            storage.close()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "rows_per_table": args.rows, "stocks": args.stocks, "users": args.users, "window": args.window,
+                "load_s": load_s, "index_build_s": index_s,
+                "scan_price_range_ms": scan[0], "scan_asset_history_ms": scan[1],
+                "indexed_price_range_ms": indexed[0], "indexed_asset_history_ms": indexed[1],
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
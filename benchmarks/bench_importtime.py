@@ -0,0 +1,73 @@
+"""
+导入耗时基准：用 python -X importtime 在新进程中导入模拟器核心（默认 server 模块），
+统计导入的总耗时和最慢的模块，并检查无界面运行时没有加载 PyQt5、matplotlib 等图形界面依赖。
+导入耗时取多次运行的中位数，超过 --budget-ms 或加载了图形界面依赖时以非零退出码结束，可以放进 CI。
+
+用法：python -m benchmarks.bench_importtime [--module server] [--budget-ms 300] [--json importtime.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# 无界面运行时不应加载的顶层包
+GUI_PACKAGES = ("PyQt5", "matplotlib")
+
+
+def import_profile(module):
+    """
+    在新进程中导入 module，解析 -X importtime 的输出，返回 {模块名: (自身耗时, 累计耗时)}（微秒）。
+    输出的每行形如 "import time:   self [us] | cumulative | imported package"。
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=root, capture_output=True, text=True, check=True)
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # 表头
+        profile[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="cold-start import time benchmark")
+    parser.add_argument("--module", default="server")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=300.0, help="导入耗时上限（毫秒）")
+    parser.add_argument("--top", type=int, default=10, help="列出自身耗时最长的模块数")
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    profiles = [import_profile(args.module) for _ in range(args.runs)]
+    totals = [profile[args.module][1] / 1000 for profile in profiles]
+    total_ms = statistics.median(totals)
+    last = profiles[-1]
+    gui_modules = sorted(name for name in last if name.split(".")[0] in GUI_PACKAGES)
+    slowest = sorted(last.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+
+    print(f"import {args.module}: {total_ms:.1f} ms (median of {args.runs}, budget {args.budget_ms:.0f} ms)")
+    print(f"{'self ms':>8} {'cumul ms':>9}  module")
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"{self_us / 1000:>8.1f} {cumulative_us / 1000:>9.1f}  {name}")
+    if gui_modules:
+        print(f"GUI modules loaded: {', '.join(gui_modules)}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"module": args.module, "runs": totals, "median_ms": total_ms, "budget_ms": args.budget_ms,
+                       "gui_modules": gui_modules,
+                       "slowest": [{"module": name, "self_ms": self_us / 1000, "cumulative_ms": cumulative_us / 1000}
+                                   for name, (self_us, cumulative_us) in slowest]}, f, indent=2)
+
+    if total_ms > args.budget_ms or gui_modules:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
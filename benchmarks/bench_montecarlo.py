@@ -0,0 +1,63 @@
+"""
+蒙特卡洛基准：同一批副本分别用 1、2、4 … 个进程运行，比较吞吐量和相对单进程的加速比。
+
+用法：python -m benchmarks.bench_montecarlo --replicas 32 --steps 200 --users 200 [--json montecarlo.json]
+"""
+import argparse
+import json
+import os
+import time
+
+from montecarlo import run_monte_carlo
+
+
+def process_counts(maximum):
+    """1, 2, 4, … 直到 maximum（包含 maximum 本身）。"""
+    counts = []
+    count = 1
+    while count < maximum:
+        counts.append(count)
+        count *= 2
+    counts.append(maximum)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="process-pool Monte Carlo scaling benchmark")
+    parser.add_argument("--replicas", type=int, default=32)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--stocks", type=int, default=10)
+    parser.add_argument("--trade-probability", type=float, default=0.1)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="最大进程数")
+    parser.add_argument("--vectorized", action="store_true", help="副本使用向量化内核")
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    config = {
+        "stocks": {f"S{i}": (100.0 + i, 0.02) for i in range(args.stocks)},
+        "num_trend_followers": args.users // 2,
+        "num_random_traders": args.users - args.users // 2,
+        "trade_probability": args.trade_probability,
+    }
+
+    results = []
+    print(f"{'processes':>9} {'seconds':>9} {'replicas/s':>11} {'speedup':>8} {'efficiency':>10}")
+    for processes in process_counts(args.processes):
+        start = time.perf_counter()
+        for _ in run_monte_carlo(config, args.replicas, args.steps, processes=processes, vectorized=args.vectorized):
+            pass
+        seconds = time.perf_counter() - start
+        speedup = results[0]["seconds"] / seconds if results else 1.0
+        results.append({"processes": processes, "replicas": args.replicas, "steps": args.steps, "users": args.users,
+                        "stocks": args.stocks, "seconds": seconds, "replicas_per_s": args.replicas / seconds,
+                        "speedup": speedup, "efficiency": speedup / processes})
+        print(f"{processes:>9} {seconds:>9.2f} {args.replicas / seconds:>11.2f} {speedup:>8.2f} {speedup / processes:>10.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
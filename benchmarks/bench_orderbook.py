@@ -0,0 +1,84 @@
+"""
+订单簿撮合基准：随机生成限价单、市价单和撤单组成的订单流，测量单个 OrderBook 每秒处理的订单数。
+限价单价格围绕中间价随机分布，部分与对手方交叉立即成交，其余挂单，订单簿中同时存在的档位数由 --spread 控制。
+
+用法：python -m benchmarks.bench_orderbook --orders 200000 [--json orderbook.json]
+"""
+import argparse
+import json
+import random
+import time
+
+from orderbook import BUY, SELL, OrderBook
+
+
+def order_flow(num_orders, spread, market_fraction, cancel_fraction, seed):
+    """预先生成订单流，避免把随机数生成计入撮合耗时。每个元素为 ("submit", side, quantity, price) 或 ("cancel",)。"""
+    rng = random.Random(seed)
+    mid = 10000
+    flow = []
+    for _ in range(num_orders):
+        r = rng.random()
+        if r < cancel_fraction:
+            flow.append(("cancel",))
+            continue
+        side = BUY if rng.random() < 0.5 else SELL
+        quantity = rng.randint(1, 100)
+        if r < cancel_fraction + market_fraction:
+            flow.append(("submit", side, quantity, None))
+        else:
+            # 买单大多低于中间价、卖单大多高于中间价，少部分越过中间价与对手方成交
+            offset = int(rng.gauss(spread / 4, spread / 2))
+            flow.append(("submit", side, quantity, mid - offset if side == BUY else mid + offset))
+    return flow
+
+
+def run(flow, seed):
+    """处理订单流，返回 (秒数, 成交笔数, 结束时的挂单数)。撤单随机选择一个仍在订单簿中的订单。"""
+    rng = random.Random(seed)
+    book = OrderBook("BENCH")
+    resting = []
+    trades = 0
+    start = time.perf_counter()
+    for event in flow:
+        if event[0] == "cancel":
+            if resting:
+                index = rng.randrange(len(resting))
+                resting[index], resting[-1] = resting[-1], resting[index]
+                book.cancel(resting.pop())
+            continue
+        _, side, quantity, price = event
+        order, fills = book.submit(None, side, quantity, price)
+        trades += len(fills)
+        if order.active:
+            resting.append(order.order_id)
+    return time.perf_counter() - start, trades, len(book)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="order book matching throughput benchmark")
+    parser.add_argument("--orders", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--spread", type=int, default=200, help="限价单偏离中间价的尺度（分）")
+    parser.add_argument("--market-fraction", type=float, default=0.1)
+    parser.add_argument("--cancel-fraction", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'orders':>9} {'seconds':>8} {'orders/s':>10} {'trades':>9} {'resting':>8}")
+    for num_orders in args.orders:
+        flow = order_flow(num_orders, args.spread, args.market_fraction, args.cancel_fraction, args.seed)
+        seconds, trades, resting = run(flow, args.seed)
+        results.append({"orders": num_orders, "spread": args.spread, "market_fraction": args.market_fraction,
+                        "cancel_fraction": args.cancel_fraction, "seconds": seconds,
+                        "orders_per_s": num_orders / seconds, "trades": trades, "resting": resting})
+        print(f"{num_orders:>9} {seconds:>8.2f} {num_orders / seconds:>10.0f} {trades:>9} {resting:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+模拟器基准套件：覆盖 run_simulation、buy_stock/sell_stock、execute_buffered、User.update_asset_history 和各策略的 execute。
+
+整体运行：对 用户数 × 股票数 × 交易概率 × 存储后端 的每个组合，在新的子进程中（保证峰值内存互不影响）用固定种子
+建立模拟器、预热价格窗口，再计时运行 --steps 步，输出 steps/s、trades/s、写入存储的行数/s 和子进程的峰值 RSS。
+成交笔数按价格更新次数计算（逐笔成交模式下每笔成交更新一次价格）；写入行数为交给存储后端的
+价格、余额、持仓和历史行数，SQLite 后端使用临时目录中的数据库文件。
+
+热点路径：在单个模拟器上分别计时 buy_stock/sell_stock、update_asset_history、策略 execute，
+以及 SQLite 后端 execute_buffered 提交缓冲语句的速度。
+
+结果连同当前 git 版本写入 JSON，--compare 读取之前保存的 JSON，按相同配置列出吞吐量的比值，用于比较两次提交。
+
+默认扫描 10 → 10000 个用户、3 → 1000 只股票，几分钟内跑完。100000 个用户需要显式指定：
+100000 个用户 × 1000 只股票时每步约 15-20 秒，每个配置要跑十几分钟；
+而且默认种子下预热阶段就有趋势跟踪者把资金恰好花光（余额为 0 即判定破产），计时阶段一步也不会运行。
+
+用法：python -m benchmarks.bench_simulator [--users 10 1000 100000] [--stocks 3 1000] [--json simulator.json] [--compare old.json]
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，不报告峰值内存
+    resource = None
+
+from server import STRATEGIES, StockMarketSimulator
+from storage import FlushPolicy, create_storage
+
+# 计入写入行数的存储方法：方法名 -> 从参数计算行数的函数
+WRITE_METHODS = {
+    "update_stock_price": lambda *args: 1,
+    "update_user_balance": lambda *args: 1,
+    "upsert_user_holdings": len,
+    "delete_user_holdings": len,
+    "update_user_balances": len,
+    "insert_stock_prices": len,
+    "insert_asset_history": len,
+}
+
+
+def count_writes(storage):
+    """
+    在存储后端实例上包装写方法，返回计数字典 {方法名: 写入行数}。
+    只包装实例属性，不修改类，也不影响同一进程中的其他后端。
+    """
+    counts = dict.fromkeys(WRITE_METHODS, 0)
+
+    def wrap(name, method, rows):
+        def counted(data, *args, **kwargs):
+            counts[name] += rows(data)
+            return method(data, *args, **kwargs)
+        return counted
+
+    for name, rows in WRITE_METHODS.items():
+        setattr(storage, name, wrap(name, getattr(storage, name), rows))
+    return counts
+
+
+def peak_rss_mb():
+    """当前进程的峰值 RSS（MB），不支持时返回 None。"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位为 KB，macOS 上为字节
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def build(config, path):
+    """按配置建立模拟器，一半趋势跟踪、一半随机交易者；path 为 SQLite 数据库文件。"""
+    random.seed(config["seed"])
+    options = {"path": path} if config["backend"] == "sqlite" else {}
+    storage = create_storage(config["backend"], **options)
+    stocks = {f"S{i}": (100.0 + i, 0.02) for i in range(config["stocks"])}
+    simulator = StockMarketSimulator(stocks, config["users"] // 2, config["users"] - config["users"] // 2,
+                                     trade_probability=config["trade_probability"],
+                                     initial_balance=config["initial_balance"], storage=storage,
+                                     event_driven=config["event_driven"])
+    return simulator
+
+
+def run_config(config):
+    """在子进程中运行一个配置，返回结果字典。"""
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        simulator = build(config, os.path.join(tmp, "bench.db"))
+        setup_s = time.perf_counter() - start
+        simulator.run_simulation(config["warmup"])
+
+        counts = count_writes(simulator.storage)
+        start = time.perf_counter()
+        simulator.run_simulation(config["steps"])
+        simulator.storage.flush()
+        run_s = time.perf_counter() - start
+        simulator.close_db_connection()
+
+    # 出现破产用户时模拟提前停止，实际运行的步数按写入的价格历史行数计算
+    steps = counts["insert_stock_prices"] // config["stocks"]
+    trades = counts["update_stock_price"]
+    rows = sum(counts.values())
+    return dict(config, setup_s=setup_s, run_s=run_s, steps_run=steps, steps_per_s=steps / run_s,
+                trades=trades, trades_per_s=trades / run_s, rows_written=rows, rows_per_s=rows / run_s,
+                peak_rss_mb=peak_rss_mb(), bankrupt=simulator.bankrupt_user is not None)
+
+
+def time_calls(function, calls):
+    """调用 function(i) calls 次，返回每秒调用次数。"""
+    start = time.perf_counter()
+    for i in range(calls):
+        function(i)
+    return calls / (time.perf_counter() - start)
+
+
+def hot_paths(num_users, num_stocks, calls, seed):
+    """在同一个内存后端模拟器上计时各热点路径，返回 [{"path": 名称, "per_s": 每秒次数}, ...]。"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        config = {"seed": seed, "backend": "memory", "users": num_users, "stocks": num_stocks,
+                  "trade_probability": 0.1, "initial_balance": 1000000.0, "event_driven": False}
+        simulator = build(config, None)
+        simulator.run_simulation(20)  # 预热价格窗口，让基于信号的策略有历史价格可用
+        users = list(simulator.users)
+        codes = list(simulator.stocks)
+        prices = {stock_code: stock_data['price'] for stock_code, stock_data in simulator.stocks.items()}
+        simulator.in_simulation = True  # 与 run_simulation 中一样只标记持仓和余额，不逐笔写回
+
+        results = []
+
+        def buy(i):
+            simulator.buy_stock(users[i % len(users)], codes[i % len(codes)], 1)
+
+        def sell(i):
+            simulator.sell_stock(users[i % len(users)], codes[i % len(codes)], 1)
+
+        results.append({"path": "buy_stock", "per_s": time_calls(buy, calls)})
+        results.append({"path": "sell_stock", "per_s": time_calls(sell, calls)})
+        results.append({"path": "update_asset_history",
+                        "per_s": time_calls(lambda i: users[i % len(users)].update_asset_history(i, prices), calls)})
+
+        for name in STRATEGIES:
+            strategy = simulator.create_strategy(name)
+            results.append({"path": f"{name}.execute",
+                            "per_s": time_calls(lambda i: strategy.execute(users[i % len(users)], simulator), calls)})
+        simulator.in_simulation = False
+        simulator.close_db_connection()
+
+        # execute_buffered：SQLite 后端一次提交 calls 个用户的余额更新和持仓写回，写回策略不限制缓冲区大小
+        storage = create_storage("sqlite", flush_policy=FlushPolicy(max_rows=None, max_bytes=None, max_interval=None))
+        storage.add_stock("S0", 100.0, 0.02)
+        for i in range(calls):
+            storage.add_user(f"U{i}", 10000.0, "Random")
+        storage.execute_buffered(force=True)
+        for i in range(calls):
+            storage.update_user_balance(f"U{i}", 9000.0 + i % 100)
+        storage.upsert_user_holdings([(f"U{i}", "S0", i % 100 + 1) for i in range(calls)])
+        rows = len(storage.sql_buffer)
+        start = time.perf_counter()
+        storage.execute_buffered(force=True)
+        results.append({"path": "execute_buffered", "per_s": rows / (time.perf_counter() - start)})
+        storage.close()
+    return results
+
+
+def revision():
+    """当前 git 提交，不在 git 仓库中时返回 None。"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def config_key(result):
+    return (result["backend"], result["users"], result["stocks"], result["trade_probability"], result["steps"],
+            result["event_driven"])
+
+
+def compare(results, hot, path):
+    """与之前保存的 JSON 比较，输出相同配置下吞吐量的比值（大于 1 表示变快）。"""
+    with open(path) as f:
+        old = json.load(f)
+    print(f"\ncompared with {old.get('revision')} ({path}):")
+    old_runs = {config_key(result): result for result in old.get("runs", [])}
+    for result in results:
+        before = old_runs.get(config_key(result))
+        if before is not None:
+            print(f"  {result['backend']:>6} users={result['users']} stocks={result['stocks']} "
+                  f"p={result['trade_probability']}: steps/s x{result['steps_per_s'] / before['steps_per_s']:.2f}")
+    old_hot = {item["path"]: item["per_s"] for item in old.get("hot_paths", [])}
+    for item in hot:
+        if item["path"] in old_hot:
+            print(f"  {item['path']}: x{item['per_s'] / old_hot[item['path']]:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="simulator hot path benchmark suite")
+    parser.add_argument("--users", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--stocks", type=int, nargs="+", default=[3, 1000])
+    parser.add_argument("--trade-probability", type=float, nargs="+", default=[0.1])
+    parser.add_argument("--steps", type=int, nargs="+", default=[20])
+    parser.add_argument("--backend", nargs="+", choices=["memory", "sqlite"], default=["memory", "sqlite"])
+    parser.add_argument("--initial-balance", type=float, default=1000000.0,
+                        help="初始资金，取得足够大以免有用户破产使模拟提前停止")
+    parser.add_argument("--event-driven", action="store_true", help="用事件驱动调度选出每步交易的用户")
+    parser.add_argument("--warmup", type=int, default=10, help="计时前运行的步数，用于填充价格窗口")
+    parser.add_argument("--hot-path-calls", type=int, default=20000, help="每个热点路径的调用次数，0 表示跳过")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    parser.add_argument("--compare", help="与之前保存的 JSON 结果比较")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'backend':>7} {'users':>7} {'stocks':>6} {'p':>5} {'steps':>5} {'steps/s':>9} {'trades/s':>10} "
+          f"{'rows/s':>10} {'rss_mb':>7}")
+    for backend, num_users, num_stocks, probability, steps in itertools.product(
+            args.backend, args.users, args.stocks, args.trade_probability, args.steps):
+        config = {"backend": backend, "users": num_users, "stocks": num_stocks, "trade_probability": probability,
+                  "steps": steps, "warmup": args.warmup, "initial_balance": args.initial_balance,
+                  "event_driven": args.event_driven, "seed": args.seed}
+        # 每个配置一个新进程，峰值 RSS 只反映该配置
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            result = pool.submit(run_config, config).result()
+        results.append(result)
+        rss = f"{result['peak_rss_mb']:.0f}" if result["peak_rss_mb"] is not None else "-"
+        print(f"{backend:>7} {num_users:>7} {num_stocks:>6} {probability:>5} {result['steps_run']:>5} "
+              f"{result['steps_per_s']:>9.1f} {result['trades_per_s']:>10.0f} {result['rows_per_s']:>10.0f} {rss:>7}"
+              + ("  (bankrupt, stopped early)" if result["bankrupt"] else ""))
+
+    hot = []
+    if args.hot_path_calls:
+        hot = hot_paths(1000, 10, args.hot_path_calls, args.seed)
+        print(f"\n{'hot path':>32} {'calls/s':>11}")
+        for item in hot:
+            print(f"{item['path']:>32} {item['per_s']:>11.0f}")
+
+    if args.compare:
+        compare(results, hot, args.compare)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"revision": revision(), "seed": args.seed, "runs": results, "hot_paths": hot}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+启动耗时基准：在 SQLite 数据库中预置不同数量的用户和持仓，测量 StockMarketSimulator 初始化耗时。
+同时给出旧的逐用户查询持仓（N+1 查询）的耗时作为对照。
+
+用法：python -m benchmarks.bench_startup --users 1000 10000 50000 [--json startup.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+
+from server import StockMarketSimulator
+from storage import SQLiteStorage
+
+STOCKS = {
+    "AAPL": (150.0, 0.02),
+    "GOOG": (270.0, 0.015),
+    "MSFT": (300.0, 0.025),
+}
+
+
+def populate(path, num_users):
+    """写入 num_users 个用户，每人持有所有股票。"""
+    storage = SQLiteStorage(path)
+    storage.insert_many(
+        "INSERT INTO stocks (stock_code, initial_price, volatility, current_price) VALUES (%s, %s, %s, %s)",
+        [(code, price, volatility, price) for code, (price, volatility) in STOCKS.items()])
+    storage.insert_many(
+        "INSERT INTO users (user_id, balance, strategy) VALUES (%s, %s, %s)",
+        [(f"User_{i}", 10000.0, "Random") for i in range(num_users)])
+    storage.insert_many(
+        "INSERT INTO user_holdings (user_id, stock_code, quantity) VALUES (%s, %s, %s)",
+        [(f"User_{i}", code, 5) for i in range(num_users) for code in STOCKS])
+    storage.close()
+
+
+def time_startup(path):
+    """模拟器初始化耗时（秒）。"""
+    storage = SQLiteStorage(path)
+    start = time.perf_counter()
+    simulator = StockMarketSimulator(STOCKS, num_trend_followers=5, num_random_traders=5, storage=storage)
+    elapsed = time.perf_counter() - start
+    simulator.close_db_connection()
+    return elapsed
+
+
+def time_per_user_holdings(path):
+    """旧做法：每个用户单独查询一次持仓的耗时（秒）。"""
+    storage = SQLiteStorage(path)
+    start = time.perf_counter()
+    for user_id, _, _ in storage.load_users():
+        storage.load_user_holdings(user_id)
+    elapsed = time.perf_counter() - start
+    storage.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="StockMarketSimulator startup benchmark")
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'users':>8} {'startup_s':>10} {'per_user_holdings_s':>20}")
+    for num_users in args.users:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "startup.db")
+            with contextlib.redirect_stdout(io.StringIO()):
+                populate(path, num_users)
+                startup = time_startup(path)
+                per_user = time_per_user_holdings(path)
+        results.append({"users": num_users, "startup_s": startup, "per_user_holdings_s": per_user})
+        print(f"{num_users:>8} {startup:>10.3f} {per_user:>20.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+模拟内核基准：同一配置下分别用 run_simulation 和 run_simulation_vectorized 运行，比较每步耗时。
+价格窗口先用向量化内核预热，保证策略在计时区间内有足够的历史价格可用。
+
+用法：python -m benchmarks.bench_vector_engine --users 1000 10000 --stocks 100 [--json vector.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import time
+
+from server import StockMarketSimulator
+from storage import MemoryStorage
+
+
+def check_running(simulator):
+    """有用户破产时两个内核都会立即停止，计时没有意义，直接报错退出。"""
+    if simulator.bankrupt_user is not None:
+        raise SystemExit(f"User {simulator.bankrupt_user.user_id} went bankrupt and the simulation stopped early; "
+                         f"rerun with a larger --initial-balance.")
+
+
+def build(num_users, num_stocks, trade_probability, warmup, seed, initial_balance):
+    """一半趋势跟踪、一半随机交易者，历史不写数据库。"""
+    random.seed(seed)
+    stocks = {f"S{i}": (100.0 + i, 0.02) for i in range(num_stocks)}
+    simulator = StockMarketSimulator(stocks, num_users // 2, num_users - num_users // 2,
+                                     trade_probability=trade_probability, initial_balance=initial_balance,
+                                     storage=MemoryStorage(), persist_history=False)
+    simulator.run_simulation_vectorized(warmup)
+    check_running(simulator)
+    return simulator
+
+
+def time_steps(simulator, run, steps):
+    """每步耗时（秒）。"""
+    start = time.perf_counter()
+    run(steps)
+    seconds = (time.perf_counter() - start) / steps
+    check_running(simulator)
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="run_simulation vs run_simulation_vectorized benchmark")
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--stocks", type=int, default=100)
+    parser.add_argument("--trade-probability", type=float, default=0.1)
+    parser.add_argument("--python-steps", type=int, default=2, help="逐用户内核的计时步数")
+    parser.add_argument("--vector-steps", type=int, default=20, help="向量化内核的计时步数")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--initial-balance", type=float, default=1000000.0,
+                        help="初始资金，取得足够大以免有用户破产使模拟提前停止")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'users':>8} {'stocks':>7} {'python_s/step':>14} {'vector_s/step':>14} {'speedup':>8}")
+    for num_users in args.users:
+        with contextlib.redirect_stdout(io.StringIO()):
+            simulator = build(num_users, args.stocks, args.trade_probability, args.warmup, args.seed,
+                              args.initial_balance)
+            python_s = time_steps(simulator, simulator.run_simulation, args.python_steps)
+            simulator = build(num_users, args.stocks, args.trade_probability, args.warmup, args.seed,
+                              args.initial_balance)
+            vector_s = time_steps(simulator, simulator.run_simulation_vectorized, args.vector_steps)
+        results.append({"users": num_users, "stocks": args.stocks, "trade_probability": args.trade_probability,
+                        "python_s_per_step": python_s, "vector_s_per_step": vector_s,
+                        "speedup": python_s / vector_s})
+        print(f"{num_users:>8} {args.stocks:>7} {python_s:>14.4f} {vector_s:>14.4f} {python_s / vector_s:>8.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,61 +1,67 @@
 CREATE DATABASE `stock_market_db`;
 USE `stock_market_db`;
 
+-- 与 server.py / storage.py 使用的表结构一致
+-- 旧版 t_* 表中的数据可以用 MySQLStorage(...).migrate_schema() 导入
+
 -- 用户表
-CREATE TABLE `t_user`(
-    `user_id`     VARCHAR(100) NOT NULL COMMENT '用户ID',
-    `balance`     DECIMAL(15, 2) NOT NULL COMMENT '账户余额',
-    `strategy`    VARCHAR(255) NULL DEFAULT NULL COMMENT '交易策略',
-    `create_time` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
-    `update_time` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+CREATE TABLE `users`(
+    `user_id`  VARCHAR(255) NOT NULL COMMENT '用户ID',
+    `balance`  DECIMAL(15, 2) NOT NULL COMMENT '账户余额',
+    `strategy` VARCHAR(255) NULL DEFAULT NULL COMMENT '交易策略',
     PRIMARY KEY (`user_id`) USING BTREE
 ) ENGINE = InnoDB COMMENT = '用户表';
 
 -- 股票表
-CREATE TABLE `t_stock`(
-    `stock_code`    VARCHAR(50) NOT NULL COMMENT '股票代码',
+CREATE TABLE `stocks`(
+    `stock_code`    VARCHAR(255) NOT NULL COMMENT '股票代码',
     `initial_price` DECIMAL(10, 2) NOT NULL COMMENT '初始价格',
     `volatility`    DECIMAL(5, 4) NOT NULL COMMENT '波动率',
-    `create_time`   TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
-    `update_time`   TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    `current_price` DECIMAL(10, 2) NOT NULL COMMENT '当前价格',
     PRIMARY KEY (`stock_code`) USING BTREE
 ) ENGINE = InnoDB COMMENT = '股票表';
 
 -- 用户持仓表
-CREATE TABLE `t_user_holding`(
-    `id`          INT(11) NOT NULL AUTO_INCREMENT COMMENT '主键ID',
-    `user_id`     VARCHAR(100) NOT NULL COMMENT '用户ID',
-    `stock_code`  VARCHAR(50) NOT NULL COMMENT '股票代码',
-    `quantity`    INT(11) NOT NULL COMMENT '持有数量',
-    `create_time` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
-    `update_time` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
-    PRIMARY KEY (`id`) USING BTREE,
-    CONSTRAINT `fk_user_holding_user` FOREIGN KEY (`user_id`)
-        REFERENCES `t_user` (`user_id`) ON DELETE CASCADE,
-    CONSTRAINT `fk_user_holding_stock` FOREIGN KEY (`stock_code`)
-        REFERENCES `t_stock` (`stock_code`) ON DELETE CASCADE
-) ENGINE = InnoDB AUTO_INCREMENT = 1 COMMENT = '用户持仓表';
+CREATE TABLE `user_holdings`(
+    `user_id`    VARCHAR(255) NOT NULL COMMENT '用户ID',
+    `stock_code` VARCHAR(255) NOT NULL COMMENT '股票代码',
+    `quantity`   INT NOT NULL COMMENT '持有数量',
+    PRIMARY KEY (`user_id`, `stock_code`) USING BTREE,
+    CONSTRAINT `fk_user_holdings_user` FOREIGN KEY (`user_id`)
+        REFERENCES `users` (`user_id`) ON DELETE CASCADE,
+    CONSTRAINT `fk_user_holdings_stock` FOREIGN KEY (`stock_code`)
+        REFERENCES `stocks` (`stock_code`) ON DELETE CASCADE
+) ENGINE = InnoDB COMMENT = '用户持仓表';
 
--- 股票价格历史表
-CREATE TABLE `t_stock_price`(
-    `id`          INT(11) NOT NULL AUTO_INCREMENT COMMENT '主键ID',
-    `stock_code`  VARCHAR(50) NOT NULL COMMENT '股票代码',
-    `price`       DECIMAL(10, 2) NOT NULL COMMENT '价格',
-    `timestamp`   TIMESTAMP NOT NULL COMMENT '时间戳',
-    `create_time` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
-    PRIMARY KEY (`id`) USING BTREE,
-    CONSTRAINT `fk_stock_price_stock` FOREIGN KEY (`stock_code`)
-        REFERENCES `t_stock` (`stock_code`) ON DELETE CASCADE
-) ENGINE = InnoDB AUTO_INCREMENT = 1 COMMENT = '股票价格历史表';
+-- 股票价格历史表：按 (股票代码, 时间戳) 聚簇，查询某只股票一段时间的价格只扫描相关的行
+CREATE TABLE `stock_prices`(
+    `id`         BIGINT NOT NULL AUTO_INCREMENT COMMENT '自增ID',
+    `stock_code` VARCHAR(255) NOT NULL COMMENT '股票代码',
+    `timestamp`  INT NOT NULL COMMENT '模拟时间步',
+    `price`      DECIMAL(10, 2) NOT NULL COMMENT '价格',
+    PRIMARY KEY (`stock_code`, `timestamp`, `id`) USING BTREE,
+    KEY `idx_stock_prices_id` (`id`),
+    CONSTRAINT `fk_stock_prices_stock` FOREIGN KEY (`stock_code`)
+        REFERENCES `stocks` (`stock_code`) ON DELETE CASCADE
+) ENGINE = InnoDB COMMENT = '股票价格历史表';
 
--- 资产历史表
-CREATE TABLE `t_asset_history`(
-    `id`          INT(11) NOT NULL AUTO_INCREMENT COMMENT '主键ID',
-    `user_id`     VARCHAR(100) NOT NULL COMMENT '用户ID',
+-- 资产历史表：按 (用户ID, 时间戳) 聚簇
+CREATE TABLE `asset_history`(
+    `id`          BIGINT NOT NULL AUTO_INCREMENT COMMENT '自增ID',
+    `user_id`     VARCHAR(255) NOT NULL COMMENT '用户ID',
+    `timestamp`   INT NOT NULL COMMENT '模拟时间步',
     `asset_value` DECIMAL(15, 2) NOT NULL COMMENT '资产价值',
-    `timestamp`   TIMESTAMP NOT NULL COMMENT '时间戳',
-    `create_time` TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
-    PRIMARY KEY (`id`) USING BTREE,
+    PRIMARY KEY (`user_id`, `timestamp`, `id`) USING BTREE,
+    KEY `idx_asset_history_id` (`id`),
     CONSTRAINT `fk_asset_history_user` FOREIGN KEY (`user_id`)
-        REFERENCES `t_user` (`user_id`) ON DELETE CASCADE
-) ENGINE = InnoDB AUTO_INCREMENT = 1 COMMENT = '资产历史表';
+        REFERENCES `users` (`user_id`) ON DELETE CASCADE
+) ENGINE = InnoDB COMMENT = '资产历史表';
+
+-- 可选：按时间步做 RANGE 分区（分区表不支持外键，需要去掉上面两张历史表的外键约束）
+-- 也可以用 MySQLStorage(..., partition_step=100000) 让程序建表并自动追加分区
+-- ALTER TABLE `stock_prices` DROP FOREIGN KEY `fk_stock_prices_stock`;
+-- ALTER TABLE `stock_prices` PARTITION BY RANGE (`timestamp`) (
+--     PARTITION p100000 VALUES LESS THAN (100000),
+--     PARTITION p200000 VALUES LESS THAN (200000),
+--     PARTITION pmax VALUES LESS THAN MAXVALUE
+-- );
@@ -0,0 +1,490 @@
+"""
+图形界面：登录对话框和主窗口。PyQt5 和 matplotlib 只在这里导入，
+无界面的批量运行（python server.py run ...）不需要加载它们，也不需要显示器。
+"""
+import sys
+
+from PyQt5.QtWidgets import (QApplication, QWidget, QTabWidget, QVBoxLayout,
+                             QPushButton, QTableWidget, QTableWidgetItem,
+                             QComboBox, QHBoxLayout,
+                             QMessageBox, QLabel, QLineEdit, QDialog, QFormLayout)
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+import matplotlib.figure as mpl_fig
+
+from money import to_ticks, to_decimal
+from server import DEFAULT_STOCKS, STRATEGIES, StockMarketSimulator
+
+
+class LoginDialog(QDialog):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Login")
+        self.setGeometry(200, 200, 300, 150)
+
+        layout = QFormLayout()
+
+        self.username_label = QLabel("Username:")
+        self.username_input = QLineEdit()
+        layout.addRow(self.username_label, self.username_input)
+
+        self.password_label = QLabel("Password:")
+        self.password_input = QLineEdit()
+        self.password_input.setEchoMode(QLineEdit.Password)  # 密码模式
+        layout.addRow(self.password_label, self.password_input)
+
+        self.login_button = QPushButton("Login")
+        self.login_button.clicked.connect(self.accept)  # 点击登录时关闭对话框
+        layout.addRow(self.login_button)
+
+        self.setLayout(layout)
+
+    def get_credentials(self):
+        """返回用户名和密码。"""
+        return self.username_input.text(), self.password_input.text()
+
+class MainWindow(QWidget):
+    def __init__(self, simulator):
+        super().__init__()
+        self.simulator = simulator
+        self.setWindowTitle("Stock Market Simulator")
+        self.setGeometry(100, 100, 1200, 800)
+
+        self.tabs = QTabWidget()
+        self.admin_tab = QWidget()
+        self.trader_tab = QWidget()
+
+        self.tabs.addTab(self.admin_tab, "Admin")
+        self.tabs.addTab(self.trader_tab, "Trader")
+
+        self.init_admin_tab()
+        self.init_trader_tab()
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.tabs)
+        self.setLayout(layout)
+
+        # 默认隐藏所有标签页
+        self.tabs.setTabEnabled(0, False)  # Admin Tab
+        self.tabs.setTabEnabled(1, False)  # Trader Tab
+
+    def init_admin_tab(self):
+        """初始化管理员标签页。"""
+        layout = QVBoxLayout()
+
+        # 股票价格图表
+        self.admin_stock_figure = mpl_fig.Figure(figsize=(5, 4), dpi=100)
+        self.admin_stock_canvas = FigureCanvas(self.admin_stock_figure)
+        self.admin_stock_ax = self.admin_stock_figure.add_subplot(111)
+        layout.addWidget(self.admin_stock_canvas)
+
+        # 用户资产图表
+        self.admin_asset_figure = mpl_fig.Figure(figsize=(5, 4), dpi=100)
+        self.admin_asset_canvas = FigureCanvas(self.admin_asset_figure)
+        self.admin_asset_ax = self.admin_asset_figure.add_subplot(111)
+        layout.addWidget(self.admin_asset_canvas)
+
+        # 时间步输入框
+        hbox = QHBoxLayout()
+        self.admin_time_step_label = QLabel("Time Steps:")
+        self.admin_time_step_input = QLineEdit("1")  # 默认值1
+        hbox.addWidget(self.admin_time_step_label)
+        hbox.addWidget(self.admin_time_step_input)
+        layout.addLayout(hbox)
+
+        # 运行按钮
+        self.admin_time_step_button = QPushButton("Run Simulation Steps")
+        self.admin_time_step_button.clicked.connect(self.run_admin_simulation_steps)
+        layout.addWidget(self.admin_time_step_button)
+
+        # 添加股票的输入框和按钮
+        stock_hbox = QHBoxLayout()
+        self.add_stock_code_label = QLabel("Stock Code:")
+        self.add_stock_code_input = QLineEdit()
+        self.add_stock_price_label = QLabel("Initial Price:")
+        self.add_stock_price_input = QLineEdit()
+        self.add_stock_volatility_label = QLabel("Volatility:")
+        self.add_stock_volatility_input = QLineEdit()
+        self.add_stock_button = QPushButton("Add Stock")
+        self.add_stock_button.clicked.connect(self.add_stock)
+
+        stock_hbox.addWidget(self.add_stock_code_label)
+        stock_hbox.addWidget(self.add_stock_code_input)
+        stock_hbox.addWidget(self.add_stock_price_label)
+        stock_hbox.addWidget(self.add_stock_price_input)
+        stock_hbox.addWidget(self.add_stock_volatility_label)
+        stock_hbox.addWidget(self.add_stock_volatility_input)
+        stock_hbox.addWidget(self.add_stock_button)
+        layout.addLayout(stock_hbox)
+
+        # 删除股票的输入框和按钮
+        remove_stock_hbox = QHBoxLayout()
+        self.remove_stock_code_label = QLabel("Stock Code to Remove:")
+        self.remove_stock_code_combo = QComboBox()  # 使用 QComboBox
+        self.remove_stock_button = QPushButton("Remove Stock")
+        self.remove_stock_button.clicked.connect(self.remove_stock)
+        remove_stock_hbox.addWidget(self.remove_stock_code_label)
+        remove_stock_hbox.addWidget(self.remove_stock_code_combo)
+        remove_stock_hbox.addWidget(self.remove_stock_button)
+        layout.addLayout(remove_stock_hbox)
+
+        # 添加用户的输入框和按钮
+        user_hbox = QHBoxLayout()
+        self.add_user_id_label = QLabel("User ID:")
+        self.add_user_id_input = QLineEdit()
+        self.add_user_balance_label = QLabel("Initial Balance:")
+        self.add_user_balance_input = QLineEdit()
+        self.add_user_strategy_label = QLabel("Strategy:")
+        self.add_user_strategy_combo = QComboBox()  # 添加策略选择
+        self.add_user_strategy_combo.addItems(list(STRATEGIES))  # 所有已注册的策略
+        self.add_user_strategy_combo.setCurrentText("MeanReversion")
+        self.add_user_button = QPushButton("Add User")
+        self.add_user_button.clicked.connect(self.add_user)
+
+        user_hbox.addWidget(self.add_user_id_label)
+        user_hbox.addWidget(self.add_user_id_input)
+        user_hbox.addWidget(self.add_user_balance_label)
+        user_hbox.addWidget(self.add_user_balance_input)
+        user_hbox.addWidget(self.add_user_strategy_label)
+        user_hbox.addWidget(self.add_user_strategy_combo)
+        user_hbox.addWidget(self.add_user_button)
+        layout.addLayout(user_hbox)
+
+        # 删除用户的输入框和按钮
+        remove_user_hbox = QHBoxLayout()
+        self.remove_user_id_label = QLabel("User ID to Remove:")
+        self.remove_user_id_combo = QComboBox()  # 使用 QComboBox
+        self.remove_user_button = QPushButton("Remove User")
+        self.remove_user_button.clicked.connect(self.remove_user)
+        remove_user_hbox.addWidget(self.remove_user_id_label)
+        remove_user_hbox.addWidget(self.remove_user_id_combo)
+        remove_user_hbox.addWidget(self.remove_user_button)
+        layout.addLayout(remove_user_hbox)
+
+        # 股票信息表格
+        self.stock_table = QTableWidget()
+        self.stock_table.setColumnCount(4)
+        self.stock_table.setHorizontalHeaderLabels(["Code", "Price", "Volatility", "Holders"])
+        layout.addWidget(self.stock_table)
+
+        # 用户信息表格
+        self.user_table = QTableWidget()
+        self.user_table.setColumnCount(3)
+        self.user_table.setHorizontalHeaderLabels(["ID", "Balance", "Strategy"])
+        layout.addWidget(self.user_table)
+
+        # 刷新按钮
+        self.refresh_button = QPushButton("Refresh Data")
+        self.refresh_button.clicked.connect(self.refresh_data)
+        layout.addWidget(self.refresh_button)
+
+        self.admin_tab.setLayout(layout)
+
+    def init_trader_tab(self):
+        """初始化交易员标签页。"""
+        layout = QVBoxLayout()
+
+        # 股票价格图表
+        self.trader_stock_figure = mpl_fig.Figure(figsize=(5, 4), dpi=100)
+        self.trader_stock_canvas = FigureCanvas(self.trader_stock_figure)
+        self.trader_stock_ax = self.trader_stock_figure.add_subplot(111)
+        layout.addWidget(self.trader_stock_canvas)
+
+        # 资产信息
+        self.asset_label = QLabel("Asset: N/A")
+        layout.addWidget(self.asset_label)
+
+        # 股票选择
+        hbox = QHBoxLayout()
+        self.stock_label = QLabel("Stock:")
+        self.stock_combo = QComboBox()
+        hbox.addWidget(self.stock_label)
+        hbox.addWidget(self.stock_combo)
+        layout.addLayout(hbox)
+
+        # 交易数量
+        hbox = QHBoxLayout()
+        self.quantity_label = QLabel("Quantity:")
+        self.quantity_input = QLineEdit("1")  # 默认值1
+        hbox.addWidget(self.quantity_label)
+        hbox.addWidget(self.quantity_input)
+        layout.addLayout(hbox)
+
+        # 限价：留空时按当前价格立即成交，填写后作为限价单提交到订单簿
+        hbox = QHBoxLayout()
+        self.limit_price_label = QLabel("Limit Price:")
+        self.limit_price_input = QLineEdit()
+        self.limit_price_input.setPlaceholderText("market")
+        hbox.addWidget(self.limit_price_label)
+        hbox.addWidget(self.limit_price_input)
+        layout.addLayout(hbox)
+
+        # 买入和卖出按钮
+        hbox = QHBoxLayout()
+        self.buy_button = QPushButton("Buy")
+        self.buy_button.clicked.connect(self.buy_stock)
+        self.sell_button = QPushButton("Sell")
+        self.sell_button.clicked.connect(self.sell_stock)
+        hbox.addWidget(self.buy_button)
+        hbox.addWidget(self.sell_button)
+        layout.addLayout(hbox)
+
+        # 交易信息表格
+        self.trade_table = QTableWidget()
+        self.trade_table.setColumnCount(3)
+        self.trade_table.setHorizontalHeaderLabels(["Stock", "Quantity", "Action"])
+        layout.addWidget(self.trade_table)
+
+        self.trader_tab.setLayout(layout)
+
+    def run_admin_simulation_steps(self):
+        """运行管理员界面的模拟步骤。"""
+        try:
+            num_steps = self.validate_int_input(self.admin_time_step_input.text(), "Number of time steps")
+            if num_steps is not None:
+                self.simulator.run_simulation(num_steps)
+                self.refresh_data()
+                self.update_admin_plots()
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Error running simulation: {str(e)}")
+
+    def add_stock(self):
+        """添加股票到模拟器。"""
+        try:
+            code = self.add_stock_code_input.text().strip()
+            price = self.validate_float_input(self.add_stock_price_input.text(), "Initial price")
+            volatility = self.validate_float_input(self.add_stock_volatility_input.text(), "Volatility")
+
+            if not code:
+                QMessageBox.warning(self, "Error", "Stock code cannot be empty.")
+                return
+
+            if price is None or volatility is None:
+                return
+
+            self.simulator.add_stock(code, price, volatility)
+            self.refresh_data()
+            self.update_admin_plots()
+            QMessageBox.information(self, "Success", f"Stock {code} added successfully.")
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Error adding stock: {str(e)}")
+
+    def remove_stock(self):
+        """从模拟器中移除股票。"""
+        try:
+            code = self.remove_stock_code_combo.currentText()
+            self.simulator.remove_stock(code)
+            self.refresh_data()
+            self.update_admin_plots()
+            QMessageBox.information(self, "Success", f"Stock {code} removed successfully.")
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Error removing stock: {str(e)}")
+
+    def add_user(self):
+        """添加用户到模拟器。"""
+        try:
+            user_id = self.add_user_id_input.text().strip()
+            balance = self.validate_float_input(self.add_user_balance_input.text(), "Initial balance")
+            strategy = self.add_user_strategy_combo.currentText()
+
+            if not user_id:
+                QMessageBox.warning(self, "Error", "User ID cannot be empty.")
+                return
+
+            if balance is None:
+                return
+
+            self.simulator.add_user(user_id, balance, strategy)
+            self.refresh_data()
+            self.update_admin_plots()
+            QMessageBox.information(self, "Success", f"User {user_id} added successfully.")
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Error adding user: {str(e)}")
+
+    def remove_user(self):
+        """从模拟器中移除用户。"""
+        try:
+            user_id = self.remove_user_id_combo.currentText()
+            self.simulator.remove_user(user_id)
+            self.refresh_data()
+            self.update_admin_plots()
+            QMessageBox.information(self, "Success", f"User {user_id} removed successfully.")
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Error removing user: {str(e)}")
+
+    def buy_stock(self):
+        """购买股票。"""
+        try:
+            stock_code = self.stock_combo.currentText()
+            quantity = self.validate_int_input(self.quantity_input.text(), "Quantity")
+
+            if quantity is None:
+                return
+
+            if self.limit_price_input.text().strip():
+                self.submit_limit_order(stock_code, quantity)
+                return
+
+            self.simulator.buy_stock(self.simulator.player, stock_code, quantity)
+            self.refresh_data()
+            self.update_trader_plots()
+            QMessageBox.information(self, "Success", f"Bought {quantity} shares of {stock_code}.")
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Error buying stock: {str(e)}")
+
+    def sell_stock(self):
+        """卖出股票。"""
+        try:
+            stock_code = self.stock_combo.currentText()
+            quantity = self.validate_int_input(self.quantity_input.text(), "Quantity")
+
+            if quantity is None:
+                return
+
+            if self.limit_price_input.text().strip():
+                self.submit_limit_order(stock_code, -quantity)
+                return
+
+            self.simulator.sell_stock(self.simulator.player, stock_code, quantity)
+            self.refresh_data()
+            self.update_trader_plots()
+            QMessageBox.information(self, "Success", f"Sold {quantity} shares of {stock_code}.")
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Error selling stock: {str(e)}")
+
+    def submit_limit_order(self, stock_code, quantity):
+        """把玩家的限价单提交到订单簿，quantity 为负表示卖出。"""
+        limit_price = self.validate_float_input(self.limit_price_input.text(), "Limit price")
+        if limit_price is None:
+            return
+        if limit_price <= 0:
+            QMessageBox.warning(self, "Error", "Limit price must be positive.")
+            return
+
+        order, fills = self.simulator.submit_order(self.simulator.player, stock_code, quantity, to_ticks(limit_price))
+        self.refresh_data()
+        self.update_trader_plots()
+        if order is None:
+            QMessageBox.warning(self, "Error", f"Order for {stock_code} was rejected.")
+            return
+        filled = order.quantity - order.remaining
+        QMessageBox.information(self, "Success", f"Order {order.order_id} for {stock_code}: {filled} filled, "
+                                                 f"{order.remaining if order.active else 0} resting.")
+
+    def validate_int_input(self, text, field_name):
+        """验证整数输入。"""
+        try:
+            value = int(text)
+            return value
+        except ValueError:
+            QMessageBox.warning(self, "Error", f"Invalid input for {field_name}. Please enter an integer.")
+            return None
+
+    def validate_float_input(self, text, field_name):
+        """验证浮点数输入。"""
+        try:
+            value = float(text)
+            return value
+        except ValueError:
+            QMessageBox.warning(self, "Error", f"Invalid input for {field_name}. Please enter a number.")
+            return None
+
+    def refresh_data(self):
+        """刷新所有表格和下拉菜单的数据。"""
+        self.update_stock_table()
+        self.update_user_table()
+        self.update_stock_combo()
+        self.update_user_combo()
+        self.update_trader_plots()
+        self.update_admin_plots()
+
+    def update_stock_table(self):
+        """更新股票信息表格。"""
+        self.stock_table.setRowCount(0)
+        for code, data in self.simulator.stocks.items():
+            row_position = self.stock_table.rowCount()
+            self.stock_table.insertRow(row_position)
+            self.stock_table.setItem(row_position, 0, QTableWidgetItem(code))
+            self.stock_table.setItem(row_position, 1, QTableWidgetItem(str(to_decimal(data['price']))))
+            self.stock_table.setItem(row_position, 2, QTableWidgetItem(str(data['volatility'])))
+            holders = len(self.simulator.holders(code))
+            self.stock_table.setItem(row_position, 3, QTableWidgetItem(str(holders)))
+
+    def update_user_table(self):
+        """更新用户信息表格。"""
+        self.user_table.setRowCount(0)
+        for user in self.simulator.users:
+            row_position = self.user_table.rowCount()
+            self.user_table.insertRow(row_position)
+            self.user_table.setItem(row_position, 0, QTableWidgetItem(user.user_id))
+            self.user_table.setItem(row_position, 1, QTableWidgetItem(str(to_decimal(user.balance))))
+            self.user_table.setItem(row_position, 2, QTableWidgetItem(user.strategy.__class__.__name__ if user.strategy else "None"))
+
+    def update_stock_combo(self):
+        """更新股票下拉菜单。"""
+        self.stock_combo.clear()
+        self.remove_stock_code_combo.clear()
+        stock_codes = list(self.simulator.stocks.keys())
+        self.stock_combo.addItems(stock_codes)
+        self.remove_stock_code_combo.addItems(stock_codes)
+
+    def update_user_combo(self):
+        """更新用户下拉菜单。"""
+        self.remove_user_id_combo.clear()
+        user_ids = [user.user_id for user in self.simulator.users]
+        self.remove_user_id_combo.addItems(user_ids)
+
+    def update_trader_plots(self):
+        """更新交易员界面的图表。"""
+        self.simulator.plot_price_history(self.trader_stock_ax, stock_codes=self.simulator.stocks.keys())
+        asset_value = self.simulator.asset_value(self.simulator.player)
+        self.asset_label.setText(f"Asset: {to_decimal(asset_value)}")
+        self.trader_stock_canvas.draw()
+
+    def update_admin_plots(self):
+        """更新管理员界面的图表。"""
+        self.simulator.plot_price_history(self.admin_stock_ax, stock_codes=self.simulator.stocks.keys())
+        self.simulator.plot_asset_history(self.admin_asset_ax, user_ids=[user.user_id for user in self.simulator.users])
+        self.admin_stock_canvas.draw()
+        self.admin_asset_canvas.draw()
+
+    def show_login_dialog(self):
+        """显示登录对话框。"""
+        dialog = LoginDialog()
+        result = dialog.exec_()  # 显示对话框并等待用户操作
+
+        if result == QDialog.Accepted:
+            username, password = dialog.get_credentials()
+            # 在这里添加你的身份验证逻辑
+            if username == "admin" and password == "password":
+                QMessageBox.information(self, "Login", "Login successful!")
+                self.tabs.setTabEnabled(0, True)  # Admin Tab
+                self.tabs.setTabEnabled(1, True)  # Trader Tab
+                self.refresh_data()
+            else:
+                QMessageBox.warning(self, "Login", "Invalid credentials.")
+
+    def closeEvent(self, event):
+        """关闭窗口事件处理函数。"""
+        self.simulator.close_db_connection()
+        event.accept()
+
+
+def main(argv=None):
+    """启动图形界面，argv 传给 QApplication。"""
+    app = QApplication(sys.argv if argv is None else argv)
+
+    # 创建模拟器
+    simulator = StockMarketSimulator(stocks=DEFAULT_STOCKS, num_trend_followers=5, num_random_traders=5)
+
+    # 创建主窗口
+    window = MainWindow(simulator)
+    window.show()
+
+    # 显示登录对话框
+    window.show_login_dialog()
+
+    return app.exec_()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import os
+import mmap
+import array
+import bisect
+from urllib.parse import quote
+
+try:
+    import numpy as np
+except ImportError:  # 没有 NumPy 时返回 memoryview
+    np = None
+
+
+class ColumnarHistoryStore:
+    """
+    按列存储的价格和资产历史。
+    每个序列（一只股票或一个用户）对应两个定长二进制文件：<key>.ts 存 int64 时间戳，<key>.val 存 float64 数值，
+    字节序为本机字节序。每步追加写入，读取时通过 mmap 映射，返回 NumPy 数组或 memoryview，不复制数据。
+    """
+
+    PRICES = "prices"
+    ASSETS = "assets"
+
+    def __init__(self, directory):
+        self.directory = directory
+        for kind in (self.PRICES, self.ASSETS):
+            os.makedirs(os.path.join(directory, kind), exist_ok=True)
+        self.pending = {}  # (kind, key) -> (array('q'), array('d'))，尚未写入文件的数据
+
+    def path(self, kind, key, column):
+        # 股票代码和用户ID可能含有文件名中不允许的字符
+        return os.path.join(self.directory, kind, f"{quote(key, safe='')}.{column}")
+
+    def append(self, kind, key, timestamp, value):
+        """追加一个点，调用 flush() 后写入文件。"""
+        series = self.pending.get((kind, key))
+        if series is None:
+            series = self.pending[(kind, key)] = (array.array("q"), array.array("d"))
+        series[0].append(timestamp)
+        series[1].append(value)
+
+    def append_prices(self, data):
+        """追加 (stock_code, timestamp, price) 记录，格式与 insert_stock_prices 相同。"""
+        for stock_code, timestamp, price in data:
+            self.append(self.PRICES, stock_code, timestamp, float(price))
+
+    def append_assets(self, data):
+        """追加 (user_id, timestamp, asset_value) 记录，格式与 insert_asset_history 相同。"""
+        for user_id, timestamp, asset_value in data:
+            self.append(self.ASSETS, user_id, timestamp, float(asset_value))
+
+    def flush(self):
+        """把缓存的数据追加到文件末尾，每个序列每次只打开一次文件。"""
+        for (kind, key), (timestamps, values) in self.pending.items():
+            with open(self.path(kind, key, "ts"), "ab") as f:
+                timestamps.tofile(f)
+            with open(self.path(kind, key, "val"), "ab") as f:
+                values.tofile(f)
+        self.pending.clear()
+
+    def map_column(self, kind, key, column, typecode):
+        """只读映射一列，文件不存在或为空时返回空数组。"""
+        path = self.path(kind, key, column)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            if np is not None:
+                return np.empty(0, dtype=np.int64 if typecode == "q" else np.float64)
+            return memoryview(array.array(typecode))
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # 视图持有 mmap 的引用，视图释放后映射随之关闭
+        if np is not None:
+            return np.frombuffer(mm, dtype=np.int64 if typecode == "q" else np.float64)
+        return memoryview(mm).cast(typecode)
+
+    def series(self, kind, key, start=None, end=None):
+        """返回 [start, end] 内的 (timestamps, values) 视图，已 flush 的数据才可见。"""
+        timestamps = self.map_column(kind, key, "ts", "q")
+        values = self.map_column(kind, key, "val", "d")
+        if start is None and end is None:
+            return timestamps, values
+        # 时间戳按追加顺序递增，二分查找区间
+        if np is not None:
+            low = 0 if start is None else int(np.searchsorted(timestamps, start, side="left"))
+            high = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side="right"))
+        else:
+            low = 0 if start is None else bisect.bisect_left(timestamps, start)
+            high = len(timestamps) if end is None else bisect.bisect_right(timestamps, end)
+        return timestamps[low:high], values[low:high]
+
+    def prices(self, stock_code, start=None, end=None):
+        """股票价格历史。"""
+        return self.series(self.PRICES, stock_code, start, end)
+
+    def asset_history(self, user_id, start=None, end=None):
+        """用户资产历史。"""
+        return self.series(self.ASSETS, user_id, start, end)
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,222 @@
+from array import array
+
+
+class PriceHistory:
+    """
+    一只股票的价格序列（stocks[code]['prices']）：只保留最近 capacity 个价格的环形缓冲区，
+    底层是类型化数组（默认 int64，价格以分为单位），追加是 O(1)，内存占用与运行时长无关，更早的价格从持久化存储读取（见 StockMarketSimulator.load_price_history）。
+    同时维护已注册窗口的滚动和：append 时每个窗口只加上新价格、减去移出窗口的旧价格；
+    所有策略读取同一窗口的均线时共享同一个结果，计算量只与 股票数 × 窗口数 有关，与用户数无关。
+    支持 len()、迭代、整数下标和切片（返回列表），顺序从旧到新。
+    """
+
+    def __init__(self, prices=(), windows=(), capacity=0, typecode="q"):
+        windows = tuple(windows)
+        self.capacity = max(capacity, max(windows, default=0), 1)
+        self.buffer = array(typecode, [0]) * self.capacity
+        self.start = 0  # 最旧价格在 buffer 中的位置
+        self.length = 0
+        self.sums = {}  # window -> 最近 window 个价格之和
+        for window in windows:
+            self.register(window)
+        self.extend(prices)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for i in range(self.length):
+            yield self.buffer[(self.start + i) % self.capacity]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.buffer[(self.start + i) % self.capacity] for i in range(*index.indices(self.length))]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("price history index out of range")
+        return self.buffer[(self.start + index) % self.capacity]
+
+    def __repr__(self):
+        return f"PriceHistory({self.tolist()!r}, capacity={self.capacity})"
+
+    def tolist(self):
+        return list(self)
+
+    def resize(self, capacity):
+        """调整容量，只保留最近 capacity 个价格。"""
+        prices = self[-capacity:]
+        self.capacity = capacity
+        self.buffer = array(self.buffer.typecode, prices) + array(self.buffer.typecode, [0]) * (capacity - len(prices))
+        self.start = 0
+        self.length = len(prices)
+
+    def register(self, window):
+        """注册一个窗口，之后每次追加价格都会更新它的滚动和；窗口超过容量时扩容。"""
+        if window > self.capacity:
+            self.resize(window)
+        if window not in self.sums:
+            self.sums[window] = sum(self[-window:])
+
+    def resum(self):
+        """重新计算所有窗口的和；整数价格的滚动和是精确的，浮点价格需要借此消除累积的舍入误差。"""
+        for window in self.sums:
+            self.sums[window] = sum(self[-window:])
+
+    def append(self, price):
+        buffer, capacity, end = self.buffer, self.capacity, self.start + self.length
+        sums = self.sums
+        for window, total in sums.items():
+            if self.length >= window:
+                total -= buffer[(end - window) % capacity]  # 移出窗口的最旧价格
+            sums[window] = total + price
+        if self.length < capacity:
+            buffer[end % capacity] = price
+            self.length += 1
+        else:
+            buffer[self.start] = price
+            self.start = (self.start + 1) % capacity
+            if self.start == 0:
+                self.resum()  # 每绕一圈重算一次，摊销后仍是 O(1)
+
+    def extend(self, prices):
+        for price in prices:
+            self.append(price)
+
+    def __iadd__(self, prices):
+        self.extend(prices)
+        return self
+
+    def moving_average(self, window):
+        """最近 window 个价格的均值，价格点不足时返回 None。未注册的窗口在第一次读取时注册（超过容量时扩容）。"""
+        # 先注册再检查长度：否则超过当前容量的窗口永远攒不够价格点
+        if window not in self.sums:
+            self.register(window)
+        if self.length < window:
+            return None
+        return self.sums[window] / window
+
+
+def moving_average(prices, window):
+    """最近 window 个价格的均值，价格点不足时返回 None；普通列表按原来的方式求和。"""
+    if isinstance(prices, PriceHistory):
+        return prices.moving_average(window)
+    if len(prices) < window:
+        return None
+    return sum(prices[-window:]) / window
+
+
+class AssetHistory:
+    """
+    一个用户的资产历史（User.asset_history）：(timestamp, asset_value) 依次交错存放在一个 int64 数组中，资产以分为单位。
+    长度未达到 capacity 前数组按需增长，短历史不预先占用整块内存；达到后变为环形缓冲区，追加是 O(1)，覆盖最旧的记录。
+    每条记录占 16 字节，而 (timestamp, value) 元组加两个 int 对象约 130 字节。
+    支持 len()、迭代、整数下标和切片，元素为 (timestamp, asset_value) 元组，顺序从旧到新。
+    """
+
+    __slots__ = ("data", "capacity", "start")
+
+    def __init__(self, entries=(), capacity=10000):
+        self.data = array("q")
+        self.capacity = max(capacity, 1)
+        self.start = 0  # 环形缓冲区写满后最旧记录的位置
+        self.extend(entries)
+
+    def __reduce__(self):
+        # 按顺序保存数组，pickle 时整块写出，不逐条展开成元组
+        return (self.from_array, (self.ordered(), self.capacity))
+
+    @classmethod
+    def from_array(cls, data, capacity):
+        history = cls.__new__(cls)
+        history.data = data
+        history.capacity = capacity
+        history.start = 0
+        return history
+
+    def ordered(self):
+        """按从旧到新顺序排列的交错数组。"""
+        if self.start == 0:
+            return self.data
+        return self.data[2 * self.start:] + self.data[:2 * self.start]
+
+    def __len__(self):
+        return len(self.data) >> 1
+
+    def __iter__(self):
+        data = self.ordered()
+        return zip(data[::2], data[1::2])
+
+    def __getitem__(self, index):
+        length = len(self)
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(length))]
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("asset history index out of range")
+        position = 2 * ((self.start + index) % length)
+        return self.data[position], self.data[position + 1]
+
+    def __repr__(self):
+        return f"AssetHistory({list(self)!r}, capacity={self.capacity})"
+
+    def append(self, timestamp, asset_value):
+        data = self.data
+        if len(data) < 2 * self.capacity:
+            data.append(timestamp)
+            data.append(asset_value)
+        else:
+            position = 2 * self.start
+            data[position] = timestamp
+            data[position + 1] = asset_value
+            self.start = (self.start + 1) % self.capacity
+
+    def extend(self, entries):
+        for timestamp, asset_value in entries:
+            self.append(timestamp, asset_value)
+
+    def extend_block(self, block):
+        """
+        追加按 (timestamp, asset_value) 交错排列的 int64 数据（array('q') 或 NumPy 数组等支持缓冲区协议的连续数据），
+        整块拷贝，结果与逐条 append 相同。
+        """
+        chunk = array("q")
+        chunk.frombytes(memoryview(block).cast("B"))
+        data = self.data
+        size = 2 * self.capacity
+        room = size - len(data)
+        if room > 0:
+            data.extend(chunk[:room])
+            chunk = chunk[room:]
+        if not chunk:
+            return
+        # 环形缓冲区已满：只保留最新的 capacity 条，分两段覆盖
+        if len(chunk) >= size:
+            self.data = chunk[len(chunk) - size:]
+            self.start = 0
+            return
+        position = 2 * self.start
+        first = min(len(chunk), size - position)
+        data[position:position + first] = chunk[:first]
+        rest = len(chunk) - first
+        if rest:
+            data[:rest] = chunk[first:]
+        self.start = (self.start + len(chunk) // 2) % self.capacity
+
+    @staticmethod
+    def extend_many(histories, timestamps, values):
+        """
+        把同一组时间步的资产一次追加到多个 AssetHistory：timestamps 为时间步序列，values 为 用户数 × 步数 的 NumPy int64 数组。
+        在数组上交错排列 (timestamp, value) 后，每个用户只做一次块拷贝。
+        """
+        block = values.repeat(2, axis=1)
+        block[:, ::2] = timestamps
+        for history, row in zip(histories, block):
+            history.extend_block(row)
+
+    def timestamps(self):
+        return self.ordered()[::2].tolist()
+
+    def values(self):
+        return self.ordered()[1::2].tolist()
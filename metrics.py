@@ -0,0 +1,195 @@
+import bisect
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# 延迟直方图的桶上限（秒）
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """固定桶的直方图：counts[i] 为不超过 buckets[i] 且超过前一个桶上限的观测数，最后一项为超过最大桶上限的观测数。"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """分位数的估计值：累计观测数达到 q 的那个桶的上限，落在最大桶之外时返回 None。"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bucket, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bucket
+        return None
+
+    def snapshot(self):
+        return {
+            'buckets': list(self.buckets),
+            'counts': list(self.counts),
+            'sum': self.sum,
+            'count': self.count,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+        }
+
+
+class Metrics:
+    """
+    模拟器的运行指标：各阶段的累计耗时、计数器和延迟直方图。
+    记录一次只是字典上的一次加法，阶段计时按模拟步而不是按笔成交进行，开销与步数成正比。
+    存储后端的后台写线程（AsyncStorage）与模拟线程同时记录，也可能在模拟线程生成快照时新增条目，
+    因此记录和快照都在同一把锁内进行。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.timers = {}  # 阶段 -> [次数, 累计秒数]
+            self.counters = {}
+            self.histograms = {}
+
+    def add_time(self, phase, seconds):
+        with self.lock:
+            timer = self.timers.get(phase)
+            if timer is None:
+                timer = self.timers[phase] = [0, 0.0]
+            timer[0] += 1
+            timer[1] += seconds
+
+    @contextmanager
+    def timer(self, phase):
+        """把 with 块的耗时计入 phase。"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    def incr(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def snapshot(self):
+        """当前指标的字典，可以直接写成 JSON。"""
+        with self.lock:
+            return {
+                'timestamp': time.time(),
+                'uptime_s': time.time() - self.started,
+                'timers': {phase: {'count': count, 'seconds': seconds}
+                           for phase, (count, seconds) in self.timers.items()},
+                'counters': dict(self.counters),
+                'histograms': {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+            }
+
+
+def prometheus_text(snapshot, prefix="stock_simulator"):
+    """把 snapshot（可以带 gauges 字典）转换为 Prometheus 文本格式，供 node_exporter 的 textfile collector 读取。"""
+    lines = [f"# TYPE {prefix}_phase_seconds_total counter"]
+    for phase, timer in snapshot['timers'].items():
+        lines.append(f'{prefix}_phase_seconds_total{{phase="{phase}"}} {timer["seconds"]}')
+    lines.append(f"# TYPE {prefix}_phase_calls_total counter")
+    for phase, timer in snapshot['timers'].items():
+        lines.append(f'{prefix}_phase_calls_total{{phase="{phase}"}} {timer["count"]}')
+    for name, value in snapshot['counters'].items():
+        lines.append(f"# TYPE {prefix}_{name}_total counter")
+        lines.append(f"{prefix}_{name}_total {value}")
+    for name, value in snapshot.get('gauges', {}).items():
+        lines.append(f"# TYPE {prefix}_{name} gauge")
+        lines.append(f"{prefix}_{name} {value}")
+    for name, histogram in snapshot['histograms'].items():
+        lines.append(f"# TYPE {prefix}_{name} histogram")
+        cumulative = 0
+        for bucket, count in zip(histogram['buckets'], histogram['counts']):
+            cumulative += count
+            lines.append(f'{prefix}_{name}_bucket{{le="{bucket}"}} {cumulative}')
+        lines.append(f'{prefix}_{name}_bucket{{le="+Inf"}} {histogram["count"]}')
+        lines.append(f"{prefix}_{name}_sum {histogram['sum']}")
+        lines.append(f"{prefix}_{name}_count {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_snapshot(snapshot, path, format=None):
+    """
+    把指标写入文件，format 为 "json" 或 "prometheus"，None 时按扩展名判断（.prom 为 Prometheus 文本，其余为 JSON）。
+    先写临时文件再替换，读取方不会看到写了一半的文件。
+    """
+    if format is None:
+        format = "prometheus" if path.endswith(".prom") else "json"
+    if format == "prometheus":
+        text = prometheus_text(snapshot)
+    elif format == "json":
+        text = json.dumps(snapshot, indent=2)
+    else:
+        raise ValueError(f"Unknown metrics format: {format}")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class StepProfiler:
+    """
+    对第 start 到第 end 步（含）的模拟运行 cProfile，到达第 end 步后把统计写入 path，可以用 pstats 或 snakeviz 查看；
+    模拟没有运行到第 end 步时，由调用方在结束时调用 stop 写出已收集的部分。两次运行之间暂停，只统计模拟步本身。
+    """
+
+    def __init__(self, start, end, path):
+        if start > end:
+            raise ValueError("Profile start step must not be after end step.")
+        self.start = start
+        self.end = end
+        self.path = path
+        self.profile = None
+        self.running = False
+        self.done = False
+
+    def before_step(self, step):
+        if self.done or self.running or not self.start <= step <= self.end:
+            return
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+        self.profile.enable()
+        self.running = True
+
+    def after_step(self, step):
+        if self.running and step >= self.end:
+            self.stop()
+
+    def pause(self):
+        if self.running:
+            self.profile.disable()
+            self.running = False
+
+    def stop(self):
+        """结束分析并写出统计，之后的步不再分析。"""
+        self.pause()
+        if self.profile is not None and not self.done:
+            self.profile.dump_stats(self.path)
+        self.done = True
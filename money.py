@@ -0,0 +1,25 @@
+from decimal import Decimal, ROUND_HALF_EVEN
+
+# 模拟器内部的金额（余额、价格、资产）都是以分为单位的整数，与数据库中 DECIMAL(..., 2) 的精度一致，
+# 往返数据库不丢失精度；只在数据库和界面边界转换为 Decimal。
+MONEY_DIGITS = 2
+MONEY_SCALE = 10 ** MONEY_DIGITS
+
+
+def to_ticks(amount):
+    """把金额（Decimal、float、str 或 int，单位为元）转换为整数分，四舍五入到偶数。"""
+    if isinstance(amount, int):
+        return amount * MONEY_SCALE
+    if not isinstance(amount, Decimal):
+        amount = Decimal(str(amount))
+    return int((amount * MONEY_SCALE).to_integral_value(ROUND_HALF_EVEN))
+
+
+def to_decimal(ticks):
+    """整数分转换为两位小数的 Decimal。"""
+    return Decimal(ticks).scaleb(-MONEY_DIGITS)
+
+
+def to_float(ticks):
+    """整数分转换为 float，用于绘图和历史记录。"""
+    return ticks / MONEY_SCALE
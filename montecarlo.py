@@ -0,0 +1,165 @@
+"""
+蒙特卡洛模拟：同一市场配置、不同随机种子的多个独立副本分发到进程池并行运行。
+每个副本在子进程中使用内存存储，不连接数据库，只把汇总结果（资产分布分位数、破产情况、每步价格路径）
+传回主进程，不传输用户的完整历史。
+
+用法：
+    config = {"stocks": {"AAPL": (150.0, 0.02)}, "num_trend_followers": 50, "num_random_traders": 50}
+    for summary in run_monte_carlo(config, num_replicas=200, num_trades=500):
+        ...
+    result = aggregate(summaries)
+"""
+import array
+import contextlib
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from money import to_float
+
+# 单次 run_simulation 的最大步数，限制逐步资产记录在子进程中占用的内存
+CHUNK_STEPS = 100
+# 汇报的资产分布分位数
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+class PricePathRecorder:
+    """
+    作为 history_store 传给模拟器，只记录每步的股票价格，资产历史直接丢弃。
+    接口与 ColumnarHistoryStore 中模拟器用到的部分相同。
+    """
+
+    def __init__(self):
+        self.paths = {}  # stock_code -> array('d')，每步一个价格
+
+    def append_prices(self, data):
+        for stock_code, timestamp, price in data:
+            path = self.paths.get(stock_code)
+            if path is None:
+                path = self.paths[stock_code] = array.array("d")
+            path.append(price)
+
+    def append_assets(self, data):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def prices(self, stock_code, start=None, end=None):
+        """副本从空的内存存储开始，没有历史价格。"""
+        return array.array("q"), array.array("d")
+
+
+def quantiles(values, points=QUANTILES):
+    """已排序序列的分位数（线性插值）。"""
+    if not values:
+        return {}
+    result = {}
+    last = len(values) - 1
+    for q in points:
+        position = q * last
+        low = int(position)
+        high = min(low + 1, last)
+        result[q] = values[low] + (values[high] - values[low]) * (position - low)
+    return result
+
+
+def run_replica(config, seed, num_trades, vectorized=False):
+    """
+    在当前进程中运行一个副本，返回汇总字典：
+    seed、steps（实际运行的步数）、bankrupt_user（使模拟停止的破产用户）、bankruptcies（余额不为正的用户数）、
+    assets（最终资产的 count/mean/min/max 和分位数）、final_prices、price_paths（每只股票每步的价格）。
+    """
+    # 导入放在函数内：子进程只在运行副本时加载模拟器
+    from server import StockMarketSimulator
+    from storage import MemoryStorage
+
+    random.seed(seed)
+    recorder = PricePathRecorder()
+    # 交易失败等提示信息在子进程中没有意义
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        simulator = StockMarketSimulator(storage=MemoryStorage(), history_store=recorder, persist_history=False,
+                                         **config)
+        run = simulator.run_simulation_vectorized if vectorized else simulator.run_simulation
+        for done in range(0, num_trades, CHUNK_STEPS):
+            if simulator.bankrupt_user is not None:
+                break
+            run(min(CHUNK_STEPS, num_trades - done))
+
+    prices = {stock_code: data['price'] for stock_code, data in simulator.stocks.items()}
+    assets = sorted(to_float(user.balance + sum(quantity * prices.get(stock_code, 0)
+                                                for stock_code, quantity in user.holdings.items()))
+                    for user in simulator.users)
+    return {
+        'seed': seed,
+        'steps': max((len(path) for path in recorder.paths.values()), default=0),
+        'bankrupt_user': simulator.bankrupt_user.user_id if simulator.bankrupt_user is not None else None,
+        'bankruptcies': sum(1 for user in simulator.users if user.balance <= 0),
+        'assets': {
+            'count': len(assets),
+            'mean': sum(assets) / len(assets) if assets else 0.0,
+            'min': assets[0] if assets else 0.0,
+            'max': assets[-1] if assets else 0.0,
+            'quantiles': quantiles(assets),
+        },
+        'final_prices': {stock_code: to_float(price) for stock_code, price in prices.items()},
+        'price_paths': recorder.paths,
+    }
+
+
+def run_monte_carlo(config, num_replicas, num_trades=100, seed=0, processes=None, vectorized=False):
+    """
+    把 num_replicas 个副本分发到进程池，按完成顺序逐个产出 run_replica 的汇总结果。
+    config 为 StockMarketSimulator 的构造参数（stocks、num_trend_followers、num_random_traders、trade_probability、
+    initial_balance、short_window、long_window、trend_window），storage 和历史相关参数由副本自行设置。
+    第 i 个副本的种子为 seed + i，结果可复现；processes 默认为 CPU 核数。
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(run_replica, config, seed + i, num_trades, vectorized) for i in range(num_replicas)]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def aggregate(summaries):
+    """
+    合并多个副本的汇总：破产副本比例、资产分位数和最终价格的跨副本均值、每步价格路径的跨副本均值。
+    """
+    summaries = list(summaries)
+    if not summaries:
+        return {}
+    count = len(summaries)
+    asset_quantiles = {q: sum(s['assets']['quantiles'].get(q, 0.0) for s in summaries) / count for q in QUANTILES}
+
+    final_prices = {}
+    path_sums = {}
+    path_counts = {}
+    for summary in summaries:
+        for stock_code, price in summary['final_prices'].items():
+            final_prices.setdefault(stock_code, []).append(price)
+        for stock_code, path in summary['price_paths'].items():
+            sums = path_sums.setdefault(stock_code, [])
+            counts = path_counts.setdefault(stock_code, [])
+            # 提前停止的副本路径较短，每步只对仍在运行的副本取平均
+            if len(path) > len(sums):
+                sums.extend([0.0] * (len(path) - len(sums)))
+                counts.extend([0] * (len(path) - len(counts)))
+            for step, price in enumerate(path):
+                sums[step] += price
+                counts[step] += 1
+
+    return {
+        'replicas': count,
+        'bankrupt_fraction': sum(1 for s in summaries if s['bankrupt_user'] is not None) / count,
+        'mean_bankruptcies': sum(s['bankruptcies'] for s in summaries) / count,
+        'mean_steps': sum(s['steps'] for s in summaries) / count,
+        'asset_mean': sum(s['assets']['mean'] for s in summaries) / count,
+        'asset_quantiles': asset_quantiles,
+        'final_price_mean': {code: sum(prices) / len(prices) for code, prices in final_prices.items()},
+        'mean_price_paths': {code: [total / n for total, n in zip(path_sums[code], path_counts[code])]
+                             for code in path_sums},
+    }
@@ -0,0 +1,170 @@
+import heapq
+from collections import deque
+from itertools import count
+
+BUY = "buy"
+SELL = "sell"
+
+
+class Order:
+    """一笔订单。price 为限价（分），市价单为 None；remaining 为尚未成交的数量。"""
+
+    __slots__ = ("order_id", "owner", "side", "price", "quantity", "remaining", "active")
+
+    def __init__(self, order_id, owner, side, price, quantity):
+        self.order_id = order_id
+        self.owner = owner  # 下单者，撮合引擎不关心它的类型，由调用方结算
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+        self.remaining = quantity
+        self.active = True
+
+    def __repr__(self):
+        return f"Order({self.order_id}, {self.side}, price={self.price}, remaining={self.remaining}/{self.quantity})"
+
+
+class OrderBook:
+    """
+    一只股票的限价订单簿，价格优先、时间优先撮合。
+    买卖两侧各有一个价格档位堆（买方存负价格，堆顶为最优价）和 {价格: 订单队列}，同一档位内按到达顺序排队。
+    新订单先与对手方最优档位撮合，限价单剩余部分挂入订单簿，市价单剩余部分直接取消；
+    每个被吃掉的档位是一次堆操作，单笔订单的撮合开销为 O(log 档位数 + 成交笔数)。
+    撤单只把订单标记为无效，等它到达队首时再移除，撤单是 O(1)；
+    档位中的挂单全部撤销时立即删除该档位，堆中留下的失效价格在弹出时跳过，失效价格超过一半时重建堆。
+    """
+
+    def __init__(self, stock_code):
+        self.stock_code = stock_code
+        self.bid_prices = []  # 买方档位的负价格，最小堆
+        self.ask_prices = []  # 卖方档位价格，最小堆
+        self.bids = {}  # price -> deque[Order]
+        self.asks = {}
+        self.orders = {}  # order_id -> 挂在订单簿中的 Order
+        self.live = {}  # (side, price) -> 档位中有效挂单的数量
+        self.order_ids = count(1)
+
+    def __len__(self):
+        return len(self.orders)
+
+    def best_level(self, side):
+        """side 一侧的最优档位 (price, queue)，顺带清理队首已撤销的订单和空档位；没有挂单时返回 None。"""
+        heap, levels, sign = (self.bid_prices, self.bids, -1) if side == BUY else (self.ask_prices, self.asks, 1)
+        while heap:
+            price = heap[0] * sign
+            queue = levels.get(price)
+            if queue is None:  # 档位已因撤单删除
+                heapq.heappop(heap)
+                continue
+            while queue and not queue[0].active:
+                queue.popleft()
+            if queue:
+                return price, queue
+            heapq.heappop(heap)
+            del levels[price]
+            self.live.pop((side, price), None)
+        return None
+
+    def best_bid(self):
+        level = self.best_level(BUY)
+        return level[0] if level else None
+
+    def best_ask(self):
+        level = self.best_level(SELL)
+        return level[0] if level else None
+
+    def depth(self, side, levels=5):
+        """side 一侧最优的 levels 个档位 [(price, 挂单总量), ...]。"""
+        book = self.bids if side == BUY else self.asks
+        prices = sorted(book, reverse=side == BUY)
+        result = []
+        for price in prices:
+            quantity = sum(order.remaining for order in book[price] if order.active)
+            if quantity:
+                result.append((price, quantity))
+                if len(result) == levels:
+                    break
+        return result
+
+    def submit(self, owner, side, quantity, price=None, budget=None):
+        """
+        提交订单，返回 (order, fills)。fills 为 [(maker, price, quantity), ...]，按成交顺序排列，成交价为挂单方的价格。
+        price 为 None 时是市价单；budget 为市价买单可花费的金额上限（分），超出部分不成交。
+        订单未完全成交时 order.active 表示剩余部分是否挂在订单簿中。
+        """
+        if quantity <= 0:
+            raise ValueError("Order quantity must be positive.")
+        if side not in (BUY, SELL):
+            raise ValueError(f"Unknown order side {side}.")
+        order = Order(next(self.order_ids), owner, side, price, quantity)
+        opposite = SELL if side == BUY else BUY
+        fills = []
+
+        while order.remaining:
+            level = self.best_level(opposite)
+            if level is None:
+                break
+            level_price, queue = level
+            if price is not None and (level_price > price if side == BUY else level_price < price):
+                break
+            maker = queue[0]
+            fill = min(order.remaining, maker.remaining)
+            if budget is not None:
+                fill = min(fill, budget // level_price)
+                if fill == 0:
+                    break
+                budget -= fill * level_price
+            maker.remaining -= fill
+            order.remaining -= fill
+            fills.append((maker, level_price, fill))
+            if not maker.remaining:
+                maker.active = False
+                queue.popleft()
+                del self.orders[maker.order_id]
+                self.live[(opposite, level_price)] -= 1
+
+        if order.remaining and price is not None:
+            self.add(order)
+        else:
+            order.active = False
+        return order, fills
+
+    def add(self, order):
+        """把限价单挂入订单簿。"""
+        heap, levels, key = ((self.bid_prices, self.bids, -order.price) if order.side == BUY
+                             else (self.ask_prices, self.asks, order.price))
+        queue = levels.get(order.price)
+        if queue is None:
+            queue = levels[order.price] = deque()
+            heapq.heappush(heap, key)
+        queue.append(order)
+        self.orders[order.order_id] = order
+        self.live[(order.side, order.price)] = self.live.get((order.side, order.price), 0) + 1
+
+    def cancel(self, order_id):
+        """撤销挂单，返回被撤销的订单（剩余数量不变，供调用方解冻），订单不存在或已成交时返回 None。"""
+        order = self.orders.pop(order_id, None)
+        if order is not None:
+            order.active = False
+            self.release_level(order.side, order.price)
+        return order
+
+    def release_level(self, side, price):
+        """档位中少了一笔有效挂单；没有有效挂单时删除档位，堆中失效的价格过多时重建堆。"""
+        key = (side, price)
+        self.live[key] -= 1
+        if self.live[key]:
+            return
+        del self.live[key]
+        heap, levels, sign = (self.bid_prices, self.bids, -1) if side == BUY else (self.ask_prices, self.asks, 1)
+        del levels[price]
+        if len(heap) > 2 * len(levels) + 16:
+            heap[:] = [price * sign for price in levels]
+            heapq.heapify(heap)
+
+    def cancel_all(self, owner=None):
+        """撤销全部挂单（或某个下单者的全部挂单），返回被撤销的订单列表。"""
+        cancelled = [order for order in self.orders.values() if owner is None or order.owner is owner]
+        for order in cancelled:
+            self.cancel(order.order_id)
+        return cancelled
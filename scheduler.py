@@ -0,0 +1,85 @@
+import heapq
+import math
+import random
+
+
+class AgentScheduler:
+    """
+    事件驱动的用户调度：不再每步遍历所有用户掷骰子，而是为每个用户抽取下一次交易的时间步，放入按时间排序的堆中，
+    每步只弹出到期的用户。用户每步以概率 p 交易时，两次交易之间的间隔服从几何分布，与逐步掷骰子的分布相同。
+    每步的开销与当步交易的用户数成正比，与总用户数无关。
+
+    用户的交易概率由 rate 决定（见 StockMarketSimulator.trade_rate），可以按用户或按策略设置。
+    堆中的条目为 (时间步, 用户位置, 序号, 用户)：同一步到期的用户按在用户列表中的顺序处理；
+    用户被移除或概率改变后，旧条目的序号失效，弹出时跳过。
+    """
+
+    def __init__(self, rate):
+        self.rate = rate  # user -> 每步交易的概率
+        self.heap = []
+        self.tokens = {}  # user_id -> 有效条目的序号
+        self.positions = {}  # user_id -> 用户在列表中的位置
+        self.sequence = 0
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def next_wake(self, step, probability):
+        """step 之后第一次交易的时间步，几何分布抽样；概率为 0 时返回 None。"""
+        if probability >= 1:
+            return step + 1
+        if probability <= 0:
+            return None
+        return step + 1 + int(math.log(1.0 - random.random()) / math.log(1.0 - probability))
+
+    def schedule(self, user, step):
+        """为用户抽取 step 之后的下一次交易时间，替换之前的安排。"""
+        self.sequence += 1
+        self.tokens[user.user_id] = self.sequence
+        position = self.positions.setdefault(user.user_id, len(self.positions))
+        wake = self.next_wake(step, self.rate(user))
+        if wake is not None:
+            heapq.heappush(self.heap, (wake, position, self.sequence, user))
+
+    def rebuild(self, users, step):
+        """按用户列表重新安排所有用户，用户列表或默认交易概率变化后调用。"""
+        self.heap = []
+        self.tokens = {}
+        self.positions = {}
+        for user in users:
+            self.schedule(user, step)
+
+    def state(self):
+        """
+        可以写入快照的调度状态：有效条目 (时间步, 位置, 序号, 用户ID)、各用户的有效序号和位置，以及当前序号。
+        保存已经抽取的下一次交易时间，恢复后不必重新抽样，从断点继续时与不中断运行一致。
+        """
+        entries = [(wake, position, sequence, user.user_id) for wake, position, sequence, user in self.heap
+                   if self.tokens.get(user.user_id) == sequence]
+        return entries, dict(self.tokens), dict(self.positions), self.sequence
+
+    def restore(self, state, users_by_id):
+        """恢复 state() 返回的调度状态，users_by_id 为用户ID到恢复出的用户对象的映射。"""
+        entries, tokens, positions, sequence = state
+        # 序号唯一，条目之间的顺序与原来的堆完全相同
+        self.heap = [(wake, position, sequence, users_by_id[user_id]) for wake, position, sequence, user_id in entries]
+        heapq.heapify(self.heap)
+        self.tokens = dict(tokens)
+        self.positions = dict(positions)
+        self.sequence = sequence
+
+    def remove(self, user_id):
+        self.tokens.pop(user_id, None)
+        self.positions.pop(user_id, None)
+
+    def due(self, step):
+        """弹出在 step 或更早到期的用户（按用户列表顺序），并为它们安排下一次交易。"""
+        heap = self.heap
+        users = []
+        while heap and heap[0][0] <= step:
+            wake, position, sequence, user = heapq.heappop(heap)
+            if self.tokens.get(user.user_id) == sequence:
+                users.append(user)
+        for user in users:
+            self.schedule(user, step)
+        return users
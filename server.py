@@ -1,84 +1,239 @@
+import gc
+import os
 import sys
+import time
+import pickle
 import random
-import matplotlib.pyplot as plt
-from PyQt5.QtWidgets import (QApplication, QWidget, QTabWidget, QVBoxLayout,
-                             QPushButton, QTableWidget, QTableWidgetItem,
-                             QComboBox, QCheckBox, QRadioButton, QHBoxLayout,
-                             QMessageBox, QLabel, QLineEdit, QDialog, QFormLayout)
-from PyQt5.QtCore import Qt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-import matplotlib.figure as mpl_fig
-import mysql.connector
-from decimal import Decimal
+import argparse
+import inspect
+from contextlib import contextmanager, nullcontext, redirect_stdout
+from storage import MySQLStorage, STORAGE_BACKENDS, create_storage
+from indicators import AssetHistory, PriceHistory, moving_average
+from orderbook import BUY, SELL, Order, OrderBook
+from scheduler import AgentScheduler
+from valuation import PortfolioValuation
+from money import to_ticks, to_decimal, to_float
+from metrics import Metrics, StepProfiler, write_snapshot
+# PyQt5 和 matplotlib 只在启动图形界面时由 gui.py 导入；NumPy 只在运行向量化内核时导入（见 run_simulation_vectorized）
+
+# 图形界面和命令行默认使用的初始股票池：股票代码 -> (初始价格, 波动率)
+DEFAULT_STOCKS = {
+    "AAPL": (150.0, 0.02),  # 苹果公司，初始价格150美元，波动率0.02
+    "GOOG": (270.0, 0.015), # 谷歌公司，初始价格270美元，波动率0.015
+    "MSFT": (300.0, 0.025)   # 微软公司，初始价格300美元，波动率0.025
+}
+
+
+@contextmanager
+def gc_paused(freeze=False):
+    """
+    暂停垃圾回收。一次性创建或遍历大量对象时避免反复触发全量扫描。
+    freeze=True 时把期间创建的长期对象移入永久代，之后的全量回收不再扫描它们。
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if freeze:
+            gc.freeze()
+        if enabled:
+            gc.enable()
 
 class User:
+    # 用户数量可达百万级，使用 __slots__ 省去每个实例的 __dict__
+    __slots__ = ("user_id", "balance", "holdings", "strategy", "asset_history")
+
+    max_history_length = 10000  # 限制 asset_history 的长度，超出后覆盖最旧的记录
+
     def __init__(self, user_id, initial_balance):
         """初始化用户。"""
         self.user_id = user_id
-        self.balance = Decimal(str(initial_balance))  # 初始资金，转换为 Decimal
+        self.balance = to_ticks(initial_balance)  # 初始资金，以分为单位的整数
         self.holdings = {}  # 使用字典存储持仓，key为股票代码，value为持仓数量
         self.strategy = None  # 初始化策略为None
-        self.asset_history = [(0, Decimal(str(initial_balance)))] # (timestamp, asset_value)
-        self.max_history_length = 10000  # 限制 asset_history 的长度
+        self.asset_history = AssetHistory([(0, self.balance)], self.max_history_length)  # (timestamp, asset_value)，资产以分为单位
+
+    @classmethod
+    def from_state(cls, user_id, balance, holdings, strategy, asset_history):
+        """从快照恢复用户，跳过 __init__ 中的类型转换。"""
+        user = cls.__new__(cls)
+        user.user_id = user_id
+        user.balance = balance
+        user.holdings = holdings
+        user.strategy = strategy
+        user.asset_history = asset_history
+        return user
 
     def update_asset_history(self, timestamp, stock_prices):
-        """更新资产历史记录。"""
+        """更新资产历史记录，stock_prices 为 {股票代码: 价格（分）}。"""
         try:
-            asset_value = self.balance  # 确保 balance 是 Decimal
+            asset_value = self.balance
             for stock_code, holdings in self.holdings.items():
-                asset_value += Decimal(str(holdings)) * Decimal(str(stock_prices.get(stock_code, 0.0)))  # 确保 holdings 和 stock_prices 是 Decimal
-            self.asset_history.append((timestamp, asset_value))
-
-            # 限制 asset_history 的长度
-            if len(self.asset_history) > self.max_history_length:
-                self.asset_history = self.asset_history[-self.max_history_length:]
-
+                asset_value += holdings * stock_prices.get(stock_code, 0)
+            self.asset_history.append(timestamp, asset_value)
         except Exception as e:
             print(f"Error updating asset history for user {self.user_id}: {e}")
 
+class UserRegistry:
+    """
+    按 user_id 索引的用户表，保持添加顺序。迭代和 len() 与原来的用户列表相同，按 ID 查找、添加和删除都是 O(1)。
+    on_add 在添加用户时调用，模拟器用它把新用户交给估值（见 PortfolioValuation）。
+    """
+
+    def __init__(self, users=(), on_add=None):
+        self.by_id = {}
+        self.on_add = on_add
+        for user in users:
+            self.add(user)
+
+    def __iter__(self):
+        return iter(self.by_id.values())
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __contains__(self, user_id):
+        return user_id in self.by_id
+
+    def __getitem__(self, user_id):
+        return self.by_id[user_id]
+
+    def get(self, user_id, default=None):
+        return self.by_id.get(user_id, default)
+
+    def ids(self):
+        return self.by_id.keys()
+
+    def add(self, user):
+        if user.user_id in self.by_id:
+            raise ValueError(f"User {user.user_id} already exists.")
+        self.by_id[user.user_id] = user
+        if self.on_add is not None:
+            self.on_add(user)
+
+    append = add  # 兼容按列表使用用户表的代码
+
+    def remove(self, user_id):
+        """删除并返回用户，不存在时抛出 KeyError。"""
+        return self.by_id.pop(user_id)
+
+# 策略注册表：策略名称 -> 策略类，create_strategy 按名称创建策略
+STRATEGIES = {}
+
+
+def register_strategy(name):
+    """
+    类装饰器，按名称注册策略类。自定义策略注册后即可通过 create_strategy / add_user 按名称使用，不需要修改模拟器。
+    策略类的 default_params(simulator) 给出按名称创建时使用的构造参数。
+    """
+    def decorator(cls):
+        cls.strategy_name = name
+        STRATEGIES[name] = cls
+        return cls
+    return decorator
+
+
 # 策略接口
 class TradingStrategy:
+    quantity = 5  # 基于信号的策略每次交易的数量
+
+    @classmethod
+    def default_params(cls, simulator):
+        """按名称创建策略时使用的构造参数。"""
+        return {}
+
+    def params(self):
+        """构造参数。按约定构造参数保存在同名属性中，按 __init__ 的参数名读取。"""
+        return {name: getattr(self, name) for name, parameter in inspect.signature(type(self)).parameters.items()
+                if parameter.kind not in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD)}
+
     def execute(self, user, simulator):
-        """执行交易策略"""
-        raise NotImplementedError("Subclasses must implement execute method")
+        """执行交易策略：按当前行情生成订单并逐笔成交。"""
+        simulator.execute_orders(user, self.orders(user, simulator.stocks))
+
+    def signals(self, stocks):
+        """
+        只取决于行情的信号 [(stock_code, 1 或 -1), ...]，按股票顺序排列：1 表示没有持仓时买入，-1 表示有持仓时卖出。
+        返回 None 表示决策取决于具体用户，需要覆盖 orders()。
+        """
+        return None
+
+    def orders(self, user, stocks):
+        """
+        根据行情快照 stocks 生成订单列表 [(stock_code, quantity), ...]，quantity 为正表示买入、为负表示卖出。
+        只读取行情和用户状态，不修改任何数据，集合竞价模式（见 StockMarketSimulator.auction_step）使用。
+        """
+        signals = self.signals(stocks)
+        if signals is None:
+            raise NotImplementedError("Subclasses must implement signals or orders method")
+        return self.signal_orders(user, signals)
+
+    def signal_orders(self, user, signals):
+        """把信号转换为某个用户的订单。"""
+        holdings = user.holdings
+        orders = []
+        for stock_code, signal in signals:
+            if signal > 0:
+                if holdings.get(stock_code, 0) == 0:
+                    orders.append((stock_code, self.quantity))
+            elif holdings.get(stock_code, 0) > 0:
+                orders.append((stock_code, -self.quantity))
+        return orders
+
+    def execute_batch(self, users, market_view):
+        """
+        一次为共享本策略实例的所有用户生成订单，返回 [(user, orders), ...]。
+        信号只取决于行情的策略每只股票只计算一次信号；其他策略逐个调用 orders()。
+        """
+        signals = self.signals(market_view)
+        if signals is None:
+            return [(user, self.orders(user, market_view)) for user in users]
+        return [(user, self.signal_orders(user, signals)) for user in users]
 
 # 移动平均线交叉策略
+@register_strategy("MovingAverageCrossover")
 class MovingAverageCrossoverStrategy(TradingStrategy):
     def __init__(self, short_window, long_window):
         self.short_window = short_window
         self.long_window = long_window
 
+    @classmethod
+    def default_params(cls, simulator):
+        return {'short_window': simulator.short_window, 'long_window': simulator.long_window}
+
     def calculate_moving_average(self, prices, window):
-        """计算移动平均线。"""
-        if len(prices) < window:
-            return None
-        return sum(prices[-window:]) / window
+        """计算移动平均线，价格序列是 PriceHistory 时直接读取共享的滚动和。"""
+        return moving_average(prices, window)
 
-    def execute(self, user, simulator):
-        """根据移动平均交叉策略交易股票。"""
-        for stock_code, stock_data in simulator.stocks.items():
-            quantity = 5  # 交易数量
-            holdings = user.holdings.get(stock_code, 0)
-            prices = stock_data['prices']
-            price = stock_data['price']
+    def vector_spec(self):
+        """向量化内核使用的策略描述，见 vector_engine.py。"""
+        return ("crossover", self.short_window, self.long_window)
 
+    def signals(self, stocks):
+        """金叉且没有持仓时买入，死叉且有持仓时卖出。"""
+        signals = []
+        for stock_code, stock_data in stocks.items():
+            prices = stock_data['prices']
             short_ma = self.calculate_moving_average(prices, self.short_window)
             long_ma = self.calculate_moving_average(prices, self.long_window)
 
             if short_ma is not None and long_ma is not None:
-                if short_ma > long_ma and holdings == 0: # 金叉，且没有持仓
-                    simulator.buy_stock(user, stock_code, quantity)
-                elif short_ma < long_ma and holdings > 0: # 死叉，且有持仓
-                    simulator.sell_stock(user, stock_code, quantity) # 卖出指定数量
-                else:
-                    pass
-            else:
-                pass
+                if short_ma > long_ma: # 金叉
+                    signals.append((stock_code, 1))
+                elif short_ma < long_ma: # 死叉
+                    signals.append((stock_code, -1))
+        return signals
 
 # 随机交易策略
-class RandomTradingStrategy:
+@register_strategy("Random")
+class RandomTradingStrategy(TradingStrategy):
+    def vector_spec(self):
+        return ("random",)
+
     def execute(self, user, simulator):
         """随机交易策略"""
+        # 不复用 orders()：决策和成交交替消耗随机数，保持原有的随机数序列
         for stock_code in simulator.stocks.keys():
             action = random.choice(['buy', 'sell', 'hold'])
             quantity = random.randint(1, 5)
@@ -90,91 +245,120 @@ class RandomTradingStrategy:
             else:
                 pass
 
+    def orders(self, user, stocks):
+        orders = []
+        for stock_code in stocks.keys():
+            action = random.choice(['buy', 'sell', 'hold'])
+            quantity = random.randint(1, 5)
+            if action == 'buy':
+                orders.append((stock_code, quantity))
+            elif action == 'sell':
+                orders.append((stock_code, -quantity))
+        return orders
+
 # 趋势跟踪策略
-class TrendFollowingStrategy:
+@register_strategy("TrendFollowing")
+class TrendFollowingStrategy(TradingStrategy):
     def __init__(self, window):
         self.window = window
 
-    def execute(self, user, simulator):
-        """趋势跟踪策略：如果当前价格高于过去一段时间的平均价格，则买入；否则卖出。"""
-        for stock_code, stock_data in simulator.stocks.items():
-            quantity = 5
-            holdings = user.holdings.get(stock_code, 0)
-            prices = stock_data['prices']
-            price = stock_data['price']
+    @classmethod
+    def default_params(cls, simulator):
+        return {'window': simulator.trend_window}
 
-            if len(prices) < self.window:
+    def vector_spec(self):
+        return ("trend", self.window)
+
+    def signals(self, stocks):
+        """趋势跟踪策略：如果当前价格高于过去一段时间的平均价格，则买入；否则卖出。"""
+        signals = []
+        for stock_code, stock_data in stocks.items():
+            average_price = moving_average(stock_data['prices'], self.window)
+            if average_price is None:
                 continue
 
-            average_price = sum(prices[-self.window:]) / self.window
-
-            if price > average_price and holdings == 0:
-                simulator.buy_stock(user, stock_code, quantity)
-            elif price < average_price and holdings > 0:
-                simulator.sell_stock(user, stock_code, quantity)
-            else:
-                pass
+            if stock_data['price'] > average_price:
+                signals.append((stock_code, 1))
+            elif stock_data['price'] < average_price:
+                signals.append((stock_code, -1))
+        return signals
 
 # 反向投资策略
-class MeanReversionStrategy:
+@register_strategy("MeanReversion")
+class MeanReversionStrategy(TradingStrategy):
     def __init__(self, window):
         self.window = window
 
-    def execute(self, user, simulator):
-        """均值回归策略：如果当前价格低于过去一段时间的平均价格，则买入；否则卖出。"""
-        for stock_code, stock_data in simulator.stocks.items():
-            quantity = 5
-            holdings = user.holdings.get(stock_code, 0)
-            prices = stock_data['prices']
-            price = stock_data['price']
+    @classmethod
+    def default_params(cls, simulator):
+        return {'window': simulator.trend_window}
 
-            if len(prices) < self.window:
-                continue
+    def vector_spec(self):
+        return ("mean_reversion", self.window)
 
-            average_price = sum(prices[-self.window:]) / self.window
+    def signals(self, stocks):
+        """均值回归策略：如果当前价格低于过去一段时间的平均价格，则买入；否则卖出。"""
+        signals = []
+        for stock_code, stock_data in stocks.items():
+            average_price = moving_average(stock_data['prices'], self.window)
+            if average_price is None:
+                continue
 
-            if price < average_price and holdings == 0:
-                simulator.buy_stock(user, stock_code, quantity)
-            elif price > average_price and holdings > 0:
-                simulator.sell_stock(user, stock_code, quantity)
-            else:
-                pass
+            if stock_data['price'] < average_price:
+                signals.append((stock_code, 1))
+            elif stock_data['price'] > average_price:
+                signals.append((stock_code, -1))
+        return signals
 
 class StockMarketSimulator:
-    def __init__(self, stocks, num_trend_followers=5, num_random_traders=5, trade_probability=0.1, initial_balance=10000.0, short_window=5, long_window=20, trend_window=10):
+    MARKET_MAKER_DEPTH = 100  # 订单簿模式中做市商每步在买卖两侧各挂出的数量
+
+    def __init__(self, stocks, num_trend_followers=5, num_random_traders=5, trade_probability=0.1, initial_balance=10000.0, short_window=5, long_window=20, trend_window=10, storage=None, flush_interval=1, history_store=None, persist_history=True, plot_horizon=1000, event_driven=False):
         """
         初始化股票市场模拟器，现在支持股票池。
+        storage 为存储后端（见 storage.py），默认连接本地 MySQL；用 AsyncStorage 包装后写操作在后台线程执行。
+        flush_interval 为持仓和余额写回数据库的间隔（模拟步数）。
+        history_store 为可选的列式历史存储（见 history_store.py），persist_history 为 False 时不再把历史写入数据库。
+        plot_horizon 为内存中为绘图保留的价格点数，每只股票只保留 最长策略窗口 + plot_horizon 个价格，
+        更早的价格用 load_price_history 从持久化存储读取。
+        event_driven 为 True 时用事件驱动调度（见 scheduler.py）选出每步交易的用户，每步只处理到期的用户，
+        交易概率较低、用户很多时比逐个用户掷骰子快得多；默认逐个用户掷骰子，相同种子的运行结果与之前一致。
         """
 
-        # 数据库连接信息
-        self.db_host = "localhost"
-        self.db_user = "root"
-        self.db_password = "Cyborg72"
-        self.db_name = "stock_market_db"
-        self.mydb = None  # 初始化数据库连接
-        self.mycursor = None
-
-        try:
-            self.mydb = mysql.connector.connect(
-                host=self.db_host,
-                user=self.db_user,
-                password=self.db_password,
-                database=self.db_name  # 直接连接到数据库
-            )
-            self.mydb.autocommit = False  # 关闭自动提交
-            self.mycursor = self.mydb.cursor()
-            print("成功连接到MySQL数据库！")
-        except mysql.connector.Error as err:
-            print(f"连接数据库失败: {err}")
-            sys.exit(1)  # 退出程序
-
-        # 初始化缓冲区
-        self.sql_buffer = []
-        self.buffer_size = 100  # 缓冲区大小
+        # 存储后端，默认沿用本地 MySQL 数据库
+        if storage is None:
+            storage = MySQLStorage(host="localhost", user="root", password="Cyborg72", database="stock_market_db")
+        self.storage = storage
+        self.storage_errors = []  # 存储后端（包括后台写线程）报告的错误
+        self.storage.on_error = self.on_storage_error
+
+        # 运行指标和分析，见 get_metrics、set_metrics_dump、profile_steps
+        self.metrics = Metrics()
+        self.storage.metrics = self.metrics
+        self.metrics_dump = None  # (文件路径, 间隔步数, 格式)
+        self.profiler = None
+
+        # 写回缓存：记录自上次写回以来发生变化的持仓和余额
+        self.dirty_holdings = {}  # (user_id, stock_code) -> user
+        self.dirty_balances = {}  # user_id -> user
+        self.flush_interval = flush_interval
+        self.in_simulation = False  # run_simulation 期间只标记，不立即写回
+
+        # 价格和资产历史的去向：列式文件和/或数据库
+        self.history_store = history_store
+        self.persist_history = persist_history
 
         self.stocks = {}
-        self.users = []  # 创建模拟用户列表
+        self.order_books = {}  # stock_code -> OrderBook，第一次下限价单时创建
+        self.strategies = {}  # (策略名称, 参数) -> 共享的策略实例，见 create_strategy
+        self.valuation = PortfolioValuation()  # 增量维护的用户资产，见 asset_value
+        # 订单簿模式中的做市商，不在用户列表中，资金和持仓不受限制，也不写入数据库
+        self.market_maker = User("MarketMaker", 0)
+        self.users = UserRegistry(on_add=self.valuation.touch)  # 模拟用户，按 user_id 索引
         self.trade_probability = trade_probability
+        self.user_trade_probability = {}  # user_id -> 单个用户的交易概率，覆盖策略和全局设置
+        self.scheduler = AgentScheduler(self.trade_rate) if event_driven else None
+        self.scheduled_probability = trade_probability  # 调度器安排时使用的全局交易概率
         self.bankrupt_user = None  # 存储破产用户的ID，初始为None
         self.player = User("Player", initial_balance) # 创建玩家角色
         #self.users.append(self.player) # 将玩家添加到用户列表中 # 玩家信息从数据库加载，这里不添加
@@ -182,6 +366,7 @@ class StockMarketSimulator:
         self.short_window = short_window
         self.long_window = long_window
         self.trend_window = trend_window
+        self.plot_horizon = plot_horizon
         self.total_trades = 0 # 记录总交易次数
 
         # 从数据库加载股票信息
@@ -190,212 +375,154 @@ class StockMarketSimulator:
         # 从数据库加载用户信息
         self.load_users_from_db(initial_balance)
 
-        # 创建趋势跟踪交易者
-        for i in range(num_trend_followers):
-            user_id = f"TrendFollower_{i}"
-            if not self.is_user_in_db(user_id) and not any(user.user_id == user_id for user in self.users):
-                user = User(user_id, initial_balance)
-                user.strategy = TrendFollowingStrategy(window=self.trend_window)
-                self.add_user_to_db(user.user_id, initial_balance, "TrendFollowing") # 确保添加到数据库
-                self.users.append(user)
-
-        # 创建随机交易者
-        for i in range(num_random_traders):
-            user_id = f"RandomTrader_{i}"
-            if not self.is_user_in_db(user_id) and not any(user.user_id == user_id for user in self.users):
+        # 创建趋势跟踪交易者和随机交易者，已存在的用户一次批量查出
+        traders = [(f"TrendFollower_{i}", "TrendFollowing") for i in range(num_trend_followers)]
+        traders += [(f"RandomTrader_{i}", "Random") for i in range(num_random_traders)]
+        known_ids = set(self.users.ids())
+        known_ids |= self.storage.existing_user_ids([user_id for user_id, _ in traders if user_id not in known_ids])
+        for user_id, strategy_name in traders:
+            if user_id not in known_ids:
                 user = User(user_id, initial_balance)
-                user.strategy = RandomTradingStrategy()
-                self.add_user_to_db(user.user_id, initial_balance, "Random") # 确保添加到数据库
+                user.strategy = self.create_strategy(strategy_name)
+                self.add_user_to_db(user.user_id, initial_balance, strategy_name) # 确保添加到数据库
                 self.users.append(user)
+                known_ids.add(user_id)
 
         # 玩家使用均值回归策略
         #if not self.is_user_in_db(self.player.user_id) and not any(user.user_id == self.player.user_id for user in self.users):
         #    self.player.strategy = MeanReversionStrategy(window=self.trend_window)
         #    self.add_user_to_db(self.player.user_id, initial_balance, "MeanReversion") # 玩家信息从数据库加载，这里不需要重复添加
 
+    def on_storage_error(self, message):
+        """记录存储后端报告的错误，后台写线程也会调用。"""
+        self.storage_errors.append(message)
+
     def clear_database(self):
         """清空数据库。"""
-        try:
-            # 删除所有表
-            self.mycursor.execute("DROP TABLE IF EXISTS asset_history")
-            self.mycursor.execute("DROP TABLE IF EXISTS stock_prices")
-            self.mycursor.execute("DROP TABLE IF EXISTS user_holdings")
-            self.mycursor.execute("DROP TABLE IF EXISTS stocks")
-            self.mycursor.execute("DROP TABLE IF EXISTS users")
-            self.mydb.commit()
-
-            # 创建表
-            self.create_tables()
-
-            print("数据库已清空并重新创建表。")
-        except mysql.connector.Error as err:
-            print(f"清空数据库失败: {err}")
-            sys.exit(1)
+        self.storage.clear_database()
 
     def create_tables(self):
         """创建数据库表。"""
-        try:
-            # 创建 users 表
-            self.mycursor.execute("""
-                CREATE TABLE users (
-                    user_id VARCHAR(255) PRIMARY KEY,
-                    balance DECIMAL(15, 2) NOT NULL,
-                    strategy VARCHAR(255)
-                )
-            """)
-
-            # 创建 stocks 表
-            self.mycursor.execute("""
-                CREATE TABLE stocks (
-                    stock_code VARCHAR(255) PRIMARY KEY,
-                    initial_price DECIMAL(10, 2) NOT NULL,
-                    volatility DECIMAL(5, 4) NOT NULL,
-                    current_price DECIMAL(10, 2) NOT NULL
-                )
-            """)
-
-            # 创建 user_holdings 表
-            self.mycursor.execute("""
-                CREATE TABLE user_holdings (
-                    user_id VARCHAR(255) NOT NULL,
-                    stock_code VARCHAR(255) NOT NULL,
-                    quantity INT NOT NULL,
-                    PRIMARY KEY (user_id, stock_code),
-                    FOREIGN KEY (user_id) REFERENCES users(user_id),
-                    FOREIGN KEY (stock_code) REFERENCES stocks(stock_code)
-                )
-            """)
-
-            # 创建 stock_prices 表
-            self.mycursor.execute("""
-                CREATE TABLE stock_prices (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    stock_code VARCHAR(255) NOT NULL,
-                    timestamp INT NOT NULL,
-                    price DECIMAL(10, 2) NOT NULL,
-                    FOREIGN KEY (stock_code) REFERENCES stocks(stock_code)
-                )
-            """)
-
-            # 创建 asset_history 表
-            self.mycursor.execute("""
-                CREATE TABLE asset_history (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    user_id VARCHAR(255) NOT NULL,
-                    timestamp INT NOT NULL,
-                    asset_value DECIMAL(15, 2) NOT NULL,
-                    FOREIGN KEY (user_id) REFERENCES users(user_id)
-                )
-            """)
-
-            self.mydb.commit()
-            print("数据库表创建成功。")
-        except mysql.connector.Error as err:
-            print(f"创建数据库表失败: {err}")
-            sys.exit(1)
+        self.storage.create_tables()
 
     def is_user_in_db(self, user_id):
         """检查用户是否已存在于数据库中。"""
-        try:
-            sql = "SELECT user_id FROM users WHERE user_id = %s"
-            val = (user_id,)
-            self.mycursor.execute(sql, val)
-            result = self.mycursor.fetchone()
-            return result is not None
-        except mysql.connector.Error as err:
-            print(f"检查用户是否存在失败: {err}")
-            return False
-
+        return self.storage.user_exists(user_id)
 
     def load_stocks_from_db(self, stocks):
-        """从数据库加载股票信息。"""
-        try:
-            self.mycursor.execute("SELECT stock_code, initial_price, volatility, current_price FROM stocks")
-            stock_records = self.mycursor.fetchall()
-            for stock_code, initial_price, volatility, current_price in stock_records:
+        """从数据库加载股票信息，并用最近的价格历史重建策略使用的价格窗口。"""
+        stock_records = self.storage.load_stocks()
+        recent = self.load_recent_prices([record[0] for record in stock_records]) if stock_records else {}
+        for stock_code, initial_price, volatility, current_price in stock_records:
+            current_price = to_ticks(current_price)
+            prices = self.price_history(to_ticks(price) for _, price in recent.get(stock_code, ()))
+            # 上次模拟结束后的手动买卖只更新了当前价格，没有写入价格历史
+            if not prices or prices[-1] != current_price:
+                prices.append(current_price)
+            self.stocks[stock_code] = {
+                'price': current_price,
+                'volatility': float(volatility),
+                'prices': prices
+            }
+        # 时间戳从历史中的最后一步继续，避免与已有记录重叠
+        self.total_trades = max((series[-1][0] for series in recent.values()), default=self.total_trades)
+
+        # 如果数据库为空，则初始化股票信息
+        if not self.stocks:
+            for stock_code, (initial_price, volatility) in stocks.items():
+                self.add_stock_to_db(stock_code, initial_price, volatility)
                 self.stocks[stock_code] = {
-                    'price': Decimal(str(current_price)),
-                    'volatility': Decimal(str(volatility)),
-                    'prices': [Decimal(str(current_price))]
+                    'price': to_ticks(initial_price),
+                    'volatility': float(volatility),
+                    'prices': self.price_history([to_ticks(initial_price)])
                 }
 
-            # 如果数据库为空，则初始化股票信息
-            if not self.stocks:
-                for stock_code, (initial_price, volatility) in stocks.items():
-                    self.add_stock_to_db(stock_code, initial_price, volatility)
-                    self.stocks[stock_code] = {
-                        'price': Decimal(str(initial_price)),
-                        'volatility': Decimal(str(volatility)),
-                        'prices': [Decimal(str(initial_price))]
-                    }
-        except mysql.connector.Error as err:
-            print(f"加载股票信息失败: {err}")
-    def load_users_from_db(self, initial_balance):
-        """从数据库加载用户信息。"""
-        try:
-            self.mycursor.execute("SELECT user_id, balance, strategy FROM users")
-            user_records = self.mycursor.fetchall()
-            for user_id, balance, strategy in user_records:
-                user = User(user_id, balance)
-                user.strategy = self.create_strategy(strategy)  # 创建策略对象
-                self.users.append(user)
-
-                # 加载用户持仓信息
-                self.load_user_holdings_from_db(user)
+    def price_history(self, prices=()):
+        """新建价格序列（环形缓冲区），预先注册模拟器配置的均线窗口。"""
+        windows = (self.short_window, self.long_window, self.trend_window)
+        return PriceHistory(prices, windows, capacity=max(windows) + self.plot_horizon)
+
+    def load_price_history(self, stock_code, start=None, end=None):
+        """从列式历史或数据库读取 [start, end] 内每步的价格，返回 (timestamps, prices)。"""
+        if self.history_store is not None:
+            return self.history_store.prices(stock_code, start, end)
+        rows = self.storage.load_price_range(stock_code, start, end)
+        return [row[0] for row in rows], [float(row[1]) for row in rows]
+
+    def load_recent_prices(self, stock_codes):
+        """读取每只股票最近 max(long_window, trend_window) 个价格，返回 {stock_code: [(timestamp, price), ...]}。"""
+        limit = max(self.long_window, self.trend_window)
+        if limit <= 0:
+            return {}
+        if self.history_store is None or self.persist_history:
+            return self.storage.load_recent_prices(stock_codes, limit)
+        # 历史只写入列式存储时，直接取映射数组的末尾
+        recent = {}
+        for stock_code in stock_codes:
+            timestamps, prices = self.history_store.prices(stock_code)
+            if len(timestamps):
+                recent[stock_code] = list(zip(timestamps[-limit:].tolist(), prices[-limit:].tolist()))
+        return recent
 
-                # 找到 Player 用户
-                if user_id == "Player":
-                    self.player = user
-
-            # 如果数据库为空，则创建默认用户
-            if not self.users:
-                self.player.strategy = MeanReversionStrategy(window=self.trend_window)
-                self.add_user_to_db(self.player.user_id, initial_balance, "MeanReversion")
-                self.users.append(self.player) # 确保添加到用户列表
-
-        except mysql.connector.Error as err:
-            print(f"加载用户信息失败: {err}")
+    def load_users_from_db(self, initial_balance):
+        """从数据库加载用户信息，用户和持仓各一次查询。"""
+        user_records = self.storage.load_users()
+
+        # 一次加载所有持仓，按用户分组
+        holdings_by_user = {}
+        for user_id, stock_code, quantity in self.storage.load_all_holdings():
+            holdings_by_user.setdefault(user_id, {})[stock_code] = quantity
+
+        for user_id, balance, strategy in user_records:
+            user = User(user_id, balance)
+            user.strategy = self.create_strategy(strategy)  # 创建策略对象
+            user.holdings = holdings_by_user.get(user_id, {})
+            self.users.append(user)
+
+            # 找到 Player 用户
+            if user_id == "Player":
+                self.player = user
+
+        # 如果数据库为空，则创建默认用户
+        if not self.users:
+            self.player.strategy = self.create_strategy("MeanReversion")
+            self.add_user_to_db(self.player.user_id, initial_balance, "MeanReversion")
+            self.users.append(self.player) # 确保添加到用户列表
 
     def load_user_holdings_from_db(self, user):
         """从数据库加载用户持仓信息。"""
-        try:
-            self.mycursor.execute("SELECT stock_code, quantity FROM user_holdings WHERE user_id = %s", (user.user_id,))
-            holding_records = self.mycursor.fetchall()
-            for stock_code, quantity in holding_records:
-                user.holdings[stock_code] = quantity
-        except mysql.connector.Error as err:
-            print(f"加载用户持仓信息失败: {err}")
+        for stock_code, quantity in self.storage.load_user_holdings(user.user_id):
+            user.holdings[stock_code] = quantity
+        self.valuation.touch(user)
 
     def add_stock_to_db(self, stock_code, initial_price, volatility):
         """将股票信息添加到数据库。"""
-        try:
-            sql = "INSERT INTO stocks (stock_code, initial_price, volatility, current_price) VALUES (%s, %s, %s, %s)"
-            val = (stock_code, initial_price, volatility, initial_price)
-            self.sql_buffer.append((sql, val))
-            self.execute_buffered()
-        except mysql.connector.Error as err:
-            print(f"添加股票信息到数据库失败: {err}")
+        self.storage.add_stock(stock_code, initial_price, volatility)
 
     def add_user_to_db(self, user_id, initial_balance, strategy):
         """将用户信息添加到数据库。"""
-        try:
-            sql = "INSERT INTO users (user_id, balance, strategy) VALUES (%s, %s, %s)"
-            val = (user_id, initial_balance, strategy)
-            self.sql_buffer.append((sql, val))
-            self.execute_buffered()
-        except mysql.connector.Error as err:
-            print(f"添加用户信息到数据库失败: {err}")
-
-    def create_strategy(self, strategy_name):
-        """根据策略名称创建策略对象。"""
-        if strategy_name == "MeanReversion":
-            return MeanReversionStrategy(window=self.trend_window)
-        elif strategy_name == "TrendFollowing":
-            return TrendFollowingStrategy(window=self.trend_window)
-        elif strategy_name == "Random":
-            return RandomTradingStrategy()
-        else:
+        self.storage.add_user(user_id, initial_balance, strategy)
+
+    def create_strategy(self, strategy_name, **params):
+        """
+        根据策略名称（见 register_strategy）取得策略对象，未注册的名称返回 None。
+        params 默认为策略类的 default_params；名称和参数都相同的用户共享同一个策略实例。
+        """
+        cls = STRATEGIES.get(strategy_name)
+        if cls is None:
             return None
+        if not params:
+            params = cls.default_params(self)
+        key = self.strategy_key(strategy_name, params)
+        strategy = self.strategies.get(key)
+        if strategy is None:
+            strategy = self.strategies[key] = cls(**params)
+        return strategy
+
+    @staticmethod
+    def strategy_key(strategy_name, params):
+        """共享策略实例的缓存键。"""
+        return (strategy_name, tuple(sorted(params.items())))
 
     def add_stock(self, stock_code, initial_price, volatility):
         """添加新的股票到股票池。"""
@@ -404,9 +531,9 @@ class StockMarketSimulator:
 
         self.add_stock_to_db(stock_code, initial_price, volatility) # 添加到数据库
         self.stocks[stock_code] = {
-            'price': Decimal(str(initial_price)),
-            'volatility': Decimal(str(volatility)),
-            'prices': [Decimal(str(initial_price))]
+            'price': to_ticks(initial_price),
+            'volatility': float(volatility),
+            'prices': self.price_history([to_ticks(initial_price)])
         }
 
     def remove_stock(self, stock_code):
@@ -414,101 +541,123 @@ class StockMarketSimulator:
         if stock_code not in self.stocks:
             raise ValueError(f"Stock {stock_code} does not exist.")
 
+        # 撤销订单簿中的挂单，冻结的资金和股票先退回
+        book = self.order_books.pop(stock_code, None)
+        if book is not None:
+            for order in book.cancel_all():
+                self.release_order(stock_code, order)
+
         # 获取要移除的股票的当前价格
         stock_price = self.stocks[stock_code]['price']
 
-        # 遍历所有用户，将持有的该股票的价值返还给用户
+        # 将持有的该股票的价值返还给用户。持仓为 0 的用户不在估值的持有者索引中，但 holdings 里仍有这只股票，
+        # 数据库中也有数量为 0 的持仓行，所以遍历所有用户，一并删除这些键和行
         for user in self.users:
-            if stock_code in user.holdings:
-                holdings = user.holdings[stock_code]
-                revenue = float(stock_price) * float(holdings)
-                user.balance += revenue
-                del user.holdings[stock_code]  # 清除持仓
-                self.update_user_holdings_in_db(user) # 更新数据库
+            holdings = user.holdings.pop(stock_code, None)
+            if holdings is None:
+                continue
+            if holdings:
+                user.balance += stock_price * holdings
+                self.mark_balance_dirty(user)
+            self.mark_holding_dirty(user, stock_code)  # 写回时持仓已不存在，删除对应的行
 
         del self.stocks[stock_code] # 从股票池中删除股票
 
+        # 先写回持仓变化，再删除股票
+        self.flush_dirty()
+
         # 从数据库中删除股票
-        try:
-            sql = "DELETE FROM stocks WHERE stock_code = %s"
-            val = (stock_code,)
-            self.sql_buffer.append((sql, val))
-            self.execute_buffered()
-        except mysql.connector.Error as err:
-            print(f"从数据库删除股票失败: {err}")
+        self.storage.delete_stock(stock_code)
 
     def add_user(self, user_id, initial_balance, strategy_name="MeanReversion"):
         """添加新的用户到模拟器。"""
         user = User(user_id, initial_balance)
-        if strategy_name == "MeanReversion":
-            user.strategy = MeanReversionStrategy(window=self.trend_window)
-        elif strategy_name == "TrendFollowing":
-            user.strategy = TrendFollowingStrategy(window=self.trend_window)
-        elif strategy_name == "Random":
-            user.strategy = RandomTradingStrategy()
-        else:
-            user.strategy = None  # 默认无策略
+        user.strategy = self.create_strategy(strategy_name)  # 未注册的策略名称为无策略
 
         self.add_user_to_db(user_id, initial_balance, strategy_name) # 添加到数据库
         self.users.append(user)
+        if self.scheduler is not None:
+            self.scheduler.schedule(user, self.total_trades)
         return user
 
     def remove_user(self, user_id):
         """从模拟器中移除用户。"""
-        user_to_remove = None
-        for user in self.users:
-            if user.user_id == user_id:
-                user_to_remove = user
-                break
+        user_to_remove = self.users.get(user_id)
 
         if user_to_remove:
-            self.users.remove(user_to_remove)
+            self.users.remove(user_id)
+            self.user_trade_probability.pop(user_id, None)
+            self.valuation.forget(user_id)
+            if self.scheduler is not None:
+                self.scheduler.remove(user_id)
+            for book in self.order_books.values():
+                book.cancel_all(user_to_remove)
+
+            # 丢弃该用户尚未写回的变化
+            self.dirty_balances.pop(user_id, None)
+            for key in [key for key in self.dirty_holdings if key[0] == user_id]:
+                del self.dirty_holdings[key]
 
             # 从数据库中删除用户
-            try:
-                sql = "DELETE FROM users WHERE user_id = %s"
-                val = (user_id,)
-                self.sql_buffer.append((sql, val))
-                self.execute_buffered()
-            except mysql.connector.Error as err:
-                print(f"从数据库删除用户失败: {err}")
+            self.storage.delete_user(user_id)
 
         else:
             raise ValueError(f"User {user_id} does not exist.")
 
     def update_user_holdings_in_db(self, user):
         """更新用户持仓信息到数据库。"""
-        try:
-            # 获取用户当前在数据库中的持仓
-            sql = "SELECT stock_code, quantity FROM user_holdings WHERE user_id = %s"
-            val = (user.user_id,)
-            self.mycursor.execute(sql, val)
-            existing_holdings = {stock_code: quantity for stock_code, quantity in self.mycursor.fetchall()}
-
-            # 找出需要更新或插入的持仓
-            for stock_code, quantity in user.holdings.items():
-                if stock_code in existing_holdings:
-                    # 如果持仓已经存在，并且数量不同，则更新
-                    if quantity != existing_holdings[stock_code]:
-                        sql = "UPDATE user_holdings SET quantity = %s WHERE user_id = %s AND stock_code = %s"
-                        val = (quantity, user.user_id, stock_code)
-                        self.sql_buffer.append((sql, val))
-                else:
-                    # 如果持仓不存在，则插入
-                    sql = "INSERT INTO user_holdings (user_id, stock_code, quantity) VALUES (%s, %s, %s)"
-                    val = (user.user_id, stock_code, quantity)
-                    self.sql_buffer.append((sql, val))
-
-            # 找出需要删除的持仓
-            for stock_code in existing_holdings:
-                if stock_code not in user.holdings:
-                    sql = "DELETE FROM user_holdings WHERE user_id = %s AND stock_code = %s"
-                    val = (user.user_id, stock_code)
-                    self.sql_buffer.append((sql, val))
-
+        self.storage.upsert_user_holdings([(user.user_id, stock_code, quantity) for stock_code, quantity in user.holdings.items()])
+
+    def mark_holding_dirty(self, user, stock_code):
+        """标记用户某只股票的持仓需要写回，同时需要重新估值。"""
+        self.dirty_holdings[(user.user_id, stock_code)] = user
+        self.valuation.touch(user)
+
+    def mark_balance_dirty(self, user):
+        """标记用户余额需要写回，同时需要重新估值。"""
+        self.dirty_balances[user.user_id] = user
+        self.valuation.touch(user)
+
+    def holders(self, stock_code):
+        """持有该股票（数量不为零）的用户ID，来自估值维护的反向索引，开销与持有者数成正比。"""
+        self.valuation.refresh(self.stocks)
+        return self.valuation.positions.get(stock_code, {}).keys()
+
+    def asset_value(self, user):
+        """用户按当前价格计算的资产（分）。"""
+        self.valuation.refresh(self.stocks)
+        return self.valuation.value(user, self.stocks)
+
+    def flush_dirty(self):
+        """把标记过的持仓和余额合并写回数据库，每个 (用户, 股票) 只写一行。"""
+        if not self.dirty_holdings and not self.dirty_balances:
+            # 没有要写回的行时仍按写回策略检查缓冲区，超过 max_interval 的语句不会一直留到下一次追加
             self.execute_buffered()
-        except mysql.connector.Error as err:
-            print(f"更新用户持仓信息失败: {err}")
+            return
+
+        start = time.perf_counter()
+        upserts = []
+        deletes = []
+        for (user_id, stock_code), user in self.dirty_holdings.items():
+            quantity = user.holdings.get(stock_code)
+            if quantity is None:
+                deletes.append((user_id, stock_code))
+            else:
+                upserts.append((user_id, stock_code, quantity))
+        balances = [(user_id, to_decimal(user.balance)) for user_id, user in self.dirty_balances.items()]
+        self.dirty_holdings.clear()
+        self.dirty_balances.clear()
+
+        if upserts:
+            self.storage.upsert_user_holdings(upserts)
+        if deletes:
+            self.storage.delete_user_holdings(deletes)
+        if balances:
+            self.storage.update_user_balances(balances)
+        self.execute_buffered(force=True)
+        self.metrics.incr("flushes")
+        self.metrics.incr("rows_written", len(upserts) + len(deletes) + len(balances))
+        self.metrics.add_time("flush", time.perf_counter() - start)
 
     def simulate_trade(self, user):
         """模拟单个用户的交易，现在可以交易股票池中的所有股票。"""
@@ -520,26 +669,272 @@ class StockMarketSimulator:
         except Exception as e:
             print(f"模拟用户 {user.user_id} 的交易时出错: {e}")
 
+    def trade_rate(self, user):
+        """用户每步交易的概率：单独设置的概率优先，其次是策略的 trade_probability 属性，最后是全局的 trade_probability。"""
+        probability = self.user_trade_probability.get(user.user_id)
+        if probability is None:
+            probability = getattr(user.strategy, 'trade_probability', None)
+        return self.trade_probability if probability is None else probability
+
+    def set_trade_probability(self, user_id, probability):
+        """设置单个用户每步交易的概率，probability 为 None 时恢复为策略或全局设置。"""
+        if probability is None:
+            self.user_trade_probability.pop(user_id, None)
+        else:
+            self.user_trade_probability[user_id] = probability
+        user = self.users.get(user_id)
+        if self.scheduler is not None and user is not None:
+            self.scheduler.schedule(user, self.total_trades)
+
+    def active_users(self, step):
+        """第 step 步参与交易的用户，按用户列表顺序。"""
+        if self.scheduler is None:
+            return [user for user in self.users if random.random() < self.trade_rate(user)]
+        # 用户列表被直接修改或全局交易概率改变后重新安排
+        if len(self.scheduler) != len(self.users) or self.scheduled_probability != self.trade_probability:
+            self.scheduler.rebuild(self.users, step - 1)
+            self.scheduled_probability = self.trade_probability
+        return self.scheduler.due(step)
+
+    def execute_orders(self, user, orders):
+        """按顺序逐笔执行 orders() 生成的订单，每笔立即成交并推动价格。"""
+        for stock_code, quantity in orders:
+            if quantity > 0:
+                self.buy_stock(user, stock_code, quantity)
+            else:
+                self.sell_stock(user, stock_code, -quantity)
+
+    def collect_orders(self, users):
+        """
+        在当前行情快照上收集所有用户的订单，返回按用户顺序排列的 [(user, orders), ...]。
+        共享同一策略实例的用户通过一次 execute_batch 调用生成订单；各策略只读取快照、互不影响，可以并行计算。
+        """
+        start = time.perf_counter()
+        groups = {}  # id(strategy) -> (strategy, users)
+        for user in users:
+            if user.strategy:
+                groups.setdefault(id(user.strategy), (user.strategy, []))[1].append(user)
+            else:
+                print(f"用户 {user.user_id} 没有策略。")
+
+        decisions = {}
+        for strategy, members in groups.values():
+            try:
+                for user, orders in strategy.execute_batch(members, self.stocks):
+                    decisions[id(user)] = orders
+            except Exception as e:
+                print(f"策略 {type(strategy).__name__} 生成订单时出错: {e}")
+        self.metrics.add_time("strategy", time.perf_counter() - start)
+        return [(user, decisions[id(user)]) for user in users if id(user) in decisions]
+
+    def auction_step(self, step):
+        """
+        集合竞价的一步：以 trade_probability 选出参与交易的用户，在同一行情快照上收集订单，然后每只股票一次性撮合。
+        - 所有订单以快照价格成交；每个用户的订单按顺序检查余额和持仓，余额不足或持仓不足的订单不成交；
+        - 每只股票只更新一次价格：价格变动 = 价格 × uniform(0, 波动率) × 净买入量 / 总成交量，
+          成交量全部为买入时与逐笔模式中单笔买入的冲击相同；
+        - 价格和数据库写入的次数只与股票数有关，与成交笔数无关。
+        """
+        active = self.active_users(step)
+        bought = {}  # stock_code -> 买入总量
+        sold = {}  # stock_code -> 卖出总量
+        trades = 0
+        for user, orders in self.collect_orders(active):
+            for stock_code, quantity in orders:
+                stock_data = self.stocks.get(stock_code)
+                if stock_data is None:
+                    continue
+                quantity = int(quantity)
+                holdings = user.holdings.get(stock_code, 0)
+                if quantity > 0:
+                    cost = stock_data['price'] * quantity
+                    if user.balance < cost:
+                        continue
+                    user.balance -= cost
+                    user.holdings[stock_code] = holdings + quantity
+                    bought[stock_code] = bought.get(stock_code, 0) + quantity
+                elif quantity < 0:
+                    if holdings < -quantity:
+                        continue
+                    user.balance -= stock_data['price'] * quantity
+                    user.holdings[stock_code] = holdings + quantity
+                    sold[stock_code] = sold.get(stock_code, 0) - quantity
+                else:
+                    continue
+                trades += 1
+                self.mark_holding_dirty(user, stock_code)
+                self.mark_balance_dirty(user)
+
+            if user.balance <= 0 and self.bankrupt_user is None:
+                self.bankrupt_user = user  # 记录破产用户
+                print(f"User {user.user_id} went bankrupt!")
+
+        self.metrics.incr("trades", trades)
+
+        # 每只股票一次价格更新
+        for stock_code, stock_data in self.stocks.items():
+            buy_volume = bought.get(stock_code, 0)
+            sell_volume = sold.get(stock_code, 0)
+            if not buy_volume and not sell_volume:
+                continue
+            imbalance = (buy_volume - sell_volume) / (buy_volume + sell_volume)
+            stock_data['price'] += round(stock_data['price'] * random.uniform(0, stock_data['volatility']) * imbalance)
+            stock_data['prices'].append(stock_data['price'])  # 记录价格
+            self.update_stock_price_in_db(stock_code, stock_data['price'])
+
+    def order_book(self, stock_code):
+        """股票的订单簿，不存在时创建。"""
+        book = self.order_books.get(stock_code)
+        if book is None:
+            book = self.order_books[stock_code] = OrderBook(stock_code)
+        return book
+
+    def submit_order(self, user, stock_code, quantity, limit_price=None):
+        """
+        向股票的订单簿提交订单，在用户之间撮合（见 orderbook.py）。
+        quantity 为正表示买入、为负表示卖出；limit_price 为限价（分），None 为市价单，市价单未成交的部分直接取消。
+        限价买单按限价冻结资金，卖单冻结股票，成交时按成交价结算（买单退回限价与成交价之差），撤单时解冻剩余部分。
+        成交后股票价格更新为最后一笔成交价。返回 (order, fills)，余额或持仓不足时返回 (None, [])。
+        """
+        try:
+            stock_data = self.stocks[stock_code]
+            quantity = int(quantity)
+            side = BUY if quantity > 0 else SELL
+            quantity = abs(quantity)
+            budget = None
+            if user is self.market_maker:
+                if side == SELL:
+                    user.holdings[stock_code] = user.holdings.get(stock_code, 0) - quantity
+                else:
+                    user.balance -= limit_price * quantity
+            elif side == BUY:
+                if limit_price is None:
+                    budget = user.balance  # 市价买单只成交买得起的部分
+                elif user.balance >= limit_price * quantity:
+                    user.balance -= limit_price * quantity
+                else:
+                    print(f"用户 {user.user_id} 余额不足，无法购买 {stock_code}。")
+                    return None, []
+            else:
+                current_holdings = user.holdings.get(stock_code, 0)
+                if current_holdings < quantity:
+                    print(f"用户 {user.user_id} 持有 {stock_code} 的数量不足，无法卖出。")
+                    return None, []
+                user.holdings[stock_code] = current_holdings - quantity
+
+            order, fills = self.order_book(stock_code).submit(user, side, quantity, limit_price, budget)
+            for maker, price, fill in fills:
+                counterparty = maker.owner
+                if side == BUY:
+                    user.balance -= price * fill if limit_price is None else (price - limit_price) * fill
+                    user.holdings[stock_code] = user.holdings.get(stock_code, 0) + fill
+                    counterparty.balance += price * fill
+                else:
+                    user.balance += price * fill
+                    counterparty.holdings[stock_code] = counterparty.holdings.get(stock_code, 0) + fill
+                self.mark_order_dirty(counterparty, stock_code)
+
+            # 市价卖单未成交的股票退回
+            if side == SELL and not order.active and order.remaining:
+                user.holdings[stock_code] += order.remaining
+            self.mark_order_dirty(user, stock_code)
+
+            if fills:
+                self.metrics.incr("trades", len(fills))
+                stock_data['price'] = fills[-1][1]
+                stock_data['prices'].append(stock_data['price'])  # 记录价格
+                self.update_stock_price_in_db(stock_code, stock_data['price'])
+            if not self.in_simulation:
+                self.flush_dirty()
+            return order, fills
+        except Exception as e:
+            print(f"提交 {stock_code} 的订单时出错: {e}")
+            return None, []
+
+    def cancel_order(self, stock_code, order_id):
+        """撤销挂单并解冻剩余的资金或股票，返回被撤销的订单，订单不存在或已成交时返回 None。"""
+        book = self.order_books.get(stock_code)
+        order = book.cancel(order_id) if book is not None else None
+        if order is not None:
+            self.release_order(stock_code, order)
+            if not self.in_simulation:
+                self.flush_dirty()
+        return order
+
+    def release_order(self, stock_code, order):
+        """解冻已撤销订单剩余部分冻结的资金或股票。"""
+        user = order.owner
+        if order.side == BUY:
+            user.balance += order.price * order.remaining
+        else:
+            user.holdings[stock_code] = user.holdings.get(stock_code, 0) + order.remaining
+        self.mark_order_dirty(user, stock_code)
+
+    def mark_order_dirty(self, user, stock_code):
+        """标记订单涉及的余额和持仓需要写回，做市商除外。"""
+        if user is not self.market_maker:
+            self.mark_holding_dirty(user, stock_code)
+            self.mark_balance_dirty(user)
+
+    def order_book_step(self, step):
+        """
+        订单簿模式的一步：参与交易的用户把策略生成的订单作为限价单依次提交到订单簿，在用户之间撮合。
+        买单限价为 价格 × (1 + uniform(0, 波动率))，卖单为 价格 × (1 - uniform(0, 波动率))，成交价为挂单方的限价；
+        做市商每步在 价格 × (1 ± 波动率 / 2) 各挂 MARKET_MAKER_DEPTH 股，为没有对手方的订单提供流动性。
+        本步未成交的订单（包括做市商报价）在步末撤销并解冻（当日有效），玩家通过交易界面提交的挂单不受影响。
+        """
+        active = self.active_users(step)
+        resting = []
+        for stock_code, stock_data in self.stocks.items():
+            half_spread = stock_data['volatility'] / 2
+            for quantity, factor in ((self.MARKET_MAKER_DEPTH, 1 - half_spread), (-self.MARKET_MAKER_DEPTH, 1 + half_spread)):
+                order, fills = self.submit_order(self.market_maker, stock_code, quantity,
+                                                 max(round(stock_data['price'] * factor), 1))
+                if order is not None and order.active:
+                    resting.append((stock_code, order.order_id))
+
+        for user, orders in self.collect_orders(active):
+            for stock_code, quantity in orders:
+                stock_data = self.stocks.get(stock_code)
+                if stock_data is None or not quantity:
+                    continue
+                offset = random.uniform(0, stock_data['volatility'])
+                limit_price = round(stock_data['price'] * (1 + offset if quantity > 0 else 1 - offset))
+                order, fills = self.submit_order(user, stock_code, quantity, max(limit_price, 1))
+                if order is not None and order.active:
+                    resting.append((stock_code, order.order_id))
+
+        for stock_code, order_id in resting:
+            self.cancel_order(stock_code, order_id)
+
+        for user in active:
+            if user.balance <= 0 and self.bankrupt_user is None:
+                self.bankrupt_user = user  # 记录破产用户
+                print(f"User {user.user_id} went bankrupt!")
+
     def buy_stock(self, user, stock_code, quantity):
         """模拟买入股票。"""
         try:
             stock_data = self.stocks[stock_code]
-            cost = stock_data['price'] * Decimal(str(quantity))
+            # 确保 quantity 是整数，金额都以分为单位
+            quantity = int(quantity)
+            cost = stock_data['price'] * quantity
             if user.balance >= cost:
                 user.balance -= cost
-                # 确保 quantity 是整数
-                quantity = int(quantity)
                 current_holdings = user.holdings.get(stock_code, 0)
                 user.holdings[stock_code] = current_holdings + quantity
+                self.metrics.incr("trades")
 
-                price_change = Decimal(str(random.uniform(0, float(stock_data['volatility'])))) * stock_data['price']
+                price_change = round(stock_data['price'] * random.uniform(0, stock_data['volatility']))
                 stock_data['price'] += price_change
                 stock_data['prices'].append(stock_data['price'])  # 记录价格
 
-                # 更新数据库
+                # 更新数据库，持仓和余额只做标记，稍后合并写回
                 self.update_stock_price_in_db(stock_code, stock_data['price'])
-                self.update_user_holdings_in_db(user)
-                self.update_user_balance_in_db(user)
+                self.mark_holding_dirty(user, stock_code)
+                self.mark_balance_dirty(user)
+                if not self.in_simulation:
+                    self.flush_dirty()
 
             else:
                 print(f"用户 {user.user_id} 余额不足，无法购买 {stock_code}。")
@@ -555,16 +950,19 @@ class StockMarketSimulator:
 
             if current_holdings >= quantity:
                 user.holdings[stock_code] -= quantity
-                revenue = stock_data['price'] * Decimal(str(quantity))
+                revenue = stock_data['price'] * quantity
                 user.balance += revenue
-                price_change = Decimal(str(random.uniform(0, float(stock_data['volatility'])))) * stock_data['price']
+                self.metrics.incr("trades")
+                price_change = round(stock_data['price'] * random.uniform(0, stock_data['volatility']))
                 stock_data['price'] -= price_change
                 stock_data['prices'].append(stock_data['price'])  # 记录价格
 
-                # 更新数据库
+                # 更新数据库，持仓和余额只做标记，稍后合并写回
                 self.update_stock_price_in_db(stock_code, stock_data['price'])
-                self.update_user_holdings_in_db(user)
-                self.update_user_balance_in_db(user)
+                self.mark_holding_dirty(user, stock_code)
+                self.mark_balance_dirty(user)
+                if not self.in_simulation:
+                    self.flush_dirty()
 
             else:
                 print(f"用户 {user.user_id} 持有 {stock_code} 的数量不足，无法卖出。")
@@ -572,29 +970,25 @@ class StockMarketSimulator:
             print(f"卖出股票 {stock_code} 时出错: {e}")
 
     def update_stock_price_in_db(self, stock_code, price):
-        """更新股票价格到数据库。"""
-        try:
-            sql = "UPDATE stocks SET current_price = %s WHERE stock_code = %s"
-            val = (float(price), stock_code)
-            self.sql_buffer.append((sql, val))
-            self.execute_buffered()
-        except mysql.connector.Error as err:
-            print(f"更新股票价格失败: {err}")
+        """更新股票价格（分）到数据库。"""
+        self.storage.update_stock_price(stock_code, to_decimal(price))
+        self.metrics.incr("rows_written")
 
     def update_user_balance_in_db(self, user):
         """更新用户余额到数据库。"""
-        try:
-            sql = "UPDATE users SET balance = %s WHERE user_id = %s"
-            val = (float(user.balance), user.user_id)
-            self.sql_buffer.append((sql, val))
-            self.execute_buffered()
-        except mysql.connector.Error as err:
-            print(f"更新用户余额失败: {err}")
+        self.storage.update_user_balance(user.user_id, to_decimal(user.balance))
+        self.metrics.incr("rows_written")
 
-    def run_simulation(self, num_trades=100):
-        """运行模拟。"""
+    def run_simulation(self, num_trades=100, auction=False, order_book=False):
+        """
+        运行模拟。auction 为 True 时每步以集合竞价方式撮合（见 auction_step），
+        order_book 为 True 时订单在用户之间通过订单簿撮合（见 order_book_step），否则逐个用户依次成交。
+        """
         asset_history_data = []
         stock_price_data = []
+        self.in_simulation = True
+        metrics = self.metrics
+        profiler = self.profiler
 
         for i in range(num_trades):
             if self.bankrupt_user is not None:
@@ -602,74 +996,276 @@ class StockMarketSimulator:
                 break
 
             # 模拟所有用户的交易
-            for user in self.users:
-                if random.random() < self.trade_probability:
+            step = self.total_trades + i + 1
+            if profiler is not None:
+                profiler.before_step(step)
+            start = time.perf_counter()
+            if auction:
+                self.auction_step(step)
+            elif order_book:
+                self.order_book_step(step)
+            elif self.scheduler is not None:
+                for user in self.active_users(step):
                     self.simulate_trade(user)
                     if user.balance <= 0:
                         self.bankrupt_user = user  # 记录破产用户
                         print(f"User {user.user_id} went bankrupt!")
                         break # 退出内层循环
-
-            # 更新所有用户的资产历史
+            else:
+                for user in self.users:
+                    if random.random() < self.trade_rate(user):
+                        self.simulate_trade(user)
+                        if user.balance <= 0:
+                            self.bankrupt_user = user  # 记录破产用户
+                            print(f"User {user.user_id} went bankrupt!")
+                            break # 退出内层循环
+            checkpoint = time.perf_counter()
+            metrics.add_time("trading", checkpoint - start)
+
+            # 更新所有用户的资产历史，资产由 valuation 增量维护，只重新计算本步有变化的部分
             try:
-                stock_prices = {stock_code: float(data['price']) for stock_code, data in self.stocks.items()}
+                valuation = self.valuation
+                valuation.refresh(self.stocks)
                 for user in self.users:
-                    user.update_asset_history(self.total_trades + i + 1, stock_prices)
-                    asset_history_data.append((user.user_id, self.total_trades + i + 1, float(user.asset_history[-1][1])))
+                    asset_value = valuation.value(user, self.stocks)
+                    user.asset_history.append(step, asset_value)
+                    asset_history_data.append((user.user_id, step, to_float(asset_value)))
 
                 # 如果没有交易发生，也要记录价格，保持时间戳的连续性
                 for stock_code, stock_data in self.stocks.items():
                     stock_data['prices'].append(stock_data['price'])
-                    stock_price_data.append((stock_code, self.total_trades + i + 1, float(stock_data['price'])))
+                    stock_price_data.append((stock_code, step, to_float(stock_data['price'])))
 
             except Exception as e:
                 print(f"Error in run_simulation loop: {e}")
+            metrics.add_time("valuation", time.perf_counter() - checkpoint)
+            metrics.incr("steps")
+
+            # 按间隔写回本步变化的持仓和余额
+            if (i + 1) % self.flush_interval == 0:
+                self.flush_dirty()
+            else:
+                # 写回策略的 max_interval 在追加语句时才检查，步末再检查一次
+                self.execute_buffered()
+
+            if profiler is not None:
+                profiler.after_step(step)
+            if self.metrics_dump is not None and step % self.metrics_dump[1] == 0:
+                self.dump_metrics()
 
+        if profiler is not None:
+            profiler.pause()
+        self.in_simulation = False
+        self.finish_simulation(num_trades, stock_price_data, asset_history_data)
+
+    def run_simulation_vectorized(self, num_trades=100, seed=None):
+        """
+        用 NumPy 向量化内核运行模拟（见 vector_engine.py），历史和数据库的写回方式与 run_simulation 相同。
+        持仓和余额在运行结束时统一写回。返回成交笔数。
+        """
+        from vector_engine import VectorizedEngine
+
+        start = time.perf_counter()
+        engine = VectorizedEngine(self, seed)
+        stock_price_data, asset_history_data, values, timestamps = engine.run(num_trades)
+        engine.sync(values, timestamps)
+        self.metrics.add_time("trading", time.perf_counter() - start)
+        self.metrics.incr("trades", engine.trades)
+        self.metrics.incr("steps", len(timestamps))  # 出现破产用户时提前停止
+        self.finish_simulation(num_trades, stock_price_data, asset_history_data)
+        return engine.trades
+
+    def finish_simulation(self, num_trades, stock_price_data, asset_history_data):
+        """一次模拟结束后写回持仓和余额，并保存本次的价格和资产历史。"""
+        self.flush_dirty()
         self.total_trades += num_trades # 更新总交易次数
+        start = time.perf_counter()
+
+        # 追加到列式历史存储
+        if self.history_store is not None:
+            self.history_store.append_prices(stock_price_data)
+            self.history_store.append_assets(asset_history_data)
+            self.history_store.flush()
 
         # 批量插入资产历史和股票价格
-        self.insert_asset_history_to_db(asset_history_data)
-        self.insert_stock_price_to_db(stock_price_data)
+        if self.persist_history:
+            self.insert_asset_history_to_db(asset_history_data)
+            self.insert_stock_price_to_db(stock_price_data)
         self.execute_buffered(force=True)  # 强制提交剩余的SQL语句
+        self.metrics.add_time("history", time.perf_counter() - start)
+        if self.metrics_dump is not None:
+            self.dump_metrics()
 
     def insert_stock_price_to_db(self, data):
         """批量将股票价格插入数据库。"""
-        try:
-            sql = "INSERT INTO stock_prices (stock_code, timestamp, price) VALUES (%s, %s, %s)"
-            self.mycursor.executemany(sql, data)
-            self.mydb.commit()
-        except mysql.connector.Error as err:
-            print(f"插入股票价格失败: {err}")
+        self.storage.insert_stock_prices(data)
+        self.metrics.incr("rows_written", len(data))
 
     def insert_asset_history_to_db(self, data):
         """批量将用户资产历史插入数据库。"""
-        try:
-            sql = "INSERT INTO asset_history (user_id, timestamp, asset_value) VALUES (%s, %s, %s)"
-            self.mycursor.executemany(sql, data)
-            self.mydb.commit()
-        except mysql.connector.Error as err:
-            print(f"插入资产历史失败: {err}")
+        self.storage.insert_asset_history(data)
+        self.metrics.incr("rows_written", len(data))
 
     def execute_buffered(self, force=False):
         """执行缓冲区中的SQL语句。"""
-        if len(self.sql_buffer) >= self.buffer_size or force:
-            try:
-                for sql, val in self.sql_buffer:
-                    self.mycursor.execute(sql, val)
-                self.mydb.commit()
-                self.sql_buffer.clear()
-            except mysql.connector.Error as err:
-                print(f"执行缓冲SQL失败: {err}")
-
-    def plot_price_history(self, ax, stock_codes=None):
-        """绘制价格历史到指定的Axes对象。"""
+        self.storage.execute_buffered(force=force)
+
+    def get_metrics(self):
+        """
+        运行指标的快照（字典）：
+        - timers：各阶段的调用次数和累计秒数。trading 为每步用户交易的总耗时，逐笔模式中策略计算和成交交替进行，
+          不单独计时（需要细分时用 profile_steps）；集合竞价和订单簿模式中生成订单的部分另计为 strategy。
+          valuation 为每步更新资产历史，flush 为写回持仓和余额，history 为每次运行结束时保存价格和资产历史，plot 为绘图；
+        - counters：steps、trades（成交笔数）、rows_written（交给存储后端的行数）、flushes（写回次数），
+          SQL 后端还有 sql_statements（执行的语句数，executemany 算一条）、sql_rows（语句的参数行数）和 commits（提交次数）；
+        - histograms：commit_seconds 为 SQL 后端每次提交的延迟；
+        - gauges：当前的用户数、股票数、总步数和存储错误数。
+        """
+        snapshot = self.metrics.snapshot()
+        snapshot['gauges'] = {
+            'users': len(self.users),
+            'stocks': len(self.stocks),
+            'total_steps': self.total_trades,
+            'storage_errors': len(self.storage_errors),
+        }
+        return snapshot
+
+    def set_metrics_dump(self, path, interval=100, format=None):
+        """
+        模拟过程中每 interval 步以及每次运行结束时把 get_metrics() 写入 path，path 为 None 时停止。
+        format 为 "json" 或 "prometheus"，默认按扩展名判断（.prom 为 Prometheus 文本格式）。
+        """
+        if path is None:
+            self.metrics_dump = None
+        elif interval <= 0:
+            raise ValueError("Metrics dump interval must be positive.")
+        else:
+            self.metrics_dump = (path, interval, format)
+
+    def dump_metrics(self, path=None, format=None):
+        """立即把指标写入 path，默认写入 set_metrics_dump 设置的文件。"""
+        if path is None:
+            if self.metrics_dump is None:
+                return
+            path, _, format = self.metrics_dump
+        try:
+            write_snapshot(self.get_metrics(), path, format)
+        except (OSError, ValueError) as e:
+            print(f"写入运行指标失败: {e}")
+
+    def profile_steps(self, start, end, path):
+        """
+        用 cProfile 分析第 start 到第 end 步（含，按总步数计）的 run_simulation 或 run_simulation_vectorized，
+        到达第 end 步后把统计写入 path；没有运行到第 end 步时在 close_db_connection 中写入。
+        """
+        self.profiler = StepProfiler(start, end, path)
+
+    CHECKPOINT_MAGIC = b"SMCKPT"
+    CHECKPOINT_VERSION = 3  # 2: 金额为整数分；3: 资产历史为 AssetHistory
+
+    def save_checkpoint(self, path):
+        """把完整的模拟器状态保存为二进制快照（股票、价格窗口、用户、持仓、策略、事件调度、随机数状态、交易次数）。"""
+        # 按列保存用户数据，比逐个 pickle User 对象更紧凑，也不依赖 User 的内部结构
+        users = self.users
+        state = {
+            'stocks': {code: (data['price'], data['volatility'], list(data['prices'])) for code, data in self.stocks.items()},
+            'user_ids': [user.user_id for user in users],
+            'balances': [user.balance for user in users],
+            'holdings': [user.holdings for user in users],
+            'strategies': [user.strategy for user in users],  # 共享的策略对象只保存一次
+            'asset_histories': [user.asset_history for user in users],
+            # 挂单按下单顺序保存，冻结的资金和股票已从余额和持仓中扣除
+            'orders': [(stock_code, order.owner.user_id, order.side, order.price, order.remaining)
+                       for stock_code, book in self.order_books.items() for order in book.orders.values()],
+            'player_id': self.player.user_id,
+            'bankrupt_user_id': self.bankrupt_user.user_id if self.bankrupt_user is not None else None,
+            'total_trades': self.total_trades,
+            'trade_probability': self.trade_probability,
+            'user_trade_probability': dict(self.user_trade_probability),
+            'windows': (self.short_window, self.long_window, self.trend_window),
+            # 事件驱动调度中各用户已经抽取的下一次交易时间
+            'scheduler': self.scheduler.state() if self.scheduler is not None else None,
+            'random_state': random.getstate(),
+        }
+        # 先写临时文件再替换，中途失败不会破坏旧快照
+        tmp_path = f"{path}.tmp"
+        with gc_paused(), open(tmp_path, "wb") as f:
+            f.write(self.CHECKPOINT_MAGIC + bytes([self.CHECKPOINT_VERSION]))
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def read_checkpoint(self, path):
+        """读取并校验快照文件。"""
+        with open(path, "rb") as f:
+            header = f.read(len(self.CHECKPOINT_MAGIC) + 1)
+            if header[:-1] != self.CHECKPOINT_MAGIC:
+                raise ValueError(f"{path} is not a simulator checkpoint.")
+            if header[-1] != self.CHECKPOINT_VERSION:
+                raise ValueError(f"Unsupported checkpoint version {header[-1]}.")
+            return pickle.load(f)
+
+    def load_checkpoint(self, path):
+        """从 save_checkpoint 生成的快照恢复内存状态并从断点继续，数据库中的数据不做修改。"""
+        self.flush_dirty()
+        with gc_paused(freeze=True):
+            self.restore_state(self.read_checkpoint(path))
+
+    def restore_state(self, state):
+        """用快照中的状态替换当前的股票、用户和随机数状态。"""
+        self.short_window, self.long_window, self.trend_window = state['windows']
+        self.stocks = {code: {'price': price, 'volatility': volatility, 'prices': self.price_history(prices)}
+                       for code, (price, volatility, prices) in state['stocks'].items()}
+
+        self.valuation = PortfolioValuation()
+        self.users = UserRegistry(map(User.from_state, state['user_ids'], state['balances'], state['holdings'],
+                                      state['strategies'], state['asset_histories']), on_add=self.valuation.touch)
+        users_by_id = self.users.by_id
+
+        # 用恢复出的共享策略实例重建缓存，之后新建的用户继续共享这些实例
+        self.strategies = {}
+        for strategy in {id(strategy): strategy for strategy in state['strategies'] if strategy is not None}.values():
+            strategy_name = getattr(strategy, 'strategy_name', None)
+            if STRATEGIES.get(strategy_name) is type(strategy):
+                self.strategies.setdefault(self.strategy_key(strategy_name, strategy.params()), strategy)
+
+        self.player = users_by_id.get(state['player_id'], self.player)
+        self.order_books = {}
+        owners = {**users_by_id, self.player.user_id: self.player}
+        for stock_code, user_id, side, price, remaining in state.get('orders', ()):
+            book = self.order_book(stock_code)
+            book.add(Order(next(book.order_ids), owners[user_id], side, price, remaining))
+        self.bankrupt_user = users_by_id.get(state['bankrupt_user_id'])
+        self.total_trades = state['total_trades']
+        self.trade_probability = state['trade_probability']
+        # 较早的快照没有单独设置的交易概率
+        self.user_trade_probability = dict(state.get('user_trade_probability', {}))
+        random.setstate(state['random_state'])
+        if self.scheduler is not None:
+            if state.get('scheduler') is not None:
+                self.scheduler.restore(state['scheduler'], owners)
+            else:
+                # 快照不是事件驱动模式下保存的（或来自较早的版本）：恢复随机数状态后再抽样，恢复结果仍然确定
+                self.scheduler.rebuild(self.users, self.total_trades)
+            self.scheduled_probability = self.trade_probability
+
+    def plot_price_history(self, ax, stock_codes=None, start=None, end=None):
+        """
+        绘制价格历史到指定的Axes对象。
+        默认绘制内存中最近的价格点；给出 start/end 时绘制持久化存储中该时间段每步的价格。
+        """
+        start_time = time.perf_counter()
         try:
             ax.clear()  # 清除之前的绘图
             if stock_codes is None:
                 stock_codes = self.stocks.keys()
 
             for stock_code in stock_codes:
-                ax.plot([float(p) for p in self.stocks[stock_code]['prices']], label=stock_code)
+                if self.history_store is not None or start is not None or end is not None:
+                    # 列式历史直接使用映射的数组，每步一个点，不复制完整历史
+                    timestamps, prices = self.load_price_history(stock_code, start, end)
+                    ax.plot(timestamps, prices, label=stock_code)
+                else:
+                    ax.plot([to_float(p) for p in self.stocks[stock_code]['prices']], label=stock_code)
 
             ax.set_xlabel("Timestamp")
             ax.set_ylabel("Price")
@@ -678,9 +1274,11 @@ class StockMarketSimulator:
             ax.figure.canvas.draw()  # 强制重绘
         except Exception as e:
             print(f"Error plotting price history: {e}")
+        self.metrics.add_time("plot", time.perf_counter() - start_time)
 
     def plot_asset_history(self, ax, user_ids=None):
         """绘制所有用户的资产历史到指定的Axes对象。"""
+        start = time.perf_counter()
         try:
             ax.clear()  # 清除之前的绘图
             if user_ids is None:
@@ -688,14 +1286,17 @@ class StockMarketSimulator:
 
             max_timestamp = 0
 
-            for user in self.users:
-                if user.user_id in user_ids:
+            for user in filter(None, map(self.users.get, user_ids)):
+                if self.history_store is not None:
+                    # 列式存储中有完整历史，不受 max_history_length 限制
+                    timestamps, asset_values = self.history_store.asset_history(user.user_id)
+                else:
                     #  使用总交易次数作为偏移量
-                    timestamps = [entry[0] for entry in user.asset_history]
-                    asset_values = [entry[1] for entry in user.asset_history]
-                    ax.plot(timestamps, asset_values, label=user.user_id)
-                    if timestamps:
-                        max_timestamp = max(max_timestamp, max(timestamps))
+                    timestamps = user.asset_history.timestamps()
+                    asset_values = [to_float(value) for value in user.asset_history.values()]
+                ax.plot(timestamps, asset_values, label=user.user_id)
+                if len(timestamps):
+                    max_timestamp = max(max_timestamp, max(timestamps))
 
             ax.set_xlabel("Timestamp")
             ax.set_ylabel("Asset Value")
@@ -705,456 +1306,117 @@ class StockMarketSimulator:
             ax.figure.canvas.draw()  # 强制重绘
         except Exception as e:
             print(f"Error plotting asset history: {e}")
+        self.metrics.add_time("plot", time.perf_counter() - start)
 
     def close_db_connection(self):
         """关闭数据库连接。"""
-        try:
-            # 确保所有缓冲的SQL语句都已执行
-            self.execute_buffered(force=True)
-            if self.mydb and self.mydb.is_connected():
-                self.mycursor.close()
-                self.mydb.close()
-                print("数据库连接已关闭。")
-        except mysql.connector.Error as err:
-            print(f"关闭数据库连接失败: {err}")
-
-
-class LoginDialog(QDialog):
-    def __init__(self):
-        super().__init__()
-        self.setWindowTitle("Login")
-        self.setGeometry(200, 200, 300, 150)
-
-        layout = QFormLayout()
-
-        self.username_label = QLabel("Username:")
-        self.username_input = QLineEdit()
-        layout.addRow(self.username_label, self.username_input)
-
-        self.password_label = QLabel("Password:")
-        self.password_input = QLineEdit()
-        self.password_input.setEchoMode(QLineEdit.Password)  # 密码模式
-        layout.addRow(self.password_label, self.password_input)
-
-        self.login_button = QPushButton("Login")
-        self.login_button.clicked.connect(self.accept)  # 点击登录时关闭对话框
-        layout.addRow(self.login_button)
-
-        self.setLayout(layout)
-
-    def get_credentials(self):
-        """返回用户名和密码。"""
-        return self.username_input.text(), self.password_input.text()
-
-class MainWindow(QWidget):
-    def __init__(self, simulator):
-        super().__init__()
-        self.simulator = simulator
-        self.setWindowTitle("Stock Market Simulator")
-        self.setGeometry(100, 100, 1200, 800)
-
-        self.tabs = QTabWidget()
-        self.admin_tab = QWidget()
-        self.trader_tab = QWidget()
-
-        self.tabs.addTab(self.admin_tab, "Admin")
-        self.tabs.addTab(self.trader_tab, "Trader")
-
-        self.init_admin_tab()
-        self.init_trader_tab()
-
-        layout = QVBoxLayout()
-        layout.addWidget(self.tabs)
-        self.setLayout(layout)
-
-        # 默认隐藏所有标签页
-        self.tabs.setTabEnabled(0, False)  # Admin Tab
-        self.tabs.setTabEnabled(1, False)  # Trader Tab
-
-    def init_admin_tab(self):
-        """初始化管理员标签页。"""
-        layout = QVBoxLayout()
-
-        # 股票价格图表
-        self.admin_stock_figure = mpl_fig.Figure(figsize=(5, 4), dpi=100)
-        self.admin_stock_canvas = FigureCanvas(self.admin_stock_figure)
-        self.admin_stock_ax = self.admin_stock_figure.add_subplot(111)
-        layout.addWidget(self.admin_stock_canvas)
-
-        # 用户资产图表
-        self.admin_asset_figure = mpl_fig.Figure(figsize=(5, 4), dpi=100)
-        self.admin_asset_canvas = FigureCanvas(self.admin_asset_figure)
-        self.admin_asset_ax = self.admin_asset_figure.add_subplot(111)
-        layout.addWidget(self.admin_asset_canvas)
-
-        # 时间步输入框
-        hbox = QHBoxLayout()
-        self.admin_time_step_label = QLabel("Time Steps:")
-        self.admin_time_step_input = QLineEdit("1")  # 默认值1
-        hbox.addWidget(self.admin_time_step_label)
-        hbox.addWidget(self.admin_time_step_input)
-        layout.addLayout(hbox)
-
-        # 运行按钮
-        self.admin_time_step_button = QPushButton("Run Simulation Steps")
-        self.admin_time_step_button.clicked.connect(self.run_admin_simulation_steps)
-        layout.addWidget(self.admin_time_step_button)
-
-        # 添加股票的输入框和按钮
-        stock_hbox = QHBoxLayout()
-        self.add_stock_code_label = QLabel("Stock Code:")
-        self.add_stock_code_input = QLineEdit()
-        self.add_stock_price_label = QLabel("Initial Price:")
-        self.add_stock_price_input = QLineEdit()
-        self.add_stock_volatility_label = QLabel("Volatility:")
-        self.add_stock_volatility_input = QLineEdit()
-        self.add_stock_button = QPushButton("Add Stock")
-        self.add_stock_button.clicked.connect(self.add_stock)
-
-        stock_hbox.addWidget(self.add_stock_code_label)
-        stock_hbox.addWidget(self.add_stock_code_input)
-        stock_hbox.addWidget(self.add_stock_price_label)
-        stock_hbox.addWidget(self.add_stock_price_input)
-        stock_hbox.addWidget(self.add_stock_volatility_label)
-        stock_hbox.addWidget(self.add_stock_volatility_input)
-        stock_hbox.addWidget(self.add_stock_button)
-        layout.addLayout(stock_hbox)
-
-        # 删除股票的输入框和按钮
-        remove_stock_hbox = QHBoxLayout()
-        self.remove_stock_code_label = QLabel("Stock Code to Remove:")
-        self.remove_stock_code_combo = QComboBox()  # 使用 QComboBox
-        self.remove_stock_button = QPushButton("Remove Stock")
-        self.remove_stock_button.clicked.connect(self.remove_stock)
-        remove_stock_hbox.addWidget(self.remove_stock_code_label)
-        remove_stock_hbox.addWidget(self.remove_stock_code_combo)
-        remove_stock_hbox.addWidget(self.remove_stock_button)
-        layout.addLayout(remove_stock_hbox)
-
-        # 添加用户的输入框和按钮
-        user_hbox = QHBoxLayout()
-        self.add_user_id_label = QLabel("User ID:")
-        self.add_user_id_input = QLineEdit()
-        self.add_user_balance_label = QLabel("Initial Balance:")
-        self.add_user_balance_input = QLineEdit()
-        self.add_user_strategy_label = QLabel("Strategy:")
-        self.add_user_strategy_combo = QComboBox()  # 添加策略选择
-        self.add_user_strategy_combo.addItems(["MeanReversion", "TrendFollowing", "Random"])
-        self.add_user_button = QPushButton("Add User")
-        self.add_user_button.clicked.connect(self.add_user)
-
-        user_hbox.addWidget(self.add_user_id_label)
-        user_hbox.addWidget(self.add_user_id_input)
-        user_hbox.addWidget(self.add_user_balance_label)
-        user_hbox.addWidget(self.add_user_balance_input)
-        user_hbox.addWidget(self.add_user_strategy_label)
-        user_hbox.addWidget(self.add_user_strategy_combo)
-        user_hbox.addWidget(self.add_user_button)
-        layout.addLayout(user_hbox)
-
-        # 删除用户的输入框和按钮
-        remove_user_hbox = QHBoxLayout()
-        self.remove_user_id_label = QLabel("User ID to Remove:")
-        self.remove_user_id_combo = QComboBox()  # 使用 QComboBox
-        self.remove_user_button = QPushButton("Remove User")
-        self.remove_user_button.clicked.connect(self.remove_user)
-        remove_user_hbox.addWidget(self.remove_user_id_label)
-        remove_user_hbox.addWidget(self.remove_user_id_combo)
-        remove_user_hbox.addWidget(self.remove_user_button)
-        layout.addLayout(remove_user_hbox)
-
-        # 股票信息表格
-        self.stock_table = QTableWidget()
-        self.stock_table.setColumnCount(4)
-        self.stock_table.setHorizontalHeaderLabels(["Code", "Price", "Volatility", "Holders"])
-        layout.addWidget(self.stock_table)
-
-        # 用户信息表格
-        self.user_table = QTableWidget()
-        self.user_table.setColumnCount(3)
-        self.user_table.setHorizontalHeaderLabels(["ID", "Balance", "Strategy"])
-        layout.addWidget(self.user_table)
-
-        # 刷新按钮
-        self.refresh_button = QPushButton("Refresh Data")
-        self.refresh_button.clicked.connect(self.refresh_data)
-        layout.addWidget(self.refresh_button)
-
-        self.admin_tab.setLayout(layout)
-
-    def init_trader_tab(self):
-        """初始化交易员标签页。"""
-        layout = QVBoxLayout()
-
-        # 股票价格图表
-        self.trader_stock_figure = mpl_fig.Figure(figsize=(5, 4), dpi=100)
-        self.trader_stock_canvas = FigureCanvas(self.trader_stock_figure)
-        self.trader_stock_ax = self.trader_stock_figure.add_subplot(111)
-        layout.addWidget(self.trader_stock_canvas)
-
-        # 资产信息
-        self.asset_label = QLabel("Asset: N/A")
-        layout.addWidget(self.asset_label)
-
-        # 股票选择
-        hbox = QHBoxLayout()
-        self.stock_label = QLabel("Stock:")
-        self.stock_combo = QComboBox()
-        hbox.addWidget(self.stock_label)
-        hbox.addWidget(self.stock_combo)
-        layout.addLayout(hbox)
-
-        # 交易数量
-        hbox = QHBoxLayout()
-        self.quantity_label = QLabel("Quantity:")
-        self.quantity_input = QLineEdit("1")  # 默认值1
-        hbox.addWidget(self.quantity_label)
-        hbox.addWidget(self.quantity_input)
-        layout.addLayout(hbox)
-
-        # 买入和卖出按钮
-        hbox = QHBoxLayout()
-        self.buy_button = QPushButton("Buy")
-        self.buy_button.clicked.connect(self.buy_stock)
-        self.sell_button = QPushButton("Sell")
-        self.sell_button.clicked.connect(self.sell_stock)
-        hbox.addWidget(self.buy_button)
-        hbox.addWidget(self.sell_button)
-        layout.addLayout(hbox)
-
-        # 交易信息表格
-        self.trade_table = QTableWidget()
-        self.trade_table.setColumnCount(3)
-        self.trade_table.setHorizontalHeaderLabels(["Stock", "Quantity", "Action"])
-        layout.addWidget(self.trade_table)
-
-        self.trader_tab.setLayout(layout)
-
-    def run_admin_simulation_steps(self):
-        """运行管理员界面的模拟步骤。"""
-        try:
-            num_steps = self.validate_int_input(self.admin_time_step_input.text(), "Number of time steps")
-            if num_steps is not None:
-                self.simulator.run_simulation(num_steps)
-                self.refresh_data()
-                self.update_admin_plots()
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Error running simulation: {str(e)}")
-
-    def add_stock(self):
-        """添加股票到模拟器。"""
-        try:
-            code = self.add_stock_code_input.text().strip()
-            price = self.validate_float_input(self.add_stock_price_input.text(), "Initial price")
-            volatility = self.validate_float_input(self.add_stock_volatility_input.text(), "Volatility")
-
-            if not code:
-                QMessageBox.warning(self, "Error", "Stock code cannot be empty.")
-                return
-
-            if price is None or volatility is None:
-                return
-
-            self.simulator.add_stock(code, price, volatility)
-            self.refresh_data()
-            self.update_admin_plots()
-            QMessageBox.information(self, "Success", f"Stock {code} added successfully.")
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Error adding stock: {str(e)}")
-
-    def remove_stock(self):
-        """从模拟器中移除股票。"""
-        try:
-            code = self.remove_stock_code_combo.currentText()
-            self.simulator.remove_stock(code)
-            self.refresh_data()
-            self.update_admin_plots()
-            QMessageBox.information(self, "Success", f"Stock {code} removed successfully.")
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Error removing stock: {str(e)}")
-
-    def add_user(self):
-        """添加用户到模拟器。"""
-        try:
-            user_id = self.add_user_id_input.text().strip()
-            balance = self.validate_float_input(self.add_user_balance_input.text(), "Initial balance")
-            strategy = self.add_user_strategy_combo.currentText()
-
-            if not user_id:
-                QMessageBox.warning(self, "Error", "User ID cannot be empty.")
-                return
-
-            if balance is None:
-                return
-
-            self.simulator.add_user(user_id, balance, strategy)
-            self.refresh_data()
-            self.update_admin_plots()
-            QMessageBox.information(self, "Success", f"User {user_id} added successfully.")
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Error adding user: {str(e)}")
-
-    def remove_user(self):
-        """从模拟器中移除用户。"""
-        try:
-            user_id = self.remove_user_id_combo.currentText()
-            self.simulator.remove_user(user_id)
-            self.refresh_data()
-            self.update_admin_plots()
-            QMessageBox.information(self, "Success", f"User {user_id} removed successfully.")
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Error removing user: {str(e)}")
-
-    def buy_stock(self):
-        """购买股票。"""
-        try:
-            stock_code = self.stock_combo.currentText()
-            quantity = self.validate_int_input(self.quantity_input.text(), "Quantity")
-
-            if quantity is None:
-                return
-
-            self.simulator.buy_stock(self.simulator.player, stock_code, quantity)
-            self.refresh_data()
-            self.update_trader_plots()
-            QMessageBox.information(self, "Success", f"Bought {quantity} shares of {stock_code}.")
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Error buying stock: {str(e)}")
-
-    def sell_stock(self):
-        """卖出股票。"""
-        try:
-            stock_code = self.stock_combo.currentText()
-            quantity = self.validate_int_input(self.quantity_input.text(), "Quantity")
-
-            if quantity is None:
-                return
-
-            self.simulator.sell_stock(self.simulator.player, stock_code, quantity)
-            self.refresh_data()
-            self.update_trader_plots()
-            QMessageBox.information(self, "Success", f"Sold {quantity} shares of {stock_code}.")
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Error selling stock: {str(e)}")
-
-    def validate_int_input(self, text, field_name):
-        """验证整数输入。"""
-        try:
-            value = int(text)
-            return value
-        except ValueError:
-            QMessageBox.warning(self, "Error", f"Invalid input for {field_name}. Please enter an integer.")
-            return None
-
-    def validate_float_input(self, text, field_name):
-        """验证浮点数输入。"""
-        try:
-            value = float(text)
-            return value
-        except ValueError:
-            QMessageBox.warning(self, "Error", f"Invalid input for {field_name}. Please enter a number.")
-            return None
-
-    def refresh_data(self):
-        """刷新所有表格和下拉菜单的数据。"""
-        self.update_stock_table()
-        self.update_user_table()
-        self.update_stock_combo()
-        self.update_user_combo()
-        self.update_trader_plots()
-        self.update_admin_plots()
-
-    def update_stock_table(self):
-        """更新股票信息表格。"""
-        self.stock_table.setRowCount(0)
-        for code, data in self.simulator.stocks.items():
-            row_position = self.stock_table.rowCount()
-            self.stock_table.insertRow(row_position)
-            self.stock_table.setItem(row_position, 0, QTableWidgetItem(code))
-            self.stock_table.setItem(row_position, 1, QTableWidgetItem(str(data['price'])))
-            self.stock_table.setItem(row_position, 2, QTableWidgetItem(str(data['volatility'])))
-            holders = sum([1 for user in self.simulator.users if code in user.holdings])
-            self.stock_table.setItem(row_position, 3, QTableWidgetItem(str(holders)))
-
-    def update_user_table(self):
-        """更新用户信息表格。"""
-        self.user_table.setRowCount(0)
-        for user in self.simulator.users:
-            row_position = self.user_table.rowCount()
-            self.user_table.insertRow(row_position)
-            self.user_table.setItem(row_position, 0, QTableWidgetItem(user.user_id))
-            self.user_table.setItem(row_position, 1, QTableWidgetItem(str(user.balance)))
-            self.user_table.setItem(row_position, 2, QTableWidgetItem(user.strategy.__class__.__name__ if user.strategy else "None"))
-
-    def update_stock_combo(self):
-        """更新股票下拉菜单。"""
-        self.stock_combo.clear()
-        self.remove_stock_code_combo.clear()
-        stock_codes = list(self.simulator.stocks.keys())
-        self.stock_combo.addItems(stock_codes)
-        self.remove_stock_code_combo.addItems(stock_codes)
-
-    def update_user_combo(self):
-        """更新用户下拉菜单。"""
-        self.remove_user_id_combo.clear()
-        user_ids = [user.user_id for user in self.simulator.users]
-        self.remove_user_id_combo.addItems(user_ids)
-
-    def update_trader_plots(self):
-        """更新交易员界面的图表。"""
-        self.simulator.plot_price_history(self.trader_stock_ax, stock_codes=self.simulator.stocks.keys())
-        asset_value = self.simulator.player.balance
-        for stock_code, holdings in self.simulator.player.holdings.items():
-            asset_value += holdings * self.simulator.stocks[stock_code]['price']
-        self.asset_label.setText(f"Asset: {asset_value:.2f}")
-        self.trader_stock_canvas.draw()
-
-    def update_admin_plots(self):
-        """更新管理员界面的图表。"""
-        self.simulator.plot_price_history(self.admin_stock_ax, stock_codes=self.simulator.stocks.keys())
-        self.simulator.plot_asset_history(self.admin_asset_ax, user_ids=[user.user_id for user in self.simulator.users])
-        self.admin_stock_canvas.draw()
-        self.admin_asset_canvas.draw()
-
-    def show_login_dialog(self):
-        """显示登录对话框。"""
-        dialog = LoginDialog()
-        result = dialog.exec_()  # 显示对话框并等待用户操作
-
-        if result == QDialog.Accepted:
-            username, password = dialog.get_credentials()
-            # 在这里添加你的身份验证逻辑
-            if username == "admin" and password == "password":
-                QMessageBox.information(self, "Login", "Login successful!")
-                self.tabs.setTabEnabled(0, True)  # Admin Tab
-                self.tabs.setTabEnabled(1, True)  # Trader Tab
-                self.refresh_data()
-            else:
-                QMessageBox.warning(self, "Login", "Invalid credentials.")
+        self.flush_dirty()
+        # 等待所有写操作（包括后台线程中排队的）提交完成
+        self.storage.flush()
+        self.storage.close()
+        if self.history_store is not None:
+            self.history_store.close()
+        # 分析的步数范围超出实际运行的步数（运行较短或提前停止）时，在这里写出已收集的统计
+        if self.profiler is not None:
+            self.profiler.stop()
+        # 后台写线程的提交在关闭存储后才全部完成，最后再写一次指标
+        self.dump_metrics()
+
+
+def stock_pool(num_stocks=None):
+    """命令行使用的股票池：不指定数量时用 DEFAULT_STOCKS，否则生成 S0、S1 … 共 num_stocks 只股票。"""
+    if num_stocks is None:
+        return dict(DEFAULT_STOCKS)
+    return {f"S{i}": (100.0 + i, 0.02) for i in range(num_stocks)}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="stock market simulator")
+    commands = parser.add_subparsers(dest="command")
+
+    commands.add_parser("gui", help="启动图形界面（默认）")
+
+    run = commands.add_parser("run", help="无界面运行模拟，不加载 PyQt5 和 matplotlib")
+    run.add_argument("--steps", type=int, default=100)
+    run.add_argument("--users", type=int, default=10, help="模拟用户数，趋势跟踪和随机交易者各占一半")
+    run.add_argument("--stocks", type=int, help="股票数，默认使用 AAPL、GOOG、MSFT")
+    run.add_argument("--trade-probability", type=float, default=0.1)
+    run.add_argument("--initial-balance", type=float, default=10000.0)
+    run.add_argument("--backend", choices=sorted(STORAGE_BACKENDS), default="memory")
+    run.add_argument("--db", default=":memory:", help="SQLite 数据库文件路径")
+    run.add_argument("--async-writes", action="store_true", help="写操作在后台线程执行")
+    run.add_argument("--flush-interval", type=int, default=1)
+    run.add_argument("--mode", choices=["sequential", "auction", "order_book", "vectorized"], default="sequential")
+    run.add_argument("--event-driven", action="store_true", help="用事件驱动调度选出每步交易的用户")
+    run.add_argument("--seed", type=int)
+    run.add_argument("--quiet", action="store_true", help="不输出模拟过程中的提示信息，只输出汇总")
+    run.add_argument("--metrics", help="运行指标文件，.prom 为 Prometheus 文本格式，其余为 JSON")
+    run.add_argument("--metrics-interval", type=int, default=100, help="每隔多少步写一次运行指标")
+    run.add_argument("--profile-steps", type=int, nargs=2, metavar=("START", "END"), help="用 cProfile 分析这些步")
+    run.add_argument("--profile-out", default="simulation.prof", help="cProfile 统计的输出文件")
+    return parser
+
+
+def run_headless(args):
+    """按命令行参数运行一次模拟并输出汇总，返回退出码。"""
+    if args.seed is not None:
+        random.seed(args.seed)
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull) if args.quiet else nullcontext():
+        if args.backend == "mysql":
+            storage = create_storage("mysql", async_writes=args.async_writes, host="localhost", user="root",
+                                     password="Cyborg72", database="stock_market_db")
+        elif args.backend == "sqlite":
+            storage = create_storage("sqlite", async_writes=args.async_writes, path=args.db)
+        else:
+            storage = create_storage(args.backend, async_writes=args.async_writes)
+        start = time.perf_counter()
+        simulator = StockMarketSimulator(stocks=stock_pool(args.stocks), num_trend_followers=args.users // 2,
+                                         num_random_traders=args.users - args.users // 2,
+                                         trade_probability=args.trade_probability,
+                                         initial_balance=args.initial_balance, storage=storage,
+                                         flush_interval=args.flush_interval, event_driven=args.event_driven)
+        setup_seconds = time.perf_counter() - start
+        if args.metrics:
+            simulator.set_metrics_dump(args.metrics, args.metrics_interval)
+        if args.profile_steps:
+            simulator.profile_steps(*args.profile_steps, args.profile_out)
+        steps_before = simulator.metrics.snapshot()['counters'].get('steps', 0)
+        start = time.perf_counter()
+        if args.mode == "vectorized":
+            simulator.run_simulation_vectorized(args.steps, seed=args.seed)
+        else:
+            simulator.run_simulation(args.steps, auction=args.mode == "auction", order_book=args.mode == "order_book")
+        run_seconds = time.perf_counter() - start
+        simulator.close_db_connection()
+
+    metrics = simulator.get_metrics()
+    # 出现破产用户时模拟提前停止，按实际运行的步数汇总
+    steps = metrics['counters'].get('steps', 0) - steps_before
+    print(f"users: {len(simulator.users)}  stocks: {len(simulator.stocks)}  steps: {steps}  mode: {args.mode}")
+    print(f"setup: {setup_seconds:.2f}s  run: {run_seconds:.2f}s  steps/s: {steps / run_seconds if run_seconds else 0:.1f}")
+    print(f"trades: {metrics['counters'].get('trades', 0)}  rows written: {metrics['counters'].get('rows_written', 0)}  "
+          + "  ".join(f"{phase}: {timer['seconds']:.2f}s" for phase, timer in metrics['timers'].items()))
+    for stock_code, stock_data in simulator.stocks.items():
+        print(f"  {stock_code}: {to_decimal(stock_data['price'])}")
+    if simulator.bankrupt_user is not None:
+        print(f"bankrupt user: {simulator.bankrupt_user.user_id}")
+    for message in simulator.storage_errors:
+        print(f"storage error: {message}")
+    return 1 if simulator.storage_errors else 0
+
+
+def main(argv=None):
+    """
+    命令行入口：python server.py 或 python server.py gui 启动图形界面，
+    python server.py run --steps 1000 --users 100 --backend sqlite --db market.db 无界面运行。
+    """
+    args = build_parser().parse_args(argv)
+    if args.command == "run":
+        return run_headless(args)
+    # 图形界面的依赖只在这里加载
+    import gui
+    return gui.main()
 
-    def closeEvent(self, event):
-        """关闭窗口事件处理函数。"""
-        self.simulator.close_db_connection()
-        event.accept()
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
-
-    # 初始股票池
-    initial_stocks = {
-        "AAPL": (150.0, 0.02),  # 苹果公司，初始价格150美元，波动率0.02
-        "GOOG": (270.0, 0.015), # 谷歌公司，初始价格270美元，波动率0.015
-        "MSFT": (300.0, 0.025)   # 微软公司，初始价格300美元，波动率0.025
-    }
-
-    # 创建模拟器
-    simulator = StockMarketSimulator(stocks=initial_stocks, num_trend_followers=5, num_random_traders=5)
-
-    # 创建主窗口
-    window = MainWindow(simulator)
-    window.show()
-
-    # 显示登录对话框
-    window.show_login_dialog()
-
-    sys.exit(app.exec_())
\ No newline at end of file
+    sys.exit(main())
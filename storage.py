@@ -0,0 +1,1245 @@
+import sys
+import time
+import bisect
+import queue
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from decimal import Decimal
+
+try:
+    import mysql.connector
+except ImportError:  # 只有使用 MySQL 后端时才需要
+    mysql = None
+
+# sqlite3 默认不认识 Decimal，统一按浮点数写入
+sqlite3.register_adapter(Decimal, float)
+
+
+class StorageBackend:
+    """存储后端接口，模拟器的所有持久化操作都经过这里。"""
+
+    on_error = None  # 出错回调，参数为错误信息
+    metrics = None  # 运行指标（见 metrics.py），由模拟器设置
+
+    def report_error(self, message):
+        """打印错误并通知回调。"""
+        print(message)
+        if self.on_error is not None:
+            self.on_error(message)
+
+    def clone(self):
+        """返回一个使用独立连接、指向同一数据库的后端实例。"""
+        raise NotImplementedError("Subclasses must implement clone method")
+
+    def create_tables(self):
+        """创建数据表。"""
+        raise NotImplementedError("Subclasses must implement create_tables method")
+
+    def clear_database(self):
+        """清空所有数据并重新建表。"""
+        raise NotImplementedError("Subclasses must implement clear_database method")
+
+    def user_exists(self, user_id):
+        """检查用户是否存在。"""
+        raise NotImplementedError("Subclasses must implement user_exists method")
+
+    def load_stocks(self):
+        """返回 (stock_code, initial_price, volatility, current_price) 列表。"""
+        raise NotImplementedError("Subclasses must implement load_stocks method")
+
+    def load_users(self):
+        """返回 (user_id, balance, strategy) 列表。"""
+        raise NotImplementedError("Subclasses must implement load_users method")
+
+    def load_user_holdings(self, user_id):
+        """返回指定用户的 (stock_code, quantity) 列表。"""
+        raise NotImplementedError("Subclasses must implement load_user_holdings method")
+
+    def load_all_holdings(self):
+        """一次返回所有用户的 (user_id, stock_code, quantity) 列表。"""
+        raise NotImplementedError("Subclasses must implement load_all_holdings method")
+
+    def existing_user_ids(self, user_ids):
+        """返回 user_ids 中已存在的用户ID集合。"""
+        raise NotImplementedError("Subclasses must implement existing_user_ids method")
+
+    def add_stock(self, stock_code, initial_price, volatility):
+        """新增股票。"""
+        raise NotImplementedError("Subclasses must implement add_stock method")
+
+    def add_user(self, user_id, balance, strategy):
+        """新增用户。"""
+        raise NotImplementedError("Subclasses must implement add_user method")
+
+    def delete_stock(self, stock_code):
+        """删除股票。"""
+        raise NotImplementedError("Subclasses must implement delete_stock method")
+
+    def delete_user(self, user_id):
+        """删除用户。"""
+        raise NotImplementedError("Subclasses must implement delete_user method")
+
+    def update_stock_price(self, stock_code, price):
+        """更新股票当前价格。"""
+        raise NotImplementedError("Subclasses must implement update_stock_price method")
+
+    def update_user_balance(self, user_id, balance):
+        """更新用户余额。"""
+        raise NotImplementedError("Subclasses must implement update_user_balance method")
+
+    def upsert_user_holdings(self, data):
+        """批量写入 (user_id, stock_code, quantity) 持仓，已存在则覆盖数量。"""
+        raise NotImplementedError("Subclasses must implement upsert_user_holdings method")
+
+    def delete_user_holdings(self, data):
+        """批量删除 (user_id, stock_code) 持仓。"""
+        raise NotImplementedError("Subclasses must implement delete_user_holdings method")
+
+    def update_user_balances(self, data):
+        """批量写入 (user_id, balance) 余额。"""
+        raise NotImplementedError("Subclasses must implement update_user_balances method")
+
+    def insert_stock_prices(self, data):
+        """批量写入 (stock_code, timestamp, price) 记录。"""
+        raise NotImplementedError("Subclasses must implement insert_stock_prices method")
+
+    def insert_asset_history(self, data):
+        """批量写入 (user_id, timestamp, asset_value) 记录。"""
+        raise NotImplementedError("Subclasses must implement insert_asset_history method")
+
+    def load_price_range(self, stock_code, start=None, end=None):
+        """返回股票在 [start, end] 内按时间排序的 (timestamp, price) 列表，None 表示不限。"""
+        raise NotImplementedError("Subclasses must implement load_price_range method")
+
+    def load_recent_prices(self, stock_codes, limit):
+        """返回 {stock_code: [(timestamp, price), ...]}，每只股票最近 limit 条价格，按时间升序。"""
+        raise NotImplementedError("Subclasses must implement load_recent_prices method")
+
+    def load_asset_history(self, user_id, start=None, end=None):
+        """返回用户在 [start, end] 内按时间排序的 (timestamp, asset_value) 列表。"""
+        raise NotImplementedError("Subclasses must implement load_asset_history method")
+
+    def migrate_schema(self):
+        """把已有数据库升级到当前表结构，默认无需迁移。"""
+        pass
+
+    def execute_buffered(self, force=False):
+        """提交缓冲的写操作，没有缓冲的后端什么也不做。"""
+        pass
+
+    def flush(self):
+        """屏障：返回时之前的所有写操作都已提交。"""
+        self.execute_buffered(force=True)
+
+    def close(self):
+        """关闭后端。"""
+        pass
+
+
+# 幂等的按主键 UPDATE：同一主键只保留最后一次写入，并合并成一条 CASE 语句
+# 参数形如 (value, key)，映射到 (表, 更新列, 主键列)
+KEYED_UPDATES = {
+    "UPDATE stocks SET current_price = %s WHERE stock_code = %s": ("stocks", "current_price", "stock_code"),
+    "UPDATE users SET balance = %s WHERE user_id = %s": ("users", "balance", "user_id"),
+}
+
+
+# 追加型历史表：(表名, 主体列, 数值列, 数值精度, 主体表)
+# 两张表都按 (主体, 时间) 建聚簇/覆盖索引，区间查询只扫描相关的行
+HISTORY_TABLES = (
+    ("stock_prices", "stock_code", "price", "10, 2", "stocks"),
+    ("asset_history", "user_id", "asset_value", "15, 2", "users"),
+)
+
+# create_tables.sql 旧版中的历史表，迁移时导入到统一的表中
+LEGACY_HISTORY_TABLES = {
+    "stock_prices": "t_stock_price",
+    "asset_history": "t_asset_history",
+}
+
+
+class FlushPolicy:
+    """缓冲区写回策略：行数、估算字节数或距首条未写回语句的时间任一达到上限即写回，None 表示不限制。"""
+
+    def __init__(self, max_rows=100, max_bytes=64 * 1024, max_interval=1.0):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_interval = max_interval  # 秒
+
+    def should_flush(self, buffer):
+        if self.max_rows is not None and buffer.rows >= self.max_rows:
+            return True
+        if self.max_bytes is not None and buffer.size >= self.max_bytes:
+            return True
+        if self.max_interval is not None and buffer.rows and time.monotonic() - buffer.started >= self.max_interval:
+            return True
+        return False
+
+
+class StatementBuffer:
+    """
+    按 SQL 文本分组的语句缓冲区。
+    coalesce_keys 中登记的幂等语句按主键合并，只保留最后一次写入，它们之间可以任意重排；
+    其它语句（INSERT/DELETE 等）作为屏障，只与紧邻的相同语句合并，保证前后顺序不变。
+    """
+
+    def __init__(self, coalesce_keys=None):
+        self.coalesce_keys = coalesce_keys or {}
+        self.clear()
+
+    def clear(self):
+        self.segments = []  # 每段是 {sql: {key: val} 或 [val, ...]}
+        self.barrier = False  # 最后一段是否为屏障段
+        self.rows = 0
+        self.size = 0
+        self.started = None
+
+    def __len__(self):
+        return self.rows
+
+    def append(self, entry):
+        sql, val = entry
+        if not self.rows:
+            self.started = time.monotonic()
+        # 每行按一条完整语句估算：SQL 文本加参数
+        self.size += len(sql) + sum(len(str(v)) for v in val) + 2 * len(val)
+
+        key_fn = self.coalesce_keys.get(sql)
+        if key_fn is not None:
+            if self.barrier or not self.segments:
+                self.segments.append({})
+                self.barrier = False
+            group = self.segments[-1].setdefault(sql, {})
+            key = key_fn(val)
+            if key not in group:
+                self.rows += 1
+            group[key] = val
+        else:
+            if self.barrier and sql in self.segments[-1]:
+                self.segments[-1][sql].append(val)
+            else:
+                self.segments.append({sql: [val]})
+                self.barrier = True
+            self.rows += 1
+
+    def drain(self):
+        """取出所有分组，返回 [(sql, [val, ...]), ...]，并清空缓冲区。"""
+        batches = []
+        for segment in self.segments:
+            for sql, group in segment.items():
+                batches.append((sql, list(group.values()) if isinstance(group, dict) else group))
+        self.clear()
+        return batches
+
+
+class ConnectionPool:
+    """线程安全的小型连接池，按需建立连接，最多 size 个，用完归还。"""
+
+    def __init__(self, connect, size=2):
+        self.connect = connect
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """取一个空闲连接；没有空闲且未达上限时新建，否则等待归还。"""
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if len(self.connections) < self.size:
+                conn = self.connect()
+                self.connections.append(conn)
+                return conn
+        return self.idle.get()
+
+    def release(self, conn):
+        self.idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections.clear()
+        self.idle = queue.LifoQueue()
+
+
+class SQLStorage(StorageBackend):
+    """基于 DB-API 连接的公共实现，SQL 统一使用 %s 占位符。"""
+
+    name = "sql"
+    Error = Exception  # 子类替换为驱动的异常类型
+    create_table_statements = ()
+    drop_table_statements = (
+        "DROP TABLE IF EXISTS asset_history",
+        "DROP TABLE IF EXISTS stock_prices",
+        "DROP TABLE IF EXISTS user_holdings",
+        "DROP TABLE IF EXISTS stocks",
+        "DROP TABLE IF EXISTS users",
+    )
+
+    upsert_holding_sql = None
+    batch_chunk_size = 400  # 合并 UPDATE 或 IN 查询时每条语句的最大行数
+
+    def __init__(self, flush_policy=None, pool_size=2):
+        # mydb/mycursor 是交易路径的写连接，只执行缓冲区中的语句和建表
+        self.mydb = None
+        self.mycursor = None
+        # 读查询和大批量历史插入各用一个连接池，不再与写连接共用一个游标
+        self.pool_size = pool_size
+        self.read_pool = ConnectionPool(self.connect_reader, pool_size)
+        self.bulk_pool = ConnectionPool(self.connect, pool_size)
+        # 初始化缓冲区
+        coalesce_keys = {sql: (lambda val: val[1]) for sql in KEYED_UPDATES}
+        coalesce_keys[self.upsert_holding_sql] = lambda val: (val[0], val[1])
+        self.sql_buffer = StatementBuffer(coalesce_keys)
+        self.flush_policy = flush_policy or FlushPolicy()
+
+    def connect(self):
+        """新建一个手动提交的连接。"""
+        raise NotImplementedError("Subclasses must implement connect method")
+
+    def connect_reader(self):
+        """新建一个用于读查询的连接（READ COMMITTED，自动提交）。"""
+        raise NotImplementedError("Subclasses must implement connect_reader method")
+
+    def open(self):
+        """建立交易路径的写连接。"""
+        self.mydb = self.connect()
+        self.mycursor = self.mydb.cursor()
+
+    def convert_sql(self, sql):
+        """把 %s 占位符转换为驱动使用的格式。"""
+        return sql
+
+    def query(self, sql, val=(), one=False):
+        """在读连接池中执行查询。"""
+        with self.read_pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self.convert_sql(sql), val)
+                return cursor.fetchone() if one else cursor.fetchall()
+            finally:
+                cursor.close()
+
+    def record_commit(self, statements, rows, start):
+        """记录一次提交执行的语句数（executemany 算一条）、写入的参数行数和从执行第一条语句到提交完成的耗时。"""
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.incr("sql_statements", statements)
+            metrics.incr("sql_rows", rows)
+            metrics.incr("commits")
+            metrics.observe("commit_seconds", time.perf_counter() - start)
+
+    def insert_many(self, sql, data):
+        """在独立连接上执行大批量插入并提交，不阻塞交易路径的写连接。"""
+        with self.bulk_pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                start = time.perf_counter()
+                cursor.executemany(self.convert_sql(sql), data)
+                conn.commit()
+                # data 可以是生成器，行数取驱动报告的 rowcount（不支持时为 -1）
+                self.record_commit(1, max(cursor.rowcount, 0), start)
+            except self.Error:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def execute(self, sql, val=()):
+        self.mycursor.execute(self.convert_sql(sql), val)
+
+    def executemany(self, sql, data):
+        self.mycursor.executemany(self.convert_sql(sql), data)
+
+    def execute_batch(self, sql, data):
+        """执行同一条语句的一组参数，返回实际执行的语句数。"""
+        if len(data) == 1:
+            self.execute(sql, data[0])
+            return 1
+        if sql in KEYED_UPDATES:
+            table, column, key_column = KEYED_UPDATES[sql]
+            for start in range(0, len(data), self.batch_chunk_size):
+                chunk = data[start:start + self.batch_chunk_size]
+                cases = " ".join(["WHEN %s THEN %s"] * len(chunk))
+                keys = ", ".join(["%s"] * len(chunk))
+                params = [p for value, key in chunk for p in (key, value)] + [key for value, key in chunk]
+                self.execute(f"UPDATE {table} SET {column} = CASE {key_column} {cases} END WHERE {key_column} IN ({keys})", params)
+            return -(-len(data) // self.batch_chunk_size)
+        self.executemany(sql, data)
+        return 1
+
+    def create_tables(self):
+        """创建数据库表。"""
+        try:
+            for sql in self.create_table_statements:
+                self.execute(sql)
+            self.mydb.commit()
+            print("数据库表创建成功。")
+        except self.Error as err:
+            print(f"创建数据库表失败: {err}")
+            sys.exit(1)
+
+    def clear_database(self):
+        """清空数据库。"""
+        try:
+            for sql in self.drop_table_statements:
+                self.execute(sql)
+            self.mydb.commit()
+            self.create_tables()
+            print("数据库已清空并重新创建表。")
+        except self.Error as err:
+            print(f"清空数据库失败: {err}")
+            sys.exit(1)
+
+    def user_exists(self, user_id):
+        """检查用户是否已存在于数据库中。"""
+        try:
+            return self.query("SELECT user_id FROM users WHERE user_id = %s", (user_id,), one=True) is not None
+        except self.Error as err:
+            self.report_error(f"检查用户是否存在失败: {err}")
+            return False
+
+    def load_stocks(self):
+        """从数据库加载股票信息。"""
+        try:
+            return self.query("SELECT stock_code, initial_price, volatility, current_price FROM stocks")
+        except self.Error as err:
+            self.report_error(f"加载股票信息失败: {err}")
+            return []
+
+    def load_users(self):
+        """从数据库加载用户信息。"""
+        try:
+            return self.query("SELECT user_id, balance, strategy FROM users")
+        except self.Error as err:
+            self.report_error(f"加载用户信息失败: {err}")
+            return []
+
+    def load_user_holdings(self, user_id):
+        """从数据库加载用户持仓信息。"""
+        try:
+            return self.query("SELECT stock_code, quantity FROM user_holdings WHERE user_id = %s", (user_id,))
+        except self.Error as err:
+            self.report_error(f"加载用户持仓信息失败: {err}")
+            return []
+
+    def load_all_holdings(self):
+        """一次查询加载所有用户的持仓。"""
+        try:
+            return self.query("SELECT user_id, stock_code, quantity FROM user_holdings")
+        except self.Error as err:
+            self.report_error(f"加载用户持仓信息失败: {err}")
+            return []
+
+    def existing_user_ids(self, user_ids):
+        """分批用 IN 查询检查用户是否存在。"""
+        user_ids = list(user_ids)
+        existing = set()
+        try:
+            for start in range(0, len(user_ids), self.batch_chunk_size):
+                chunk = user_ids[start:start + self.batch_chunk_size]
+                placeholders = ", ".join(["%s"] * len(chunk))
+                rows = self.query(f"SELECT user_id FROM users WHERE user_id IN ({placeholders})", chunk)
+                existing.update(user_id for user_id, in rows)
+        except self.Error as err:
+            self.report_error(f"检查用户是否存在失败: {err}")
+        return existing
+
+    def add_stock(self, stock_code, initial_price, volatility):
+        """将股票信息添加到数据库。"""
+        sql = "INSERT INTO stocks (stock_code, initial_price, volatility, current_price) VALUES (%s, %s, %s, %s)"
+        self.sql_buffer.append((sql, (stock_code, initial_price, volatility, initial_price)))
+        self.execute_buffered()
+
+    def add_user(self, user_id, balance, strategy):
+        """将用户信息添加到数据库。"""
+        sql = "INSERT INTO users (user_id, balance, strategy) VALUES (%s, %s, %s)"
+        self.sql_buffer.append((sql, (user_id, balance, strategy)))
+        self.execute_buffered()
+
+    def delete_stock(self, stock_code):
+        """从数据库中删除股票。"""
+        self.sql_buffer.append(("DELETE FROM stocks WHERE stock_code = %s", (stock_code,)))
+        self.execute_buffered()
+
+    def delete_user(self, user_id):
+        """从数据库中删除用户。"""
+        # 先删除持仓，避免违反外键约束
+        self.sql_buffer.append(("DELETE FROM user_holdings WHERE user_id = %s", (user_id,)))
+        self.sql_buffer.append(("DELETE FROM users WHERE user_id = %s", (user_id,)))
+        self.execute_buffered()
+
+    def update_stock_price(self, stock_code, price):
+        """更新股票价格到数据库。"""
+        sql = "UPDATE stocks SET current_price = %s WHERE stock_code = %s"
+        self.sql_buffer.append((sql, (float(price), stock_code)))
+        self.execute_buffered()
+
+    def update_user_balance(self, user_id, balance):
+        """更新用户余额到数据库。"""
+        sql = "UPDATE users SET balance = %s WHERE user_id = %s"
+        self.sql_buffer.append((sql, (float(balance), user_id)))
+        self.execute_buffered()
+
+    def upsert_user_holdings(self, data):
+        """批量写入用户持仓，不再先查询数据库中的旧持仓。"""
+        for user_id, stock_code, quantity in data:
+            self.sql_buffer.append((self.upsert_holding_sql, (user_id, stock_code, quantity)))
+        self.execute_buffered()
+
+    def delete_user_holdings(self, data):
+        """批量删除用户持仓。"""
+        sql = "DELETE FROM user_holdings WHERE user_id = %s AND stock_code = %s"
+        for user_id, stock_code in data:
+            self.sql_buffer.append((sql, (user_id, stock_code)))
+        self.execute_buffered()
+
+    def update_user_balances(self, data):
+        """批量更新用户余额。"""
+        sql = "UPDATE users SET balance = %s WHERE user_id = %s"
+        for user_id, balance in data:
+            self.sql_buffer.append((sql, (float(balance), user_id)))
+        self.execute_buffered()
+
+    def insert_stock_prices(self, data):
+        """批量将股票价格插入数据库。"""
+        try:
+            self.insert_many("INSERT INTO stock_prices (stock_code, timestamp, price) VALUES (%s, %s, %s)", data)
+        except self.Error as err:
+            self.report_error(f"插入股票价格失败: {err}")
+
+    def insert_asset_history(self, data):
+        """批量将用户资产历史插入数据库。"""
+        try:
+            self.insert_many("INSERT INTO asset_history (user_id, timestamp, asset_value) VALUES (%s, %s, %s)", data)
+        except self.Error as err:
+            self.report_error(f"插入资产历史失败: {err}")
+
+    def load_history_range(self, table, key_column, value_column, key, start, end):
+        """按 (主体, 时间) 索引读取一段历史。"""
+        sql = f"SELECT timestamp, {value_column} FROM {table} WHERE {key_column} = %s"
+        val = [key]
+        if start is not None:
+            sql += " AND timestamp >= %s"
+            val.append(start)
+        if end is not None:
+            sql += " AND timestamp <= %s"
+            val.append(end)
+        return self.query(sql + " ORDER BY timestamp", val)
+
+    def load_price_range(self, stock_code, start=None, end=None):
+        """读取股票价格历史。"""
+        try:
+            return self.load_history_range("stock_prices", "stock_code", "price", stock_code, start, end)
+        except self.Error as err:
+            self.report_error(f"加载股票价格历史失败: {err}")
+            return []
+
+    def load_recent_prices(self, stock_codes, limit):
+        """
+        每只股票一个子查询：沿 (stock_code, timestamp) 索引倒序读取，LIMIT 行后停止；
+        再用 UNION ALL 合成一条语句，读取量与历史表大小无关。
+        """
+        stock_codes = list(stock_codes)
+        branch = ("SELECT * FROM (SELECT stock_code, timestamp, price FROM stock_prices "
+                  "WHERE stock_code = %s ORDER BY timestamp DESC LIMIT %s) AS recent_{}")
+        recent = {}
+        try:
+            for start in range(0, len(stock_codes), self.batch_chunk_size):
+                chunk = stock_codes[start:start + self.batch_chunk_size]
+                sql = " UNION ALL ".join(branch.format(i) for i in range(len(chunk)))
+                val = [v for stock_code in chunk for v in (stock_code, limit)]
+                for stock_code, timestamp, price in self.query(sql, val):
+                    recent.setdefault(stock_code, []).append((timestamp, price))
+        except self.Error as err:
+            self.report_error(f"加载最近股票价格失败: {err}")
+        for series in recent.values():
+            series.sort()
+        return recent
+
+    def load_asset_history(self, user_id, start=None, end=None):
+        """读取用户资产历史。"""
+        try:
+            return self.load_history_range("asset_history", "user_id", "asset_value", user_id, start, end)
+        except self.Error as err:
+            self.report_error(f"加载资产历史失败: {err}")
+            return []
+
+    def execute_buffered(self, force=False):
+        """按语句分组批量执行缓冲区中的SQL语句，force 为 True 时忽略写回策略。"""
+        if not self.sql_buffer.rows:
+            return
+        if force or self.flush_policy.should_flush(self.sql_buffer):
+            batches = self.sql_buffer.drain()
+            try:
+                start = time.perf_counter()
+                statements = sum(self.execute_batch(sql, data) for sql, data in batches)
+                self.mydb.commit()
+                self.record_commit(statements, sum(len(data) for sql, data in batches), start)
+            except self.Error as err:
+                # 回滚整批，避免失败的语句留在缓冲区里反复重试
+                self.mydb.rollback()
+                self.report_error(f"执行缓冲SQL失败: {err}")
+
+    def is_connected(self):
+        return self.mydb is not None
+
+    def close(self):
+        """关闭数据库连接。"""
+        try:
+            # 确保所有缓冲的SQL语句都已执行
+            self.execute_buffered(force=True)
+            self.read_pool.close()
+            self.bulk_pool.close()
+            if self.mydb and self.is_connected():
+                self.mycursor.close()
+                self.mydb.close()
+                print("数据库连接已关闭。")
+        except self.Error as err:
+            self.report_error(f"关闭数据库连接失败: {err}")
+
+
+class MySQLStorage(SQLStorage):
+    """MySQL 后端。"""
+
+    name = "mysql"
+    upsert_holding_sql = (
+        "INSERT INTO user_holdings (user_id, stock_code, quantity) VALUES (%s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE quantity = VALUES(quantity)"
+    )
+    entity_table_statements = (
+        """
+        CREATE TABLE users (
+            user_id VARCHAR(255) PRIMARY KEY,
+            balance DECIMAL(15, 2) NOT NULL,
+            strategy VARCHAR(255)
+        )
+        """,
+        """
+        CREATE TABLE stocks (
+            stock_code VARCHAR(255) PRIMARY KEY,
+            initial_price DECIMAL(10, 2) NOT NULL,
+            volatility DECIMAL(5, 4) NOT NULL,
+            current_price DECIMAL(10, 2) NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE user_holdings (
+            user_id VARCHAR(255) NOT NULL,
+            stock_code VARCHAR(255) NOT NULL,
+            quantity INT NOT NULL,
+            PRIMARY KEY (user_id, stock_code),
+            FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+            FOREIGN KEY (stock_code) REFERENCES stocks(stock_code) ON DELETE CASCADE
+        )
+        """,
+    )
+    history_table_ddl = """
+        CREATE TABLE {table} (
+            id BIGINT NOT NULL AUTO_INCREMENT,
+            {key_column} VARCHAR(255) NOT NULL,
+            timestamp INT NOT NULL,
+            {value_column} DECIMAL({precision}) NOT NULL,
+            PRIMARY KEY ({key_column}, timestamp, id),
+            KEY idx_{table}_id (id){foreign_key}
+        ){partitions}
+        """
+
+    def __init__(self, host="localhost", user="root", password="", database="stock_market_db", flush_policy=None, pool_size=2,
+                 partition_step=None, partition_count=16):
+        """partition_step 不为 None 时，历史表按 timestamp 做 RANGE 分区，每个分区覆盖 partition_step 个时间步。"""
+        super().__init__(flush_policy, pool_size)
+        self.partition_step = partition_step
+        self.partition_count = partition_count
+        self.partition_upper = None  # 最后一个有限分区的上界，惰性读取
+        if mysql is None:
+            print("未安装 mysql-connector-python，无法使用 MySQL 后端。")
+            sys.exit(1)
+        self.Error = mysql.connector.Error
+
+        # 数据库连接信息
+        self.db_host = host
+        self.db_user = user
+        self.db_password = password
+        self.db_name = database
+
+        try:
+            self.open()
+            print("成功连接到MySQL数据库！")
+        except mysql.connector.Error as err:
+            print(f"连接数据库失败: {err}")
+            sys.exit(1)  # 退出程序
+
+    def connect(self):
+        conn = mysql.connector.connect(
+            host=self.db_host,
+            user=self.db_user,
+            password=self.db_password,
+            database=self.db_name  # 直接连接到数据库
+        )
+        conn.autocommit = False  # 关闭自动提交
+        return conn
+
+    def connect_reader(self):
+        conn = self.connect()
+        cursor = conn.cursor()
+        cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL READ COMMITTED")
+        cursor.close()
+        # 自动提交，每次查询都能看到其它连接最新提交的数据
+        conn.autocommit = True
+        return conn
+
+    def is_connected(self):
+        return self.mydb is not None and self.mydb.is_connected()
+
+    def clone(self):
+        return MySQLStorage(self.db_host, self.db_user, self.db_password, self.db_name, self.flush_policy, self.pool_size,
+                            self.partition_step, self.partition_count)
+
+    def history_table_statement(self, table, key_column, value_column, precision, parent):
+        """生成历史表的建表语句。分区表不支持外键，分区时省略外键。"""
+        if self.partition_step is None:
+            foreign_key = f",\n            FOREIGN KEY ({key_column}) REFERENCES {parent}({key_column}) ON DELETE CASCADE"
+            partitions = ""
+        else:
+            uppers = [self.partition_step * (i + 1) for i in range(self.partition_count)]
+            parts = ", ".join(f"PARTITION p{upper} VALUES LESS THAN ({upper})" for upper in uppers)
+            foreign_key = ""
+            partitions = f" PARTITION BY RANGE (timestamp) ({parts}, PARTITION pmax VALUES LESS THAN MAXVALUE)"
+            self.partition_upper = uppers[-1]
+        return self.history_table_ddl.format(table=table, key_column=key_column, value_column=value_column,
+                                             precision=precision, foreign_key=foreign_key, partitions=partitions)
+
+    @property
+    def create_table_statements(self):
+        return self.entity_table_statements + tuple(self.history_table_statement(*spec) for spec in HISTORY_TABLES)
+
+    def add_history_partitions(self, max_timestamp):
+        """从 pmax 中拆出新分区，直到有限分区覆盖 max_timestamp。"""
+        if self.partition_step is None:
+            return
+        if self.partition_upper is None:
+            row = self.query(
+                "SELECT MAX(CAST(PARTITION_DESCRIPTION AS UNSIGNED)) FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'stock_prices' AND PARTITION_DESCRIPTION <> 'MAXVALUE'",
+                one=True)
+            self.partition_upper = int(row[0] or 0)
+        uppers = []
+        while self.partition_upper <= max_timestamp:
+            self.partition_upper += self.partition_step
+            uppers.append(self.partition_upper)
+        if not uppers:
+            return
+        parts = ", ".join(f"PARTITION p{upper} VALUES LESS THAN ({upper})" for upper in uppers)
+        with self.bulk_pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                for table, *_ in HISTORY_TABLES:
+                    cursor.execute(f"ALTER TABLE {table} REORGANIZE PARTITION pmax INTO "
+                                   f"({parts}, PARTITION pmax VALUES LESS THAN MAXVALUE)")
+            finally:
+                cursor.close()
+
+    def prepare_partitions(self, data):
+        """写入历史前确保分区覆盖这批数据的时间戳。"""
+        if self.partition_step is None or not data:
+            return
+        try:
+            self.add_history_partitions(max(row[1] for row in data))
+        except self.Error as err:
+            self.report_error(f"添加历史表分区失败: {err}")
+
+    def insert_stock_prices(self, data):
+        self.prepare_partitions(data)
+        super().insert_stock_prices(data)
+
+    def insert_asset_history(self, data):
+        self.prepare_partitions(data)
+        super().insert_asset_history(data)
+
+    def migrate_schema(self, drop_legacy=False):
+        """
+        把旧的表结构迁移到当前结构：
+        历史表主键从自增 id 改为 (主体, timestamp, id) 聚簇；
+        持仓表和历史表上不是 ON DELETE CASCADE 的外键重建为级联删除；
+        create_tables.sql 旧版的 t_user/t_stock/t_user_holding/t_stock_price/t_asset_history 中的数据导入统一的表，
+        drop_legacy 为 True 时导入后删除旧表。导入历史用到窗口函数，需要 MySQL 8.0 及以上。
+        """
+        def table_exists(table):
+            return self.query("SELECT 1 FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                              (table,), one=True) is not None
+
+        try:
+            for sql in self.entity_table_statements:
+                self.execute(sql.replace("CREATE TABLE", "CREATE TABLE IF NOT EXISTS", 1))
+
+            for table, key_column, value_column, precision, parent in HISTORY_TABLES:
+                primary_key = [row[0] for row in self.query(
+                    "SELECT COLUMN_NAME FROM information_schema.KEY_COLUMN_USAGE "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND CONSTRAINT_NAME = 'PRIMARY' "
+                    "ORDER BY ORDINAL_POSITION", (table,))]
+                if not primary_key:
+                    self.execute(self.history_table_statement(table, key_column, value_column, precision, parent))
+                elif primary_key == ["id"]:
+                    # 自增列必须是某个索引的第一列，所以同时补一个 id 索引
+                    self.execute(f"ALTER TABLE {table} MODIFY id BIGINT NOT NULL AUTO_INCREMENT, DROP PRIMARY KEY, "
+                                 f"ADD PRIMARY KEY ({key_column}, timestamp, id), ADD KEY idx_{table}_id (id)")
+
+            # CREATE TABLE IF NOT EXISTS 不会修改已有的表，旧版建的外键没有级联删除，删除股票或用户会失败
+            for table, name, column, parent, parent_column in self.query(
+                    "SELECT rc.TABLE_NAME, rc.CONSTRAINT_NAME, kcu.COLUMN_NAME, rc.REFERENCED_TABLE_NAME, "
+                    "kcu.REFERENCED_COLUMN_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS rc "
+                    "JOIN information_schema.KEY_COLUMN_USAGE kcu ON kcu.CONSTRAINT_SCHEMA = rc.CONSTRAINT_SCHEMA "
+                    "AND kcu.CONSTRAINT_NAME = rc.CONSTRAINT_NAME AND kcu.TABLE_NAME = rc.TABLE_NAME "
+                    "WHERE rc.CONSTRAINT_SCHEMA = DATABASE() AND rc.DELETE_RULE <> 'CASCADE' "
+                    "AND rc.TABLE_NAME IN ('user_holdings', 'stock_prices', 'asset_history')"):
+                self.execute(f"ALTER TABLE {table} DROP FOREIGN KEY {name}, ADD CONSTRAINT {name} "
+                             f"FOREIGN KEY ({column}) REFERENCES {parent}({parent_column}) ON DELETE CASCADE")
+
+            legacy_tables = []
+            if table_exists("t_user"):
+                self.execute("INSERT IGNORE INTO users (user_id, balance, strategy) SELECT user_id, balance, strategy FROM t_user")
+                legacy_tables.append("t_user")
+            if table_exists("t_stock"):
+                self.execute("INSERT IGNORE INTO stocks (stock_code, initial_price, volatility, current_price) "
+                             "SELECT stock_code, initial_price, volatility, initial_price FROM t_stock")
+                legacy_tables.append("t_stock")
+            if table_exists("t_user_holding"):
+                # 旧表允许同一用户同一股票多行，合并数量
+                self.execute("INSERT IGNORE INTO user_holdings (user_id, stock_code, quantity) "
+                             "SELECT user_id, stock_code, SUM(quantity) FROM t_user_holding GROUP BY user_id, stock_code")
+                legacy_tables.append("t_user_holding")
+            for table, key_column, value_column, precision, parent in HISTORY_TABLES:
+                legacy = LEGACY_HISTORY_TABLES[table]
+                if table_exists(legacy):
+                    # 旧表的时间戳是时刻，新表的 timestamp 是模拟步数：每个序列按时间顺序从 1 开始编号，
+                    # 否则步数会变成秒级时间戳，热启动时步数计数和分区都会跳到十亿级
+                    self.execute(f"INSERT INTO {table} ({key_column}, timestamp, {value_column}) "
+                                 f"SELECT {key_column}, ROW_NUMBER() OVER (PARTITION BY {key_column} ORDER BY timestamp, id), "
+                                 f"{value_column} FROM {legacy} "
+                                 f"WHERE {key_column} IN (SELECT {key_column} FROM {parent})")
+                    legacy_tables.insert(0, legacy)
+            self.mydb.commit()
+
+            if drop_legacy:
+                # 有外键依赖，先删历史表和持仓表
+                for legacy in ["t_asset_history", "t_stock_price", "t_user_holding", "t_stock", "t_user"]:
+                    if legacy in legacy_tables:
+                        self.execute(f"DROP TABLE {legacy}")
+                self.mydb.commit()
+            print("数据库表结构迁移完成。")
+        except self.Error as err:
+            self.mydb.rollback()
+            self.report_error(f"迁移数据库表结构失败: {err}")
+
+
+class SQLiteStorage(SQLStorage):
+    """SQLite 后端，path 可以是文件路径或 ":memory:"。"""
+
+    name = "sqlite"
+    Error = sqlite3.Error
+    upsert_holding_sql = (
+        "INSERT INTO user_holdings (user_id, stock_code, quantity) VALUES (%s, %s, %s) "
+        "ON CONFLICT (user_id, stock_code) DO UPDATE SET quantity = excluded.quantity"
+    )
+    create_table_statements = (
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id VARCHAR(255) PRIMARY KEY,
+            balance DECIMAL(15, 2) NOT NULL,
+            strategy VARCHAR(255)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS stocks (
+            stock_code VARCHAR(255) PRIMARY KEY,
+            initial_price DECIMAL(10, 2) NOT NULL,
+            volatility DECIMAL(5, 4) NOT NULL,
+            current_price DECIMAL(10, 2) NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS user_holdings (
+            user_id VARCHAR(255) NOT NULL,
+            stock_code VARCHAR(255) NOT NULL,
+            quantity INT NOT NULL,
+            PRIMARY KEY (user_id, stock_code),
+            FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+            FOREIGN KEY (stock_code) REFERENCES stocks(stock_code) ON DELETE CASCADE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS stock_prices (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            stock_code VARCHAR(255) NOT NULL,
+            timestamp INT NOT NULL,
+            price DECIMAL(10, 2) NOT NULL,
+            FOREIGN KEY (stock_code) REFERENCES stocks(stock_code) ON DELETE CASCADE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS asset_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id VARCHAR(255) NOT NULL,
+            timestamp INT NOT NULL,
+            asset_value DECIMAL(15, 2) NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+        )
+        """,
+        # 覆盖索引：区间查询只读索引，不回表；旧数据库文件打开时也会自动补上
+        "CREATE INDEX IF NOT EXISTS idx_stock_prices_code_ts ON stock_prices (stock_code, timestamp, price)",
+        "CREATE INDEX IF NOT EXISTS idx_asset_history_user_ts ON asset_history (user_id, timestamp, asset_value)",
+    )
+
+    def __init__(self, path=":memory:", flush_policy=None, pool_size=2):
+        super().__init__(flush_policy, pool_size)
+        if path == ":memory:":
+            # 使用命名的共享内存库，连接池和 clone() 出来的连接才能看到同一份数据；
+            # 名称用 uuid 而不是 id(self)，对象回收后 id 可能被新实例复用，而旧库仍被未关闭的连接保留
+            path = f"file:stock_market_{uuid.uuid4().hex}?mode=memory&cache=shared"
+        self.path = path
+        try:
+            self.open()
+            if not path.startswith("file:"):
+                # WAL 模式下读连接不会被写事务阻塞
+                self.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.Error as err:
+            print(f"连接数据库失败: {err}")
+            sys.exit(1)
+        # SQLite 数据库文件可能是新建的，表不存在时自动创建
+        self.create_tables()
+
+    def connect(self):
+        # 连接可能交给后台写线程使用
+        return sqlite3.connect(self.path, uri=self.path.startswith("file:"), check_same_thread=False, timeout=30)
+
+    def connect_reader(self):
+        conn = self.connect()
+        conn.isolation_level = None  # 自动提交，每条查询读取最新提交的数据
+        return conn
+
+    def convert_sql(self, sql):
+        return sql.replace("%s", "?")
+
+    def clone(self):
+        return SQLiteStorage(self.path, self.flush_policy, self.pool_size)
+
+    def migrate_schema(self):
+        # 建表语句都带 IF NOT EXISTS，重新执行即可补上缺失的索引
+        self.create_tables()
+
+
+class MemoryStorage(StorageBackend):
+    """纯内存后端，不做任何 I/O，适合大规模模拟和基准测试。"""
+
+    name = "memory"
+
+    def __init__(self):
+        self.create_tables()
+
+    def create_tables(self):
+        self.users = {}  # user_id -> [balance, strategy]
+        self.stocks = {}  # stock_code -> [initial_price, volatility, current_price]
+        self.user_holdings = {}  # user_id -> {stock_code: quantity}
+        self.stock_prices = {}  # stock_code -> [(timestamp, price), ...]
+        self.asset_history = {}  # user_id -> [(timestamp, asset_value), ...]
+
+    def clear_database(self):
+        self.create_tables()
+
+    def clone(self):
+        # 数据都在本对象里，直接共享
+        return self
+
+    def user_exists(self, user_id):
+        return user_id in self.users
+
+    def load_stocks(self):
+        return [(code, *row) for code, row in self.stocks.items()]
+
+    def load_users(self):
+        return [(user_id, *row) for user_id, row in self.users.items()]
+
+    def load_user_holdings(self, user_id):
+        return list(self.user_holdings.get(user_id, {}).items())
+
+    def load_all_holdings(self):
+        return [(user_id, stock_code, quantity)
+                for user_id, holdings in self.user_holdings.items()
+                for stock_code, quantity in holdings.items()]
+
+    def existing_user_ids(self, user_ids):
+        return {user_id for user_id in user_ids if user_id in self.users}
+
+    def add_stock(self, stock_code, initial_price, volatility):
+        self.stocks[stock_code] = [initial_price, volatility, initial_price]
+
+    def add_user(self, user_id, balance, strategy):
+        self.users[user_id] = [balance, strategy]
+
+    def delete_stock(self, stock_code):
+        self.stocks.pop(stock_code, None)
+
+    def delete_user(self, user_id):
+        self.users.pop(user_id, None)
+        self.user_holdings.pop(user_id, None)
+
+    def update_stock_price(self, stock_code, price):
+        if stock_code in self.stocks:
+            self.stocks[stock_code][2] = price
+
+    def update_user_balance(self, user_id, balance):
+        if user_id in self.users:
+            self.users[user_id][0] = balance
+
+    def upsert_user_holdings(self, data):
+        for user_id, stock_code, quantity in data:
+            self.user_holdings.setdefault(user_id, {})[stock_code] = quantity
+
+    def delete_user_holdings(self, data):
+        for user_id, stock_code in data:
+            self.user_holdings.get(user_id, {}).pop(stock_code, None)
+
+    def update_user_balances(self, data):
+        for user_id, balance in data:
+            self.update_user_balance(user_id, balance)
+
+    def insert_stock_prices(self, data):
+        for stock_code, timestamp, price in data:
+            self.stock_prices.setdefault(stock_code, []).append((timestamp, price))
+
+    def insert_asset_history(self, data):
+        for user_id, timestamp, asset_value in data:
+            self.asset_history.setdefault(user_id, []).append((timestamp, asset_value))
+
+    @staticmethod
+    def history_range(series, start, end):
+        """series 按时间追加，二分查找区间。"""
+        low = 0 if start is None else bisect.bisect_left(series, (start,))
+        high = len(series) if end is None else bisect.bisect_right(series, (end, float("inf")))
+        return series[low:high]
+
+    def load_price_range(self, stock_code, start=None, end=None):
+        return self.history_range(self.stock_prices.get(stock_code, []), start, end)
+
+    def load_recent_prices(self, stock_codes, limit):
+        return {stock_code: self.stock_prices[stock_code][-limit:]
+                for stock_code in stock_codes if self.stock_prices.get(stock_code)}
+
+    def load_asset_history(self, user_id, start=None, end=None):
+        return self.history_range(self.asset_history.get(user_id, []), start, end)
+
+
+class AsyncStorage(StorageBackend):
+    """
+    异步写回包装器：写操作放入有界队列，由专用线程使用自己的连接批量执行并提交。
+    队列满时调用方阻塞（背压）；读操作先等待队列清空，再在调用线程的连接上执行。
+    """
+
+    name = "async"
+    _STOP = object()
+
+    def __init__(self, backend, max_queue=10000, batch_size=500):
+        self.reader = backend
+        self.writer = backend.clone()
+        # 写线程和读连接的错误都经由 report_error 通知调用方
+        self.writer.on_error = self.report_error
+        self.reader.on_error = self.report_error
+        self.batch_size = batch_size
+        self.errors = []
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.thread = threading.Thread(target=self.run_writer, name="storage-writer", daemon=True)
+        self.thread.start()
+
+    @property
+    def metrics(self):
+        return self.writer.metrics
+
+    @metrics.setter
+    def metrics(self, metrics):
+        # 提交发生在被包装的后端中（写线程和读连接各一个）
+        self.writer.metrics = metrics
+        self.reader.metrics = metrics
+
+    def report_error(self, message):
+        """记录后台写线程或读连接上的错误（后端已经打印过），并通知回调。"""
+        self.errors.append(message)
+        if self.on_error is not None:
+            self.on_error(message)
+
+    def run_writer(self):
+        """后台线程：每次取出一批写操作执行，然后统一提交。"""
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            barriers = []
+            for item in batch:
+                if item is self._STOP:
+                    running = False
+                elif isinstance(item, threading.Event):
+                    barriers.append(item)
+                else:
+                    method, args = item
+                    try:
+                        getattr(self.writer, method)(*args)
+                    except Exception as e:
+                        self.report_error(f"后台写入 {method} 失败: {e}")
+            try:
+                self.writer.execute_buffered(force=True)
+            except Exception as e:
+                self.report_error(f"后台提交失败: {e}")
+            for barrier in barriers:
+                barrier.set()
+
+    def submit(self, method, *args):
+        """把写操作放入队列，队列满时阻塞。"""
+        if not self.thread.is_alive():
+            raise RuntimeError("Storage writer thread is not running")
+        self.queue.put((method, args))
+
+    def flush(self):
+        """等待队列中已有的写操作全部提交。"""
+        if not self.thread.is_alive():
+            return
+        barrier = threading.Event()
+        self.queue.put(barrier)
+        barrier.wait()
+
+    def create_tables(self):
+        self.flush()
+        self.reader.create_tables()
+
+    def clear_database(self):
+        self.flush()
+        self.reader.clear_database()
+
+    def user_exists(self, user_id):
+        self.flush()
+        return self.reader.user_exists(user_id)
+
+    def load_stocks(self):
+        self.flush()
+        return self.reader.load_stocks()
+
+    def load_users(self):
+        self.flush()
+        return self.reader.load_users()
+
+    def load_user_holdings(self, user_id):
+        self.flush()
+        return self.reader.load_user_holdings(user_id)
+
+    def load_all_holdings(self):
+        self.flush()
+        return self.reader.load_all_holdings()
+
+    def existing_user_ids(self, user_ids):
+        self.flush()
+        return self.reader.existing_user_ids(user_ids)
+
+    def load_price_range(self, stock_code, start=None, end=None):
+        self.flush()
+        return self.reader.load_price_range(stock_code, start, end)
+
+    def load_recent_prices(self, stock_codes, limit):
+        self.flush()
+        return self.reader.load_recent_prices(stock_codes, limit)
+
+    def load_asset_history(self, user_id, start=None, end=None):
+        self.flush()
+        return self.reader.load_asset_history(user_id, start, end)
+
+    def migrate_schema(self):
+        self.flush()
+        self.reader.migrate_schema()
+
+    def add_stock(self, stock_code, initial_price, volatility):
+        self.submit("add_stock", stock_code, initial_price, volatility)
+
+    def add_user(self, user_id, balance, strategy):
+        self.submit("add_user", user_id, balance, strategy)
+
+    def delete_stock(self, stock_code):
+        self.submit("delete_stock", stock_code)
+
+    def delete_user(self, user_id):
+        self.submit("delete_user", user_id)
+
+    def update_stock_price(self, stock_code, price):
+        self.submit("update_stock_price", stock_code, price)
+
+    def update_user_balance(self, user_id, balance):
+        self.submit("update_user_balance", user_id, balance)
+
+    def upsert_user_holdings(self, data):
+        self.submit("upsert_user_holdings", data)
+
+    def delete_user_holdings(self, data):
+        self.submit("delete_user_holdings", data)
+
+    def update_user_balances(self, data):
+        self.submit("update_user_balances", data)
+
+    def insert_stock_prices(self, data):
+        self.submit("insert_stock_prices", data)
+
+    def insert_asset_history(self, data):
+        self.submit("insert_asset_history", data)
+
+    def execute_buffered(self, force=False):
+        # 后台线程每批都会提交，这里无需等待
+        pass
+
+    def clone(self):
+        return self
+
+    def close(self):
+        """等待写完并停止后台线程，然后关闭两个连接。"""
+        if self.thread.is_alive():
+            self.queue.put(self._STOP)
+            self.thread.join()
+        self.writer.close()
+        if self.reader is not self.writer:
+            self.reader.close()
+
+
+STORAGE_BACKENDS = {
+    "mysql": MySQLStorage,
+    "sqlite": SQLiteStorage,
+    "memory": MemoryStorage,
+}
+
+
+def create_storage(backend="mysql", async_writes=False, **options):
+    """
+    按名称创建存储后端，例如 create_storage("sqlite", path="market.db")。
+    async_writes 为 True 时用 AsyncStorage 包装，写操作在后台线程执行。
+    """
+    try:
+        backend_class = STORAGE_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    storage = backend_class(**options)
+    if async_writes:
+        storage = AsyncStorage(storage)
+    return storage
@@ -0,0 +1,80 @@
+class PortfolioValuation:
+    """
+    增量维护每个用户按市价计算的资产（余额 + 持仓 × 当前价格，以分为单位）。
+    - 持仓或余额变化的用户由 touch() 标记（模拟器在 mark_holding_dirty / mark_balance_dirty 中调用），下次刷新时重新估值；
+    - 股票价格变化时，通过反向索引 stock_code -> {user_id: 持仓} 只给该股票的持有者加上 Δ价格 × 持仓。
+    每次刷新的开销为 股票数 + 价格变化股票的持有者数 + 被标记用户的持仓数，与 用户数 × 持仓数 无关。
+    """
+
+    def __init__(self):
+        self.values = {}  # user_id -> 资产
+        self.marks = {}  # stock_code -> 上次刷新时的价格
+        self.positions = {}  # stock_code -> {user_id: 上次估值时的持仓}，只包含持仓不为零的用户
+        self.held = {}  # user_id -> {stock_code: 上次估值时的持仓}
+        self.touched = {}  # user_id -> user，尚未重新估值的用户
+
+    def touch(self, user):
+        """标记用户的持仓或余额发生了变化。"""
+        self.touched[user.user_id] = user
+
+    def forget(self, user_id):
+        """移除用户的估值和索引。"""
+        self.touched.pop(user_id, None)
+        self.values.pop(user_id, None)
+        for stock_code in self.held.pop(user_id, ()):
+            self.positions[stock_code].pop(user_id, None)
+
+    def refresh(self, stocks):
+        """按当前价格更新所有已估值用户的资产，然后重新估值被标记的用户。"""
+        marks = self.marks
+        values = self.values
+        for stock_code, stock_data in stocks.items():
+            price = stock_data['price']
+            mark = marks.get(stock_code)
+            if mark == price:
+                continue
+            marks[stock_code] = price
+            if mark is not None:
+                delta = price - mark
+                for user_id, quantity in self.positions.get(stock_code, {}).items():
+                    values[user_id] += delta * quantity
+
+        # 已移除的股票不再计入资产（移除时持仓已按价格退回，持有者已被标记）
+        if len(marks) != len(stocks):
+            for stock_code in [stock_code for stock_code in marks if stock_code not in stocks]:
+                del marks[stock_code]
+                for user_id in self.positions.pop(stock_code, {}):
+                    self.held[user_id].pop(stock_code, None)
+
+        touched = self.touched
+        if touched:
+            self.touched = {}
+            for user in touched.values():
+                self.revalue(user, stocks)
+
+    def revalue(self, user, stocks):
+        """按当前价格重新计算用户的资产并更新反向索引，返回资产。不在股票池中的持仓按 0 计算。"""
+        user_id = user.user_id
+        for stock_code in self.held.get(user_id, ()):
+            self.positions[stock_code].pop(user_id, None)
+
+        value = user.balance
+        held = {}
+        for stock_code, quantity in user.holdings.items():
+            stock_data = stocks.get(stock_code)
+            if quantity and stock_data is not None:
+                price = stock_data['price']
+                self.marks.setdefault(stock_code, price)
+                value += quantity * price
+                held[stock_code] = quantity
+                self.positions.setdefault(stock_code, {})[user_id] = quantity
+        self.held[user_id] = held
+        self.values[user_id] = value
+        return value
+
+    def value(self, user, stocks):
+        """用户当前的资产，需先调用 refresh()；尚未估值的用户在这里估值。"""
+        value = self.values.get(user.user_id)
+        if value is None:
+            value = self.revalue(user, stocks)
+        return value
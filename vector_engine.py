@@ -0,0 +1,275 @@
+import random
+from itertools import repeat
+
+from indicators import AssetHistory
+from money import MONEY_SCALE
+
+try:
+    import numpy as np
+except ImportError:  # 没有 NumPy 时只能使用 run_simulation
+    np = None
+
+TRADE_QUANTITY = 5  # 内置均线/趋势/均值回归策略每次交易的数量
+MAX_FILL_ROUNDS = 16  # 求解成交价与余额检查的最大迭代次数
+TIE_TOLERANCE = 1e-12  # 相对误差内视为相等：Decimal 均值与价格恰好相等时，float 均值可能差一个舍入误差
+
+
+class VectorizedEngine:
+    """
+    NumPy 向量化模拟内核，语义与 StockMarketSimulator.run_simulation 一致：
+    - 每步每个用户以 trade_probability（或 StockMarketSimulator.trade_rate 给出的单独概率）参与交易，内置策略的规则、交易数量和价格冲击模型不变；
+    - 同一只股票的成交按用户顺序依次推动价格，每笔成交价为前一笔成交后的价格，余额不足的买单不成交；
+    - 每步结束后用一次矩阵-向量乘法计算所有用户的资产。
+    与逐用户执行的区别：策略在步开始时的行情快照上决策（同一步内看不到其他用户造成的价格变化），
+    破产检查在整步结束后进行。余额、持仓和价格在引擎内部是 float64/int64 数组，金额以分为单位且始终是整数：
+    成交价取整到分（对连乘结果取整，逐笔撮合则每笔取整，两者可能相差一分），运行结束后写回 User 和 stocks。
+
+    只支持实现了 vector_spec() 的策略，没有策略的用户不交易。
+    """
+
+    def __init__(self, simulator, seed=None):
+        if np is None:
+            raise ImportError("VectorizedEngine requires NumPy.")
+        self.simulator = simulator
+        self.users = list(simulator.users)
+        self.stock_codes = list(simulator.stocks)
+        stock_index = {stock_code: i for i, stock_code in enumerate(self.stock_codes)}
+        stocks = [simulator.stocks[stock_code] for stock_code in self.stock_codes]
+
+        self.prices = np.array([float(data['price']) for data in stocks], dtype=np.float64)
+        self.volatility = np.array([float(data['volatility']) for data in stocks], dtype=np.float64)
+        self.balances = np.array([float(user.balance) for user in self.users], dtype=np.float64)
+        self.holdings = np.zeros((len(self.users), len(self.stock_codes)), dtype=np.int64)
+        for i, user in enumerate(self.users):
+            for stock_code, quantity in user.holdings.items():
+                if stock_code in stock_index:
+                    self.holdings[i, stock_index[stock_code]] = quantity
+        self.initial_holdings = self.holdings.copy()
+        self.traded = np.zeros(len(self.users), dtype=bool)
+        self.trade_probability = np.array([simulator.trade_rate(user) for user in self.users], dtype=np.float64)
+
+        self.groups = self.group_strategies()
+        # 价格窗口：每只股票最近 window_size 个成交价，右对齐存放
+        self.window_size = max([max(spec[1:], default=1) for spec, _ in self.groups] + [1])
+        self.window = np.zeros((len(self.stock_codes), self.window_size), dtype=np.float64)
+        self.lengths = np.zeros(len(self.stock_codes), dtype=np.int64)
+        for s, data in enumerate(stocks):
+            recent = [float(price) for price in data['prices'][-self.window_size:]]
+            if recent:
+                self.window[s, -len(recent):] = recent
+            self.lengths[s] = len(recent)
+        self.new_ticks = np.zeros(len(self.stock_codes), dtype=np.int64)  # 本次运行产生的价格点数
+
+        # 默认从 random 模块取种子，random.seed() 同样能复现向量化运行
+        self.rng = np.random.default_rng(random.getrandbits(64) if seed is None else seed)
+        self.trades = 0
+
+    def group_strategies(self):
+        """按策略参数把用户分组，返回 [(spec, 用户下标数组), ...]。"""
+        members = {}
+        for i, user in enumerate(self.users):
+            if user.strategy is None:
+                continue
+            vector_spec = getattr(user.strategy, "vector_spec", None)
+            if vector_spec is None:
+                raise ValueError(f"Strategy {type(user.strategy).__name__} of user {user.user_id} "
+                                 f"has no vectorized implementation.")
+            members.setdefault(vector_spec(), []).append(i)
+        return [(spec, np.array(indices, dtype=np.int64)) for spec, indices in members.items()]
+
+    def moving_average(self, window):
+        """每只股票最近 window 个价格的均值，价格点不足时为 NaN。"""
+        average = self.window[:, self.window_size - window:].mean(axis=1)
+        return np.where(self.lengths >= window, average, np.nan)
+
+    @staticmethod
+    def compare(left, right):
+        """返回 (left > right, left < right)，相对误差在 TIE_TOLERANCE 内的视为相等。"""
+        tolerance = np.abs(right) * TIE_TOLERANCE
+        return left > right + tolerance, left < right - tolerance
+
+    def signals(self, spec):
+        """返回 (买入信号, 卖出信号)，均为每只股票一个布尔值；NaN 比较为 False，与策略跳过的情形一致。"""
+        kind = spec[0]
+        if kind == "crossover":
+            return self.compare(self.moving_average(spec[1]), self.moving_average(spec[2]))
+        above, below = self.compare(self.prices, self.moving_average(spec[1]))
+        if kind == "trend":
+            return above, below
+        if kind == "mean_reversion":
+            return below, above
+        raise ValueError(f"Unknown vectorized strategy {kind}.")
+
+    def decide(self, active):
+        """在步开始时的快照上生成订单，返回 (buy, sell, quantity)，形状为 活跃用户数 × 股票数。"""
+        num_stocks = len(self.stock_codes)
+        buy = np.zeros((len(active), num_stocks), dtype=bool)
+        sell = np.zeros_like(buy)
+        quantity = np.full(buy.shape, TRADE_QUANTITY, dtype=np.int64)
+        for spec, indices in self.groups:
+            rows = np.flatnonzero(np.isin(active, indices, assume_unique=True))
+            if not len(rows):
+                continue
+            if spec[0] == "random":
+                # 每只股票等概率买入/卖出/持有，数量 1~5
+                action = self.rng.integers(0, 3, (len(rows), num_stocks))
+                buy[rows] = action == 0
+                sell[rows] = action == 1
+                quantity[rows] = self.rng.integers(1, 6, (len(rows), num_stocks))
+            else:
+                buy_signal, sell_signal = self.signals(spec)
+                holdings = self.holdings[active[rows]]
+                buy[rows] = buy_signal & (holdings == 0)
+                sell[rows] = sell_signal & (holdings > 0)
+        # 持仓不足的卖单不成交
+        sell &= self.holdings[active] >= quantity
+        return buy, sell, quantity
+
+    def fill(self, s, users, is_buy, quantity, factor):
+        """
+        按用户顺序撮合一只股票的订单，返回 (成交掩码, 成交价, 每笔成交后的价格)。
+        第 k 笔的成交价是前面已成交订单依次推动后的价格；买单成交与否又取决于成交价，迭代到不动点，
+        不收敛时逐笔撮合。
+        """
+        price = self.prices[s]
+        balances = self.balances[users]
+        done = np.ones(len(users), dtype=bool)
+        for _ in range(MAX_FILL_ROUNDS):
+            path = np.rint(price * np.cumprod(np.where(done, factor, 1.0)))
+            fill_price = np.concatenate(([price], path[:-1]))
+            affordable = ~is_buy | (balances >= fill_price * quantity)
+            if np.array_equal(affordable, done):
+                return done, fill_price, path
+            done = affordable
+
+        path = np.empty(len(users))
+        fill_price = np.empty(len(users))
+        for k in range(len(users)):
+            fill_price[k] = price
+            done[k] = not is_buy[k] or balances[k] >= price * quantity[k]
+            if done[k]:
+                price = round(price * factor[k])
+            path[k] = price
+        return done, fill_price, path
+
+    def step(self):
+        """执行一步，返回每只股票本步各笔成交后的价格（不含收盘价）。"""
+        active = np.flatnonzero(self.rng.random(len(self.users)) < self.trade_probability)
+        buy, sell, quantity = self.decide(active)
+        traded = buy | sell
+        # 价格冲击与逐笔撮合相同：买入乘以 (1 + u)，卖出乘以 (1 - u)，u ~ U(0, volatility)
+        change = self.rng.uniform(0, 1, buy.shape) * self.volatility
+        factor = np.where(buy, 1 + change, np.where(sell, 1 - change, 1.0))
+        signed = np.where(buy, quantity, np.where(sell, -quantity, 0))
+
+        # 所有股票同时撮合：沿用户方向累乘得到每笔成交价，沿股票方向累计每个用户的支出。
+        # 若每个买单在扣款时都买得起，结果与逐用户、逐只股票撮合完全相同；否则退回逐只股票撮合。
+        path = np.rint(self.prices * np.cumprod(factor, axis=0))
+        cost = np.vstack((self.prices, path[:-1])) * signed
+        if (self.balances[active, None] - np.cumsum(cost, axis=1))[buy].min(initial=0) < 0:
+            return self.step_sequential(active, buy, traded, signed, factor)
+
+        self.balances[active] -= cost.sum(axis=1)
+        self.holdings[active] += signed
+        self.traded[active[traded.any(axis=1)]] = True
+        self.trades += int(traded.sum())
+        if len(active):
+            self.prices = path[-1].copy()
+        return [path[traded[:, s], s] for s in range(len(self.stock_codes))]
+
+    def step_sequential(self, active, buy, traded, signed, factor):
+        """逐只股票撮合，用户的余额按股票顺序依次扣减。"""
+        ticks = []
+        for s in range(len(self.stock_codes)):
+            rows = np.flatnonzero(traded[:, s])
+            users = active[rows]
+            qty = signed[rows, s]
+            done, fill_price, path = self.fill(s, users, buy[rows, s], qty, factor[rows, s])
+            users, qty, fill_price = users[done], qty[done], fill_price[done]
+            self.balances[users] -= fill_price * qty
+            self.holdings[users, s] += qty
+            self.traded[users] = True
+            self.trades += len(users)
+            if len(users):
+                self.prices[s] = path[done][-1]
+            ticks.append(path[done])
+        return ticks
+
+    def append_ticks(self, ticks):
+        """把本步的成交价和收盘价推入价格窗口。"""
+        for s, trade_ticks in enumerate(ticks):
+            new = np.concatenate((trade_ticks, self.prices[s:s + 1]))
+            if len(new) >= self.window_size:
+                self.window[s] = new[-self.window_size:]
+            else:
+                self.window[s, :-len(new)] = self.window[s, len(new):]
+                self.window[s, -len(new):] = new
+            self.lengths[s] = min(self.window_size, self.lengths[s] + len(new))
+            self.new_ticks[s] += len(new)
+
+    def run(self, num_trades):
+        """运行 num_trades 步，返回 (stock_price_data, asset_history_data, 每步资产矩阵, 时间戳)。"""
+        simulator = self.simulator
+        user_ids = [user.user_id for user in self.users]
+        # 没有列式历史、也不写数据库时不生成逐行的历史记录
+        record_rows = simulator.history_store is not None or simulator.persist_history
+        stock_price_data = []
+        asset_history_data = []
+        values = []
+        timestamps = []
+        profiler = simulator.profiler
+
+        for i in range(num_trades):
+            if simulator.bankrupt_user is not None:
+                print(f"User {simulator.bankrupt_user.user_id} went bankrupt. Stopping simulation.")
+                break
+
+            timestamp = simulator.total_trades + i + 1
+            if profiler is not None:
+                profiler.before_step(timestamp)
+            self.append_ticks(self.step())
+            bankrupt = np.flatnonzero(self.traded & (self.balances <= 0))
+            if len(bankrupt):
+                simulator.bankrupt_user = self.users[bankrupt[0]]
+                print(f"User {simulator.bankrupt_user.user_id} went bankrupt!")
+
+            # 所有用户的资产：一次矩阵-向量乘法
+            step_values = self.balances + self.holdings @ self.prices
+            values.append(step_values)
+            timestamps.append(timestamp)
+            if record_rows:
+                asset_history_data.extend(zip(user_ids, repeat(timestamp), (step_values / MONEY_SCALE).tolist()))
+                stock_price_data.extend(zip(self.stock_codes, repeat(timestamp), (self.prices / MONEY_SCALE).tolist()))
+            if profiler is not None:
+                profiler.after_step(timestamp)
+
+        if profiler is not None:
+            profiler.pause()
+
+        return stock_price_data, asset_history_data, values, timestamps
+
+    def sync(self, values, timestamps):
+        """把数组状态写回 User 和 stocks，并标记需要写回数据库的持仓、余额和价格。"""
+        simulator = self.simulator
+        for s, stock_code in enumerate(self.stock_codes):
+            stock_data = simulator.stocks.get(stock_code)
+            if stock_data is None or not self.new_ticks[s]:
+                continue
+            # 'prices' 只同步最近 window_size 个价格点，完整的逐步价格见 stock_prices 表或列式历史
+            count = min(self.new_ticks[s], self.window_size)
+            stock_data['prices'].extend(np.rint(self.window[s, -count:]).astype(np.int64).tolist())
+            stock_data['price'] = stock_data['prices'][-1]
+            simulator.update_stock_price_in_db(stock_code, stock_data['price'])
+
+        for i in np.flatnonzero(self.traded).tolist():
+            user = self.users[i]
+            user.balance = round(self.balances[i].item())
+            simulator.mark_balance_dirty(user)
+        for i, s in zip(*(index.tolist() for index in np.nonzero(self.holdings != self.initial_holdings))):
+            user = self.users[i]
+            user.holdings[self.stock_codes[s]] = int(self.holdings[i, s])
+            simulator.mark_holding_dirty(user, self.stock_codes[s])
+
+        if values:
+            AssetHistory.extend_many([user.asset_history for user in self.users], timestamps,
+                                     np.rint(np.column_stack(values)).astype(np.int64))